@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+"""
+End-to-end call benchmark against local stand-ins
+
+Starts fake Ollama, Deepgram, ElevenLabs and Asterisk servers (scripts/fake_providers.py)
+in a separate process, points the call system at them and runs a campaign through
+CallManager: the dialer originates over AMI, the fake Asterisk answers and connects a
+simulated caller to the FastAGI server, and AGIHandler runs every turn as in production.
+
+Reports throughput, turn latency percentiles (end of the caller's turn until the answer
+starts playing), CPU and RSS per call, and saves the results as JSON so runs can be
+compared between commits.
+
+    python scripts/benchmark_calls.py --calls 50 --concurrency 20 --turns 3
+    python scripts/benchmark_calls.py --calls 200 --concurrency 40 --workers 4
+    python scripts/benchmark_calls.py --compare data/benchmarks/e2e-abc1234-20260101-120000.json
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import platform
+import queue
+import resource
+import socket
+import subprocess
+import tempfile
+import time
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import fake_providers
+
+PROJECT_ROOT = os.path.join(os.path.dirname(__file__), '..')
+# Settings that change what is being measured, recorded with every run
+RECORDED_SETTINGS = (
+    "STT_STREAMING", "VAD_ENABLED", "PIPELINE_STREAMING", "CHANNEL_CODEC", "TTS_OUTPUT_FORMAT",
+    "RESPONSE_CACHE_ENABLED", "RESPONSE_CACHE_EMBED_MODEL", "STT_STREAM_SILENCE_SECONDS", "RECORD_SILENCE_SECONDS",
+    "SPECULATIVE_ENABLED", "FILLER_ENABLED", "FILLER_THRESHOLD_MS"
+)
+COMPARED_METRICS = (
+    ("throughput_calls_per_second", "llamadas/s"),
+    ("turn_latency_ms.p50", "ms p50"),
+    ("turn_latency_ms.p95", "ms p95"),
+    ("turn_latency_ms.p99", "ms p99"),
+    ("call_duration_ms.p50", "ms/llamada p50"),
+    ("cpu_ms_per_call", "ms CPU/llamada"),
+    ("rss_kb_per_call", "KB RSS/llamada")
+)
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+def rss_kb(pid="self") -> int:
+    """Current resident set size of a process, this one by default"""
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+def process_cpu_seconds(pid: int) -> float:
+    """User and system CPU time of another process, from /proc"""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+def cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {"count": 0, "mean": None, "p50": None, "p95": None, "p99": None, "max": None}
+    data = np.asarray(values) * 1000
+    p50, p95, p99 = np.percentile(data, [50, 95, 99])
+    return {
+        "count": len(values),
+        "mean": round(float(data.mean()), 1),
+        "p50": round(float(p50), 1),
+        "p95": round(float(p95), 1),
+        "p99": round(float(p99), 1),
+        "max": round(float(data.max()), 1)
+    }
+
+def configure_environment(args, ports: dict, tts_cache_dir: str, campaign_db: str) -> None:
+    """Point every provider at the stand-ins; must run before src is imported"""
+    os.environ.update({
+        "OLLAMA_HOST": f"http://127.0.0.1:{ports['ollama_port']}",
+        "DEEPGRAM_API_KEY": "bench",
+        "DEEPGRAM_BASE_URL": f"http://127.0.0.1:{ports['deepgram_port']}/v1",
+        "DEEPGRAM_WS_URL": f"ws://127.0.0.1:{ports['deepgram_port']}/v1/listen",
+        "ELEVENLABS_API_KEY": "bench",
+        "ELEVENLABS_VOICE_ID": "bench",
+        "ELEVENLABS_BASE_URL": f"http://127.0.0.1:{ports['elevenlabs_port']}/v1",
+        "AMI_HOST": "127.0.0.1",
+        "AMI_PORT": str(ports["ami_port"]),
+        "AGI_SERVER_ENABLED": "true",
+        "AGI_HOST": "127.0.0.1",
+        "AGI_PORT": str(ports["agi_port"]),
+        "DIALER_MAX_CHANNELS": str(args.concurrency),
+        "DIALER_CPS": str(args.cps),
+        "AGI_MAX_CALLS": str(max(args.concurrency, 1) * 2),
+        "TTS_CACHE_DIR": tts_cache_dir,
+        "CAMPAIGN_DB_PATH": campaign_db,
+        "BARGE_IN_ENABLED": "true" if args.barge_in_seconds > 0 else "false",
+        "SPECULATIVE_ENABLED": "true" if args.speculative else "false",
+        "FILLER_ENABLED": "true" if args.filler else "false"
+    })
+
+def stage_summary(histogram) -> dict:
+    """Count and mean of every stage/provider series of the turn histogram"""
+    summary = {}
+    for labels, series in sorted(histogram.series.items()):
+        key = "/".join(labels)
+        summary[key] = {
+            "count": series["count"],
+            "mean_ms": round(series["sum"] / series["count"] * 1000, 1) if series["count"] else None
+        }
+    return summary
+
+async def sample_rss(samples: list, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        samples.append(rss_kb())
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=0.25)
+        except asyncio.TimeoutError:
+            pass
+
+async def run_campaign(args) -> dict:
+    # Imported only now, so Config reads the stand-in endpoints
+    from src.services.call_manager import CallManager
+    from src.services.metrics import metrics
+    from src.core.config import Config
+
+    manager = CallManager()
+    if not await manager.initialize():
+        raise RuntimeError("No se pudo inicializar el Call Manager contra los servicios simulados")
+
+    numbers = [f"+57300{n:07d}" for n in range(args.calls)]
+    rss_samples = []
+    stop_sampling = asyncio.Event()
+    sampler = asyncio.create_task(sample_rss(rss_samples, stop_sampling))
+    rss_before = rss_kb()
+    cpu_before = cpu_seconds()
+    started = time.monotonic()
+    try:
+        results = await manager.process_numbers(numbers)
+    finally:
+        wall = time.monotonic() - started
+        cpu = cpu_seconds() - cpu_before
+        stop_sampling.set()
+        await sampler
+        status = manager.get_status()
+        stages = stage_summary(metrics.stage_seconds)
+        await manager.shutdown()
+
+    statuses = {}
+    for call in results:
+        statuses[call["status"]] = statuses.get(call["status"], 0) + 1
+    return {
+        "statuses": statuses,
+        "wall_seconds": wall,
+        "cpu_seconds": cpu,
+        "rss_before_kb": rss_before,
+        "rss_peak_kb": max(rss_samples + [rss_kb()]),
+        "settings": {name: getattr(Config, name) for name in RECORDED_SETTINGS},
+        "stages": stages,
+        "response_cache": status["response_cache"],
+        "tts_cache": status["tts_cache"],
+        "agi": status["agi"],
+        "speculation": status["speculation"]
+    }
+
+async def iterate_numbers(count: int):
+    for n in range(count):
+        yield f"+57300{n:07d}"
+
+async def sample_workers(pool, samples: dict, totals: list, stop: asyncio.Event) -> None:
+    """Last RSS and CPU time seen for every worker process, and their summed RSS over time"""
+    while not stop.is_set():
+        total = 0
+        for process, _ in list(pool.processes.values()):
+            try:
+                samples[process.pid] = (rss_kb(process.pid), process_cpu_seconds(process.pid))
+            except (OSError, IndexError, ValueError):
+                continue
+            total += samples[process.pid][0]
+        totals.append(total)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=0.25)
+        except asyncio.TimeoutError:
+            pass
+
+async def run_worker_campaign(args) -> dict:
+    """The same campaign in worker mode: numbers go to the campaign store and args.workers processes dial them
+
+    Timing starts once every worker is initialized, so process start-up is not counted as call time.
+    """
+    from src.services.campaign_store import CampaignStore
+    from src.services.worker_pool import WorkerPool
+    from src.core.config import Config
+
+    store = CampaignStore()
+    await store.open()
+    # Created empty and marked as importing, so the workers wait for the numbers
+    campaign_id = await store.create_campaign("benchmark")
+    pool = WorkerPool(args.workers, store)
+    runner = asyncio.create_task(pool.run(campaign_id, stop_when_done=True))
+    while sum(pool.ready) < args.workers:
+        if runner.done():
+            runner.result()
+            raise RuntimeError("Los workers terminaron antes de estar listos")
+        await asyncio.sleep(0.1)
+
+    samples, totals = {}, []
+    stop_sampling = asyncio.Event()
+    sampler = asyncio.create_task(sample_workers(pool, samples, totals, stop_sampling))
+    await asyncio.sleep(0)
+    cpu_before = {pid: cpu for pid, (_, cpu) in samples.items()}
+    rss_before = totals[-1] if totals else 0
+    cpu_self = cpu_seconds()
+    started = time.monotonic()
+    wall = None
+    try:
+        await store.add_numbers(campaign_id, iterate_numbers(args.calls))
+        await store.set_campaign_state(campaign_id, "running")
+        # Finished once no number is pending or being dialed, before the workers shut down
+        while not runner.done():
+            dialing, next_due, _ = await store.remaining(campaign_id)
+            if not dialing and next_due is None:
+                break
+            await asyncio.sleep(0.1)
+        wall = time.monotonic() - started
+        await runner
+    finally:
+        if wall is None:
+            wall = time.monotonic() - started
+        stop_sampling.set()
+        await sampler
+        progress = await store.get_progress(campaign_id)
+        await store.close()
+
+    # Shutdown of the last workers falls between samples; their CPU is counted up to the last one
+    cpu = cpu_seconds() - cpu_self + sum(cpu - cpu_before.get(pid, 0.0) for pid, (_, cpu) in samples.items())
+    return {
+        "statuses": progress,
+        "wall_seconds": wall,
+        "cpu_seconds": cpu,
+        "rss_before_kb": rss_before,
+        "rss_peak_kb": max(totals + [rss_before]),
+        "settings": {name: getattr(Config, name) for name in RECORDED_SETTINGS},
+        # Stage histograms, caches and AGI counters live in each worker process
+        "stages": {},
+        "response_cache": None,
+        "tts_cache": None,
+        "agi": None,
+        "workers": pool.get_status()
+    }
+
+def collect_callers(results_queue, expected: int, timeout: float = 5.0) -> list:
+    callers = []
+    deadline = time.monotonic() + timeout
+    while len(callers) < expected and time.monotonic() < deadline:
+        try:
+            callers.append(results_queue.get(timeout=0.1))
+        except queue.Empty:
+            continue
+    return callers
+
+def build_report(args, campaign: dict, callers: list) -> dict:
+    statuses = campaign["statuses"]
+    latencies = [latency for caller in callers for latency in caller["turn_latencies"]]
+    turns = sum(caller["turns"] for caller in callers)
+    calls = sum(statuses.values())
+    wall = campaign["wall_seconds"]
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "parameters": vars(args),
+        "settings": campaign["settings"],
+        "calls": calls,
+        "statuses": statuses,
+        "turns": turns,
+        "caller_errors": [caller["error"] for caller in callers if caller["error"]],
+        "system_sounds": sum(caller["system_sounds"] for caller in callers),
+        "interruptions": sum(caller["interruptions"] for caller in callers),
+        "wall_seconds": round(wall, 3),
+        "throughput_calls_per_second": round(calls / wall, 3) if wall else None,
+        "throughput_turns_per_second": round(turns / wall, 3) if wall else None,
+        "turn_latency_ms": percentiles(latencies),
+        "call_duration_ms": percentiles([caller["duration"] for caller in callers]),
+        "cpu_seconds": round(campaign["cpu_seconds"], 3),
+        "cpu_ms_per_call": round(campaign["cpu_seconds"] / calls * 1000, 2) if calls else None,
+        "cpu_utilization": round(campaign["cpu_seconds"] / wall, 3) if wall else None,
+        "rss_before_mb": round(campaign["rss_before_kb"] / 1024, 1),
+        "rss_peak_mb": round(campaign["rss_peak_kb"] / 1024, 1),
+        # Growth at peak spread over the calls that were up at the same time
+        "rss_kb_per_call": round((campaign["rss_peak_kb"] - campaign["rss_before_kb"]) / min(args.concurrency, calls), 1)
+        if calls else None,
+        "stages": campaign["stages"],
+        "response_cache": campaign["response_cache"],
+        "tts_cache": campaign["tts_cache"],
+        "agi": campaign["agi"],
+        "speculation": campaign.get("speculation"),
+        "workers": campaign.get("workers")
+    }
+
+def lookup(report: dict, dotted: str):
+    value = report
+    for part in dotted.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+def print_report(report: dict, baseline: dict = None) -> None:
+    latency = report["turn_latency_ms"]
+    print(f"📊 Benchmark de llamadas ({report['commit']})")
+    if report.get("workers"):
+        print(f"  Workers: {report['workers']['workers']} procesos, {report['workers']['crashed']} caídos")
+    print(f"  Llamadas: {report['calls']} {report['statuses']}, turnos: {report['turns']}, "
+          f"en {report['wall_seconds']:.1f}s")
+    print(f"  Throughput: {report['throughput_calls_per_second']} llamadas/s, "
+          f"{report['throughput_turns_per_second']} turnos/s")
+    print(f"  Latencia de turno: p50 {latency['p50']} ms, p95 {latency['p95']} ms, p99 {latency['p99']} ms")
+    print(f"  CPU: {report['cpu_ms_per_call']} ms/llamada ({report['cpu_utilization']} núcleos), "
+          f"RSS: {report['rss_peak_mb']} MB pico, {report['rss_kb_per_call']} KB/llamada")
+    if report["parameters"].get("barge_in_seconds"):
+        print(f"  Barge-in: {report['interruptions']} respuestas interrumpidas, "
+              f"duración de llamada p50 {report['call_duration_ms']['p50']} ms")
+    if report.get("speculation"):
+        speculation = report["speculation"]
+        print(f"  Especulación: {speculation['hits']} aciertos de {speculation['hits'] + speculation['misses']} "
+              f"({speculation['hit_rate'] * 100:.0f}%), {speculation['wasted']} descartadas, "
+              f"{speculation['mean_saved_ms']} ms ahorrados por acierto")
+    filler = (report.get("agi") or {}).get("filler")
+    if filler:
+        first_audio = report["stages"].get("first_audio/local", {}).get("mean_ms")
+        print(f"  Relleno: {filler['played']} reproducidos, {filler['skipped']} omitidos; "
+              f"respuesta real a los {first_audio} ms de media, {filler['waited_seconds']} s esperando al relleno")
+    if report["caller_errors"]:
+        print(f"  ⚠️ Errores de llamantes: {len(report['caller_errors'])}")
+    if not baseline:
+        return
+    print(f"  Comparado con {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    for key, unit in COMPARED_METRICS:
+        new, old = lookup(report, key), lookup(baseline, key)
+        if new is None or old is None:
+            continue
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"    {key:<30} {old:>10} -> {new:>10} {unit} ({change})")
+
+def parse_args():
+    defaults = fake_providers.DEFAULTS
+    parser = argparse.ArgumentParser(description="Benchmark end to end de llamadas con servicios simulados")
+    parser.add_argument("--calls", type=int, default=20, help="Llamadas de la campaña")
+    parser.add_argument("--concurrency", type=int, default=10, help="Canales simultáneos (DIALER_MAX_CHANNELS)")
+    parser.add_argument("--cps", type=float, default=0, help="Llamadas por segundo (0 = sin límite)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Procesos worker (modo WORKERS); los canales se reparten entre ellos")
+    parser.add_argument("--turns", type=int, default=defaults["turns"], help="Turnos que habla cada llamante")
+    parser.add_argument("--speech-seconds", type=float, default=defaults["speech_seconds"])
+    parser.add_argument("--time-scale", type=float, default=defaults["time_scale"],
+                        help="Factor del tiempo de habla y reproducción simulados (0.1 = 10x más rápido)")
+    parser.add_argument("--answer-seconds", type=float, default=defaults["answer_seconds"])
+    parser.add_argument("--barge-in-seconds", type=float, default=defaults["barge_in_seconds"],
+                        help="Segundos de cada respuesta tras los que el llamante la interrumpe (0 = nunca)")
+    parser.add_argument("--llm-load-seconds", type=float, default=defaults["llm_load_seconds"])
+    parser.add_argument("--llm-first-token-seconds", type=float, default=defaults["llm_first_token_seconds"])
+    parser.add_argument("--llm-tokens-per-second", type=float, default=defaults["llm_tokens_per_second"])
+    parser.add_argument("--stt-latency-seconds", type=float, default=defaults["stt_latency_seconds"])
+    parser.add_argument("--tts-first-byte-seconds", type=float, default=defaults["tts_first_byte_seconds"])
+    parser.add_argument("--tts-byte-rate", type=int, default=defaults["tts_byte_rate"],
+                        help="Bytes por segundo que entrega el TTS simulado")
+    parser.add_argument("--unique-transcripts", action="store_true",
+                        help="Transcripciones distintas en cada turno (sin aciertos de la caché de respuestas)")
+    parser.add_argument("--speculative", action="store_true",
+                        help="Generación especulativa desde transcripciones parciales (SPECULATIVE_ENABLED)")
+    parser.add_argument("--filler", action="store_true",
+                        help="Audios de relleno mientras se prepara la respuesta (FILLER_ENABLED)")
+    parser.add_argument("--tts-cache-dir", help="Directorio de caché TTS (por defecto uno temporal y vacío)")
+    parser.add_argument("--output", help="Ruta del JSON de resultados")
+    parser.add_argument("--compare", help="JSON de una ejecución anterior para comparar")
+    parser.add_argument("--verbose", action="store_true", help="Logs INFO del sistema de llamadas")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    ports = {name: free_port() for name in ("ollama_port", "deepgram_port", "elevenlabs_port", "ami_port", "agi_port")}
+    fake_config = {
+        **ports,
+        "turns": args.turns,
+        "speech_seconds": args.speech_seconds,
+        "time_scale": args.time_scale,
+        "answer_seconds": args.answer_seconds,
+        "barge_in_seconds": args.barge_in_seconds,
+        "llm_load_seconds": args.llm_load_seconds,
+        "llm_first_token_seconds": args.llm_first_token_seconds,
+        "llm_tokens_per_second": args.llm_tokens_per_second,
+        "stt_latency_seconds": args.stt_latency_seconds,
+        "tts_first_byte_seconds": args.tts_first_byte_seconds,
+        "tts_byte_rate": args.tts_byte_rate,
+        "unique_transcripts": args.unique_transcripts
+    }
+    scratch = tempfile.TemporaryDirectory(prefix="eve-bench-")
+    configure_environment(args, ports, args.tts_cache_dir or os.path.join(scratch.name, "tts_cache"),
+                          os.path.join(scratch.name, "campaigns.db"))
+
+    # Stand-ins get their own process so CPU and RSS figures cover only the call system
+    context = multiprocessing.get_context("spawn")
+    results_queue = context.Queue()
+    ready = context.Event()
+    stop = context.Event()
+    fakes = context.Process(target=fake_providers.serve, args=(fake_config, results_queue, ready, stop), daemon=True)
+    fakes.start()
+    try:
+        if not ready.wait(timeout=30):
+            raise RuntimeError("Los servicios simulados no arrancaron")
+        campaign = asyncio.run(run_worker_campaign(args) if args.workers > 1 else run_campaign(args))
+        callers = collect_callers(results_queue, sum(campaign["statuses"].values()))
+    finally:
+        stop.set()
+        fakes.join(timeout=5)
+        if fakes.is_alive():
+            fakes.terminate()
+        scratch.cleanup()
+
+    report = build_report(args, campaign, callers)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    output = args.output or os.path.join(
+        PROJECT_ROOT, "data", "benchmarks", f"e2e-{report['commit']}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"💾 Resultados guardados en {os.path.relpath(output)}")
+
+if __name__ == "__main__":
+    main()
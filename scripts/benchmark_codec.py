@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Codec throughput benchmark
+
+Reports how many 20 ms telephony frames per second each audio operation in
+src/utils/codec.py handles on this machine.
+
+    python scripts/benchmark_codec.py [seconds_of_audio]
+"""
+
+import sys
+import os
+import time
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.utils.codec import (
+    ChannelConverter, alaw_decode, alaw_encode, resample, ulaw_decode, ulaw_encode
+)
+
+FRAME_MS = 20
+
+def tone(seconds: float, rate: int) -> np.ndarray:
+    t = np.arange(int(seconds * rate)) / rate
+    return (np.sin(2 * np.pi * 440 * t) * 12000).astype(np.int16)
+
+def measure(name: str, func, audio_seconds: float, repeat: int = 5) -> None:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    frames = audio_seconds * 1000 / FRAME_MS
+    print(f"  {name:<28} {frames / best:>14,.0f} frames/s  {audio_seconds / best:>10,.0f}x realtime")
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 60.0
+    pcm8 = tone(seconds, 8000)
+    ulaw = ulaw_encode(pcm8)
+    alaw = alaw_encode(pcm8)
+    pcm16 = tone(seconds, 16000)
+    pcm22 = tone(seconds, 22050)
+    pcm44 = tone(seconds, 44100)
+
+    def stream_convert():
+        converter = ChannelConverter("pcm_16000", "ulaw")
+        data = pcm16.tobytes()
+        for offset in range(0, len(data), 4096):
+            converter.convert(data[offset:offset + 4096])
+
+    print(f"🎧 Benchmark de códecs ({seconds:.0f}s de audio, tramas de {FRAME_MS} ms)")
+    measure("ulaw encode", lambda: ulaw_encode(pcm8), seconds)
+    measure("ulaw decode", lambda: ulaw_decode(ulaw), seconds)
+    measure("alaw encode", lambda: alaw_encode(pcm8), seconds)
+    measure("alaw decode", lambda: alaw_decode(alaw), seconds)
+    measure("resample 16k -> 8k", lambda: resample(pcm16, 16000, 8000), seconds)
+    measure("resample 22.05k -> 8k", lambda: resample(pcm22, 22050, 8000), seconds)
+    measure("resample 44.1k -> 8k", lambda: resample(pcm44, 44100, 8000), seconds)
+    measure("resample 8k -> 16k", lambda: resample(pcm8, 8000, 16000), seconds)
+    measure("stream pcm_16000 -> ulaw", stream_convert, seconds)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,573 @@
+"""
+Local stand-ins for Ollama, Deepgram, ElevenLabs and Asterisk (AMI + simulated callers)
+
+Used by scripts/benchmark_calls.py. Each stand-in speaks just enough of the real
+protocol for the call system to run unchanged, with configurable latencies, so
+calls can be benchmarked without API credits or a SIP trunk.
+"""
+
+import asyncio
+import hashlib
+import itertools
+import json
+import math
+import os
+import time
+import wave
+import numpy as np
+from aiohttp import web, WSMsgType
+
+DEFAULTS = {
+    "host": "127.0.0.1",
+    "ollama_port": 0,
+    "deepgram_port": 0,
+    "elevenlabs_port": 0,
+    "ami_port": 0,
+    "agi_host": "127.0.0.1",
+    "agi_port": 4573,
+    # Ollama
+    "llm_load_seconds": 0.5,
+    "llm_first_token_seconds": 0.25,
+    "llm_tokens_per_second": 25.0,
+    # Deepgram
+    "stt_latency_seconds": 0.15,
+    "stt_interim_seconds": 0.5,
+    "unique_transcripts": False,
+    # ElevenLabs
+    "tts_first_byte_seconds": 0.2,
+    "tts_byte_rate": 32000,
+    "tts_chars_per_second": 15.0,
+    # Asterisk and callers
+    "answer_seconds": 0.5,
+    "turns": 3,
+    "speech_seconds": 1.5,
+    # Seconds into each answer at which the caller starts talking over it (0 = never barges in)
+    "barge_in_seconds": 0.0,
+    "time_scale": 1.0
+}
+
+CALLER_PHRASES = [
+    "Hola, quería saber el horario de atención",
+    "¿Cuánto cuesta el plan básico?",
+    "Necesito cambiar la dirección de envío",
+    "¿Puedo pagar con tarjeta de crédito?",
+    "Quiero hablar con un asesor",
+    "¿Dónde queda la oficina más cercana?",
+    "Mi pedido no ha llegado todavía",
+    "Gracias, eso es todo"
+]
+
+ASSISTANT_REPLIES = [
+    "Claro, con gusto te ayudo. Nuestro horario es de lunes a viernes, de ocho de la mañana a seis de la tarde.",
+    "El plan básico cuesta veinte dólares al mes. ¿Quieres que te cuente qué incluye?",
+    "Entiendo. Para cambiar la dirección necesito confirmar algunos datos contigo, ¿te parece bien?",
+    "Sí, aceptamos tarjetas de crédito y débito. También puedes pagar por transferencia."
+]
+
+SAMPLE_RATE = 8000
+AUDIO_EXTENSIONS = {"ulaw": 1, "alaw": 1, "sln": 2, "sln16": 2}
+
+# ---------------------------------------------------------------------------
+# Ollama
+# ---------------------------------------------------------------------------
+
+class FakeOllama:
+    """Ollama HTTP API: tags, ps, chat, generate and embeddings with a fixed token rate"""
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.loaded = set()
+        self.replies = itertools.cycle(ASSISTANT_REPLIES)
+        self.requests = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/api/tags", self.tags)
+        app.router.add_get("/api/ps", self.ps)
+        app.router.add_post("/api/chat", self.chat)
+        app.router.add_post("/api/generate", self.generate)
+        app.router.add_post("/api/embeddings", self.embeddings)
+        return app
+
+    @staticmethod
+    def _model_name(model: str) -> str:
+        return model if ":" in model else f"{model}:latest"
+
+    async def tags(self, request: web.Request) -> web.Response:
+        return web.json_response({"models": [{"name": name} for name in sorted(self.loaded)]})
+
+    async def ps(self, request: web.Request) -> web.Response:
+        return web.json_response({"models": [{"name": name, "model": name} for name in sorted(self.loaded)]})
+
+    async def _load(self, model: str) -> float:
+        """Seconds spent loading; only the first request for a model pays it"""
+        name = self._model_name(model)
+        if name in self.loaded:
+            return 0.0
+        self.loaded.add(name)
+        await asyncio.sleep(self.config["llm_load_seconds"])
+        return self.config["llm_load_seconds"]
+
+    def _tokens(self, body: dict) -> list:
+        limit = body.get("options", {}).get("num_predict") or 150
+        words = next(self.replies).split(" ")
+        tokens = [word + " " for word in words[:-1]] + words[-1:]
+        return tokens[:limit]
+
+    async def _respond(self, request: web.Request, wrap) -> web.StreamResponse:
+        body = await request.json()
+        self.requests += 1
+        load = await self._load(body.get("model", ""))
+        tokens = self._tokens(body)
+        await asyncio.sleep(self.config["llm_first_token_seconds"])
+        interval = 1.0 / self.config["llm_tokens_per_second"]
+        done = {"done": True, "load_duration": int(load * 1e9), "eval_count": len(tokens)}
+
+        if not body.get("stream", True):
+            await asyncio.sleep(interval * len(tokens))
+            return web.json_response({**wrap("".join(tokens)), **done})
+
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        for token in tokens:
+            await response.write((json.dumps({**wrap(token), "done": False}) + "\n").encode())
+            await asyncio.sleep(interval)
+        await response.write((json.dumps({**wrap(""), **done}) + "\n").encode())
+        await response.write_eof()
+        return response
+
+    async def chat(self, request: web.Request) -> web.StreamResponse:
+        return await self._respond(request, lambda text: {"message": {"role": "assistant", "content": text}})
+
+    async def generate(self, request: web.Request) -> web.StreamResponse:
+        return await self._respond(request, lambda text: {"response": text})
+
+    async def embeddings(self, request: web.Request) -> web.Response:
+        """Hashed bag of words, so transcripts sharing words come out similar"""
+        body = await request.json()
+        vector = np.zeros(64)
+        for word in body.get("prompt", "").lower().split():
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % 64] += 1.0
+        return web.json_response({"embedding": vector.tolist()})
+
+# ---------------------------------------------------------------------------
+# Deepgram
+# ---------------------------------------------------------------------------
+
+class FakeDeepgram:
+    """Deepgram pre-recorded and live listen endpoints returning canned caller phrases"""
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.counter = itertools.count()
+        self.streams = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/v1/projects", self.projects)
+        app.router.add_post("/v1/listen", self.listen)
+        app.router.add_get("/v1/listen", self.listen_live)
+        return app
+
+    def _next_transcript(self) -> str:
+        n = next(self.counter)
+        phrase = CALLER_PHRASES[n % len(CALLER_PHRASES)]
+        return f"{phrase} número {n}" if self.config["unique_transcripts"] else phrase
+
+    @staticmethod
+    def _result(text: str, is_final: bool) -> str:
+        return json.dumps({
+            "type": "Results",
+            "is_final": is_final,
+            "speech_final": is_final,
+            "channel": {"alternatives": [{"transcript": text, "confidence": 0.98}]}
+        })
+
+    async def projects(self, request: web.Request) -> web.Response:
+        return web.json_response({"projects": []})
+
+    async def listen(self, request: web.Request) -> web.Response:
+        await request.read()
+        await asyncio.sleep(self.config["stt_latency_seconds"])
+        transcript = self._next_transcript()
+        return web.json_response({"results": {"channels": [{"alternatives": [{"transcript": transcript}]}]}})
+
+    async def listen_live(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(protocols=("token",))
+        await ws.prepare(request)
+        self.streams += 1
+        transcript = self._next_transcript()
+        words = transcript.split()
+        sample_width = 2 if request.query.get("encoding", "linear16") == "linear16" else 1
+        bytes_per_second = int(request.query.get("sample_rate", SAMPLE_RATE)) * sample_width
+        # The caller's speech is followed by silence; endpointing finalizes the phrase that long into it
+        speech = self.config["speech_seconds"]
+        endpoint = speech + int(request.query.get("endpointing", 0)) / 1000
+        received = 0
+        interims = 0
+        finalized = False
+
+        async for message in ws:
+            if message.type == WSMsgType.BINARY:
+                received += len(message.data)
+                seconds = received / bytes_per_second
+                # An interim result for every stt_interim_seconds of audio, revealing the words spoken so far
+                due = int(seconds / self.config["stt_interim_seconds"])
+                if due > interims and seconds <= speech and request.query.get("interim_results") == "true":
+                    interims = due
+                    spoken = words[:math.ceil(len(words) * seconds / speech)]
+                    await ws.send_str(self._result(" ".join(spoken), False))
+                if endpoint > speech and seconds >= endpoint and not finalized:
+                    finalized = True
+                    await asyncio.sleep(self.config["stt_latency_seconds"])
+                    await ws.send_str(self._result(transcript, True))
+            elif message.type == WSMsgType.TEXT:
+                if json.loads(message.data).get("type") == "CloseStream":
+                    break
+            else:
+                break
+
+        if received and not finalized and not ws.closed:
+            await asyncio.sleep(self.config["stt_latency_seconds"])
+            await ws.send_str(self._result(transcript, True))
+        await ws.close()
+        return ws
+
+# ---------------------------------------------------------------------------
+# ElevenLabs
+# ---------------------------------------------------------------------------
+
+class FakeElevenLabs:
+    """ElevenLabs text-to-speech returning silence at a fixed latency and byte rate"""
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.requests = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/v1/models", self.models)
+        app.router.add_post("/v1/text-to-speech/{voice}", self.synthesize)
+        app.router.add_post("/v1/text-to-speech/{voice}/stream", self.synthesize)
+        return app
+
+    async def models(self, request: web.Request) -> web.Response:
+        return web.json_response([{"model_id": "eleven_multilingual_v2"}])
+
+    def _audio(self, text: str, output_format: str) -> bytes:
+        """Silence as long as the text would take to say, in the requested format"""
+        encoding, _, rate = output_format.partition("_")
+        seconds = max(0.5, len(text) / self.config["tts_chars_per_second"])
+        samples = int(seconds * int(rate or SAMPLE_RATE))
+        if encoding == "pcm":
+            return bytes(samples * 2)
+        # G.711 silence: 0xFF in μ-law, 0xD5 in A-law
+        return (b"\xff" if encoding == "ulaw" else b"\xd5") * samples
+
+    async def synthesize(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        self.requests += 1
+        audio = self._audio(body.get("text", ""), request.query.get("output_format", "ulaw_8000"))
+        await asyncio.sleep(self.config["tts_first_byte_seconds"])
+
+        response = web.StreamResponse(headers={"Content-Type": "audio/basic"})
+        await response.prepare(request)
+        chunk_size = 4096
+        for offset in range(0, len(audio), chunk_size):
+            chunk = audio[offset:offset + chunk_size]
+            await response.write(chunk)
+            await asyncio.sleep(len(chunk) / self.config["tts_byte_rate"])
+        await response.write_eof()
+        return response
+
+# ---------------------------------------------------------------------------
+# Asterisk: simulated callers (AGI client) and AMI
+# ---------------------------------------------------------------------------
+
+def caller_speech(seconds: float) -> np.ndarray:
+    """Voiced-sounding PCM16: a 180 Hz tone with harmonics, well above the VAD threshold"""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    signal = sum(np.sin(2 * np.pi * 180 * k * t) / k for k in (1, 2, 3))
+    return (signal * 6000).astype('<i2')
+
+def playback_seconds(base_path: str):
+    """Duration of the Asterisk-native file STREAM FILE would play; None if there is no such file"""
+    for extension, width in AUDIO_EXTENSIONS.items():
+        path = f"{base_path}.{extension}"
+        if os.path.exists(path):
+            rate = 16000 if extension == "sln16" else SAMPLE_RATE
+            return os.path.getsize(path) / width / rate
+    return None
+
+class SimulatedCaller:
+    """Plays the Asterisk side of one FastAGI session and times the caller's wait for each answer"""
+
+    def __init__(self, config: dict, channel: str, uniqueid: str, send_event=None):
+        """send_event(**fields) emits an AMI event, for TALK_DETECT"""
+        self.config = config
+        self.channel = channel
+        self.uniqueid = uniqueid
+        self.send_event = send_event
+        self.turns = 0
+        self.turn_latencies = []
+        self.playbacks = 0
+        self.system_sounds = 0
+        self.interruptions = 0
+        self.error = None
+        self.talk_detect = False
+        self._talking = False
+        self._playback = None
+        self._recorded_at = None
+
+    async def run(self) -> dict:
+        started = time.monotonic()
+        try:
+            reader, writer = await asyncio.open_connection(self.config["agi_host"], self.config["agi_port"])
+        except OSError as e:
+            self.error = f"agi_connect: {e}"
+            return self.result(started)
+        try:
+            agi_vars = {
+                "agi_network": "yes",
+                "agi_request": f"agi://{self.config['agi_host']}/",
+                "agi_channel": self.channel,
+                "agi_uniqueid": self.uniqueid,
+                "agi_callerid": "paradixe01",
+                "agi_context": "paradixe",
+                "agi_extension": "s"
+            }
+            writer.write(("".join(f"{k}: {v}\n" for k, v in agi_vars.items()) + "\n").encode())
+            await writer.drain()
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                reply = await self.handle(line.decode(errors="ignore").strip())
+                if reply is None:
+                    break
+                writer.write(f"{reply}\n".encode())
+                await writer.drain()
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+        return self.result(started)
+
+    async def handle(self, command: str):
+        """AGI result line for a command; None once the session is over"""
+        scale = self.config["time_scale"]
+        if command == "ANSWER":
+            return "200 result=0"
+        if command.startswith("SET VARIABLE"):
+            if "TALK_DETECT" in command:
+                self.talk_detect = True
+            return "200 result=1"
+        if command.startswith(("STREAM FILE", "CONTROL STREAM FILE")):
+            if self._recorded_at is not None:
+                self.turn_latencies.append(time.monotonic() - self._recorded_at)
+                self._recorded_at = None
+            controllable = command.startswith("CONTROL")
+            base_path = command.split()[3 if controllable else 2]
+            seconds = playback_seconds(base_path)
+            if seconds is None:
+                # A system sound such as the fallback; not one of ours
+                self.system_sounds += 1
+                seconds = 0.5
+                controllable = False
+            self.playbacks += 1
+            played = await self.play(seconds * scale, controllable)
+            # Like Asterisk, keep reading a file that grew while it played (streamed TTS)
+            while played >= seconds * scale * 0.99:
+                grown = playback_seconds(base_path)
+                if not grown or grown <= seconds:
+                    break
+                played += await self.play((grown - seconds) * scale, controllable)
+                seconds = grown
+            return f"200 result=0 endpos={int(played / scale * SAMPLE_RATE) if scale else 0}"
+        if command.startswith("RECORD FILE"):
+            if self.turns >= self.config["turns"]:
+                # The caller hangs up instead of talking again
+                return "HANGUP"
+            self.turns += 1
+            parts = command.split()
+            silence = next((float(p[2:]) for p in parts if p.startswith("s=")), 1.0)
+            await self.speak(parts[2], parts[3], silence)
+            if self._talking:
+                self._talking = False
+                self.send_event(Event="ChannelTalkingStop", Channel=self.channel, Uniqueid=self.uniqueid)
+            self._recorded_at = time.monotonic()
+            return f"200 result=0 (timeout) endpos={int((self.config['speech_seconds'] + silence) * SAMPLE_RATE)}"
+        if command == "HANGUP":
+            return None
+        return "510 Invalid or unknown command"
+
+    async def play(self, seconds: float, controllable: bool) -> float:
+        """Play for the (scaled) seconds and return how long it played
+
+        A caller set to barge in starts talking barge_in_seconds into a controllable playback,
+        which then lasts until AMI stops it or it ends.
+        """
+        barge_in = self.config["barge_in_seconds"] * self.config["time_scale"]
+        if not (controllable and self.talk_detect and self.send_event and 0 < barge_in < seconds):
+            await asyncio.sleep(seconds)
+            return seconds
+        started = time.monotonic()
+        self._playback = asyncio.Event()
+        try:
+            await asyncio.sleep(barge_in)
+            if not self._talking:
+                self._talking = True
+                self.send_event(Event="ChannelTalkingStart", Channel=self.channel, Uniqueid=self.uniqueid)
+            try:
+                await asyncio.wait_for(self._playback.wait(), timeout=seconds - barge_in)
+                self.interruptions += 1
+            except asyncio.TimeoutError:
+                pass
+        finally:
+            self._playback = None
+        return time.monotonic() - started
+
+    def stop_playback(self) -> bool:
+        """AMI ControlPlayback stop; False when nothing controllable is playing"""
+        if self._playback is None or self._playback.is_set():
+            return False
+        self._playback.set()
+        return True
+
+    async def speak(self, base_path: str, audio_format: str, silence_seconds: float) -> None:
+        """Write speech then trailing silence, in real time, the way Asterisk records it"""
+        scale = self.config["time_scale"]
+        audio = np.concatenate((caller_speech(self.config["speech_seconds"]),
+                                np.zeros(int(silence_seconds * SAMPLE_RATE), dtype='<i2')))
+        block = SAMPLE_RATE // 10
+        if audio_format == "wav":
+            await asyncio.sleep(len(audio) / SAMPLE_RATE * scale)
+            with wave.open(f"{base_path}.wav", 'wb') as f:
+                f.setnchannels(1)
+                f.setsampwidth(2)
+                f.setframerate(SAMPLE_RATE)
+                f.writeframes(audio.tobytes())
+            return
+        with open(f"{base_path}.{audio_format}", 'wb') as f:
+            for offset in range(0, len(audio), block):
+                f.write(audio[offset:offset + block].tobytes())
+                f.flush()
+                await asyncio.sleep(block / SAMPLE_RATE * scale)
+
+    def result(self, started: float) -> dict:
+        return {
+            "channel": self.channel,
+            "turns": self.turns,
+            "turn_latencies": self.turn_latencies,
+            "playbacks": self.playbacks,
+            "system_sounds": self.system_sounds,
+            "interruptions": self.interruptions,
+            "duration": time.monotonic() - started,
+            "error": self.error
+        }
+
+class FakeAMI:
+    """Asterisk Manager Interface: answers every Originate and runs a simulated caller on the AGI server"""
+
+    def __init__(self, config: dict, results):
+        self.config = config
+        self.results = results
+        self.call_ids = itertools.count(1)
+        self.tasks = set()
+        # Channel -> its simulated caller, for ControlPlayback
+        self.callers = {}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        writer.write(b"Asterisk Call Manager/5.0.1\r\n")
+        await writer.drain()
+        try:
+            while True:
+                data = await reader.readuntil(b"\r\n\r\n")
+                packet = {}
+                for line in data.decode(errors="ignore").split("\r\n"):
+                    if ": " in line:
+                        key, value = line.split(": ", 1)
+                        packet[key] = value
+                action = packet.get("Action", "")
+                action_id = packet.get("ActionID", "")
+                if action == "Login":
+                    self.send(writer, Response="Success", ActionID=action_id, Message="Authentication accepted")
+                elif action == "Ping":
+                    self.send(writer, Response="Success", ActionID=action_id, Ping="Pong", Timestamp=time.time())
+                elif action == "Originate":
+                    self.send(writer, Response="Success", ActionID=action_id,
+                              Message="Originate successfully queued")
+                    task = asyncio.create_task(self.call(writer, packet))
+                    self.tasks.add(task)
+                    task.add_done_callback(self.tasks.discard)
+                elif action == "ControlPlayback":
+                    caller = self.callers.get(packet.get("Channel"))
+                    if caller and packet.get("Control") == "stop" and caller.stop_playback():
+                        self.send(writer, Response="Success", ActionID=action_id)
+                    else:
+                        self.send(writer, Response="Error", ActionID=action_id, Message="No playback to control")
+                elif action == "Logoff":
+                    self.send(writer, Response="Goodbye", ActionID=action_id, Message="Thanks for all the fish.")
+                    break
+                else:
+                    self.send(writer, Response="Error", ActionID=action_id, Message="Invalid/unknown command")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def send(writer: asyncio.StreamWriter, **fields) -> None:
+        if writer.is_closing():
+            return
+        writer.write(("".join(f"{key}: {value}\r\n" for key, value in fields.items()) + "\r\n").encode())
+
+    async def call(self, writer: asyncio.StreamWriter, originate: dict) -> None:
+        n = next(self.call_ids)
+        channel = f"{originate.get('Channel', 'SIP/bench')}-{n:08x}"
+        uniqueid = f"{time.time():.0f}.{n}"
+        await asyncio.sleep(self.config["answer_seconds"])
+        self.send(writer, Event="OriginateResponse", ActionID=originate.get("ActionID", ""), Response="Success",
+                  Channel=channel, Context=originate.get("Context", ""), Exten=originate.get("Exten", ""),
+                  Reason=4, Uniqueid=uniqueid)
+        caller = self.callers[channel] = SimulatedCaller(self.config, channel, uniqueid,
+                                                         lambda **fields: self.send(writer, **fields))
+        try:
+            result = await caller.run()
+        finally:
+            del self.callers[channel]
+        self.results.put(result)
+        self.send(writer, Event="Hangup", Channel=channel, Uniqueid=uniqueid, Cause=16,
+                  **{"Cause-txt": "Normal Clearing"})
+
+# ---------------------------------------------------------------------------
+# Process entry point
+# ---------------------------------------------------------------------------
+
+async def _serve(config: dict, results, ready, stop) -> None:
+    runners = []
+    for name, provider in (("ollama", FakeOllama(config)), ("deepgram", FakeDeepgram(config)),
+                           ("elevenlabs", FakeElevenLabs(config))):
+        runner = web.AppRunner(provider.app(), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, config["host"], config[f"{name}_port"]).start()
+        runners.append(runner)
+    ami = FakeAMI(config, results)
+    server = await asyncio.start_server(ami.handle, config["host"], config["ami_port"])
+    ready.set()
+    try:
+        while not stop.is_set():
+            await asyncio.sleep(0.1)
+    finally:
+        server.close()
+        for runner in runners:
+            await runner.cleanup()
+
+def serve(config: dict, results, ready, stop) -> None:
+    """Run every stand-in until stop is set; finished calls are put on the results queue"""
+    asyncio.run(_serve({**DEFAULTS, **config}, results, ready, stop))
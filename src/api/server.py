@@ -3,13 +3,19 @@ FastAPI server for SIP AI Call System
 """
 
 import asyncio
+import json
 import logging
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+import os
+import tempfile
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from src.core.config import Config
 from src.services.call_manager import CallManager
+from src.services.dnc import dnc_list
+from src.services.metrics import metrics
+from src.services.number_ingest import INGEST_FORMATS, NumberIngest, detect_format, read_upload
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -25,6 +31,9 @@ app = FastAPI(
 # Global call manager
 call_manager = None
 
+# Comment line sent on idle event streams so proxies keep the connection open
+EVENTS_KEEPALIVE_SECONDS = 15
+
 class CallRequest(BaseModel):
     number: str
     message: str = "Hola, esta es una llamada de prueba"
@@ -67,8 +76,13 @@ async def health_check():
     global call_manager
     if call_manager:
         status = call_manager.get_status()
+        providers = status["providers"]
         return {
-            "status": "healthy",
+            "status": "healthy" if all(p["available"] for p in providers.values()) else "degraded",
+            "providers": {
+                name: {"available": p["available"], "latency_ms": p["latency_ms"]}
+                for name, p in providers.items()
+            },
             "services": status
         }
     else:
@@ -82,42 +96,148 @@ async def get_config():
         "validation": Config.validate()
     }
 
-@app.post("/call")
+@app.post("/call", status_code=202)
 async def make_call(request: CallRequest):
-    """Make a single call"""
+    """Queue a single call and return its ID without waiting for it"""
     global call_manager
     if not call_manager:
         raise HTTPException(status_code=503, detail="Call manager not available")
     
     try:
-        success = await call_manager.make_call(request.number)
+        call = call_manager.jobs.submit_call(request.number)
         return {
-            "success": success,
-            "number": request.number,
-            "message": "Llamada iniciada" if success else "Error iniciando llamada"
+            "success": True,
+            "call_id": call["id"],
+            "number": call["number"],
+            "status_url": f"/calls/{call['id']}",
+            "message": "Llamada en cola"
         }
     except Exception as e:
         logger.error(f"Error en llamada: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/call/batch")
+@app.post("/call/batch", status_code=202)
 async def make_batch_calls(request: NumbersRequest):
-    """Make batch calls"""
+    """Queue a campaign and return its ID without waiting for it"""
     global call_manager
     if not call_manager:
         raise HTTPException(status_code=503, detail="Call manager not available")
     
     try:
-        await call_manager.process_numbers(request.numbers)
+        campaign = call_manager.jobs.submit_campaign(request.numbers)
         return {
             "success": True,
-            "numbers_processed": len(request.numbers),
-            "message": "Llamadas en lote iniciadas"
+            "campaign_id": campaign["id"],
+            "numbers_queued": campaign["total"],
+            "status_url": f"/campaigns/{campaign['id']}",
+            "message": "Llamadas en lote en cola"
         }
     except Exception as e:
         logger.error(f"Error en llamadas en lote: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/call/batch/upload", status_code=202)
+async def upload_batch_calls(request: Request, format: Optional[str] = None):
+    """Stream a plain-text, CSV or NDJSON contact list; dialing starts while it uploads"""
+    global call_manager
+    if not call_manager:
+        raise HTTPException(status_code=503, detail="Call manager not available")
+    
+    ingest_format = format or detect_format(content_type=request.headers.get("content-type", ""))
+    if ingest_format not in INGEST_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {ingest_format}")
+    
+    # The body is spooled to disk and read back as it grows, so memory stays flat for any list size
+    ingest = NumberIngest(ingest_format, suppression=dnc_list)
+    fd, spool_path = tempfile.mkstemp(prefix="eve-upload-", suffix=f".{ingest_format}")
+    uploaded = asyncio.Event()
+    campaign = call_manager.jobs.submit_campaign_stream(ingest.numbers(read_upload(spool_path, uploaded)),
+                                                        ingest.stats)
+    received = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in request.stream():
+                f.write(chunk)
+                f.flush()
+                received += len(chunk)
+    except Exception as e:
+        logger.error(f"Error recibiendo lista de números: {e}")
+        campaign["error"] = f"upload: {e}"
+    finally:
+        uploaded.set()
+    
+    return {
+        "success": "error" not in campaign,
+        "campaign_id": campaign["id"],
+        "bytes_received": received,
+        "format": ingest_format,
+        "status_url": f"/campaigns/{campaign['id']}",
+        "message": "Lista de números recibida, campaña en curso"
+    }
+
+@app.get("/calls/{call_id}")
+async def get_call(call_id: str):
+    """State of one queued, running or finished call"""
+    global call_manager
+    if not call_manager:
+        raise HTTPException(status_code=503, detail="Call manager not available")
+    call = call_manager.jobs.get_call(call_id)
+    if not call:
+        raise HTTPException(status_code=404, detail="Call not found")
+    return call
+
+@app.get("/campaigns/{campaign_id}")
+async def get_campaign(campaign_id: str, offset: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000)):
+    """Campaign progress with one page of its calls"""
+    global call_manager
+    if not call_manager:
+        raise HTTPException(status_code=503, detail="Call manager not available")
+    campaign = call_manager.jobs.get_campaign(campaign_id, offset, limit)
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return campaign
+
+@app.get("/events")
+async def stream_events(call_id: Optional[str] = None, campaign_id: Optional[str] = None):
+    """Server-Sent Events stream of call and campaign state changes"""
+    global call_manager
+    if not call_manager:
+        raise HTTPException(status_code=503, detail="Call manager not available")
+    jobs = call_manager.jobs
+    if call_id and not jobs.get_call(call_id):
+        raise HTTPException(status_code=404, detail="Call not found")
+    if campaign_id and not jobs.get_campaign(campaign_id, limit=0):
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    
+    subscriber = jobs.subscribe(call_id, campaign_id)
+    
+    async def events():
+        try:
+            # Current state first, so a client subscribing late does not wait for a change that already happened
+            snapshot = jobs.get_call(call_id) if call_id else jobs.get_campaign(campaign_id, limit=0) if campaign_id else None
+            if snapshot:
+                kind = "call" if call_id else "campaign"
+                yield f"event: {kind}\ndata: {json.dumps(snapshot)}\n\n"
+                if snapshot["state"] == "completed":
+                    return
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber["queue"].get(), timeout=EVENTS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                data = event["data"]
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(data)}\n\n"
+                # A stream for a single call or campaign ends with it
+                finished = data["state"] == "completed"
+                if finished and data["id"] in (call_id, campaign_id):
+                    break
+        finally:
+            jobs.unsubscribe(subscriber)
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.get("/status")
 async def get_status():
     """Get system status"""
@@ -127,6 +247,32 @@ async def get_status():
     else:
         return {"error": "Call manager not available"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/dnc")
+async def get_dnc():
+    """DNC lists: entries, load time, mapped memory and lookup rate"""
+    return dnc_list.get_stats()
+
+@app.post("/dnc/reload")
+async def reload_dnc():
+    """Reload changed DNC files without restarting; calls keep being checked meanwhile"""
+    try:
+        return await dnc_list.reload()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/routes")
+async def get_routes():
+    """Call routes: active channels, limits and breaker state of each trunk"""
+    global call_manager
+    if not call_manager:
+        raise HTTPException(status_code=503, detail="Call manager not available")
+    return call_manager.router.get_status()
+
 @app.post("/test/ai")
 async def test_ai():
     """Test AI service"""
@@ -153,7 +299,7 @@ async def test_tts():
         raise HTTPException(status_code=503, detail="Call manager not available")
     
     try:
-        audio_data = await call_manager.tts_service.generate_speech("Hola, esta es una prueba de texto a voz.")
+        audio_data = await call_manager.tts_cache.get_audio("Hola, esta es una prueba de texto a voz.")
         return {
             "success": bool(audio_data),
             "audio_size": len(audio_data) if audio_data else 0,
@@ -17,16 +17,196 @@ class Config:
     SIP_PASSWORD = os.environ.get("SIP_PASSWORD", "your_password")
     SIP_PORT = int(os.environ.get("SIP_PORT", "5060"))
     
+    # Asterisk Manager Interface (AMI)
+    AMI_HOST = os.environ.get("AMI_HOST", "localhost")
+    AMI_PORT = int(os.environ.get("AMI_PORT", "5038"))
+    AMI_USERNAME = os.environ.get("AMI_USERNAME", "admin")
+    AMI_SECRET = os.environ.get("AMI_SECRET", "paradixe123")
+    AMI_ACTION_TIMEOUT = float(os.environ.get("AMI_ACTION_TIMEOUT", "10"))
+    AMI_PING_INTERVAL = float(os.environ.get("AMI_PING_INTERVAL", "20"))
+    AMI_RECONNECT_MAX_DELAY = float(os.environ.get("AMI_RECONNECT_MAX_DELAY", "30"))
+    AMI_ORIGINATE_TIMEOUT = int(os.environ.get("AMI_ORIGINATE_TIMEOUT", "30"))
+    AMI_READ_LIMIT = int(os.environ.get("AMI_READ_LIMIT", "1048576"))
+    # Originate target when no ROUTES_FILE is set; {number} is the dialed number
+    AMI_ORIGINATE_CHANNEL = os.environ.get("AMI_ORIGINATE_CHANNEL", "SIP/paradixe01/{number}")
+    AMI_ORIGINATE_CONTEXT = os.environ.get("AMI_ORIGINATE_CONTEXT", "paradixe")
+    AMI_CALLER_ID = os.environ.get("AMI_CALLER_ID", "paradixe01")
+    
+    # Call routing: JSON file with several AMI servers and trunks, each with its own channels,
+    # CPS and number prefixes; a route failing ROUTE_FAILURE_THRESHOLD calls in a row leaves
+    # the rotation for ROUTE_RESET_TIMEOUT seconds
+    ROUTES_FILE = os.environ.get("ROUTES_FILE", "")
+    ROUTE_FAILURE_THRESHOLD = int(os.environ.get("ROUTE_FAILURE_THRESHOLD", "5"))
+    ROUTE_RESET_TIMEOUT = float(os.environ.get("ROUTE_RESET_TIMEOUT", "60"))
+    
+    # Campaign Dialer
+    DIALER_MAX_CHANNELS = int(os.environ.get("DIALER_MAX_CHANNELS", "10"))
+    DIALER_CPS = float(os.environ.get("DIALER_CPS", "1"))
+    DIALER_EVENT_GRACE = float(os.environ.get("DIALER_EVENT_GRACE", "15"))
+    DIALER_MAX_CALL_DURATION = float(os.environ.get("DIALER_MAX_CALL_DURATION", "900"))
+    
+    # Contact list ingest: numbers are normalized to E.164 and deduped before dialing
+    NUMBERS_DEFAULT_COUNTRY_CODE = os.environ.get("NUMBERS_DEFAULT_COUNTRY_CODE", "57")
+    NUMBERS_NATIONAL_LENGTH = int(os.environ.get("NUMBERS_NATIONAL_LENGTH", "10"))
+    NUMBERS_FILE = os.environ.get("NUMBERS_FILE", "data/numbers.txt")
+    INGEST_READ_BYTES = int(os.environ.get("INGEST_READ_BYTES", str(256 * 1024)))
+    INGEST_BATCH_SIZE = int(os.environ.get("INGEST_BATCH_SIZE", "10000"))
+    # Numbers buffered ahead of the dialer; a full queue pauses reading (backpressure)
+    INGEST_QUEUE_SIZE = int(os.environ.get("INGEST_QUEUE_SIZE", "1000"))
+    
+    # Do-not-call suppression: comma-separated DNC files or directories (text, CSV or NDJSON)
+    DNC_FILES = os.environ.get("DNC_FILES", "")
+    # Sorted arrays built from the DNC files, memory-mapped for lookups
+    DNC_CACHE_DIR = os.environ.get("DNC_CACHE_DIR", "data/dnc_cache")
+    # How often DNC files are checked for changes (0 disables; POST /dnc/reload reloads on demand)
+    DNC_RELOAD_INTERVAL = float(os.environ.get("DNC_RELOAD_INTERVAL", "60"))
+    
+    # Durable campaign queue (SQLite in WAL mode): resumes after a restart and retries by outcome
+    CAMPAIGN_DB_PATH = os.environ.get("CAMPAIGN_DB_PATH", "data/campaigns.db")
+    # A worker renews its leases every third of this; numbers of a worker that stopped return after it
+    CAMPAIGN_LEASE_SECONDS = float(os.environ.get("CAMPAIGN_LEASE_SECONDS", "60"))
+    CAMPAIGN_MAX_ATTEMPTS = int(os.environ.get("CAMPAIGN_MAX_ATTEMPTS", "3"))
+    # Base retry delay in seconds by outcome, doubled on each attempt; outcomes not listed are final
+    CAMPAIGN_RETRY_BACKOFF = os.environ.get("CAMPAIGN_RETRY_BACKOFF", "busy:300,no_answer:900,failed:120")
+    CAMPAIGN_RETRY_MAX_DELAY = float(os.environ.get("CAMPAIGN_RETRY_MAX_DELAY", "3600"))
+    # Results are written in batches: when this many are waiting or every CAMPAIGN_FLUSH_INTERVAL
+    CAMPAIGN_WRITE_BATCH = int(os.environ.get("CAMPAIGN_WRITE_BATCH", "500"))
+    CAMPAIGN_FLUSH_INTERVAL = float(os.environ.get("CAMPAIGN_FLUSH_INTERVAL", "0.5"))
+    CAMPAIGN_POLL_INTERVAL = float(os.environ.get("CAMPAIGN_POLL_INTERVAL", "1"))
+    
+    # Background call jobs (API)
+    CALL_JOBS_MAX_RECORDS = int(os.environ.get("CALL_JOBS_MAX_RECORDS", "100000"))
+    # Finished campaign summaries (state, counts, timestamps) kept for polling, independent of their calls
+    CALL_JOBS_MAX_CAMPAIGNS = int(os.environ.get("CALL_JOBS_MAX_CAMPAIGNS", "1000"))
+    CALL_EVENTS_QUEUE_SIZE = int(os.environ.get("CALL_EVENTS_QUEUE_SIZE", "1000"))
+    
     # Deepgram STT
     DEEPGRAM_API_KEY = os.environ.get("DEEPGRAM_API_KEY", "")
+    DEEPGRAM_BASE_URL = os.environ.get("DEEPGRAM_BASE_URL", "https://api.deepgram.com/v1")
+    DEEPGRAM_TIMEOUT = float(os.environ.get("DEEPGRAM_TIMEOUT", "30"))
+    DEEPGRAM_WS_URL = os.environ.get("DEEPGRAM_WS_URL", "wss://api.deepgram.com/v1/listen")
+    DEEPGRAM_ENDPOINTING_MS = int(os.environ.get("DEEPGRAM_ENDPOINTING_MS", "300"))
+    
+    # Caller turn recording
+    STT_STREAMING = os.environ.get("STT_STREAMING", "true").lower() == "true"
+    RECORD_MAX_SECONDS = int(os.environ.get("RECORD_MAX_SECONDS", "10"))
+    RECORD_SILENCE_SECONDS = int(os.environ.get("RECORD_SILENCE_SECONDS", "3"))
+    # Deepgram endpointing finalizes the transcript, so streaming turns can stop on a shorter silence
+    STT_STREAM_SILENCE_SECONDS = int(os.environ.get("STT_STREAM_SILENCE_SECONDS", "1"))
+    
+    # Voice activity detection
+    VAD_ENABLED = os.environ.get("VAD_ENABLED", "true").lower() == "true"
+    VAD_FRAME_MS = int(os.environ.get("VAD_FRAME_MS", "20"))
+    VAD_ENERGY_THRESHOLD_DB = float(os.environ.get("VAD_ENERGY_THRESHOLD_DB", "-45"))
+    VAD_ZCR_THRESHOLD = float(os.environ.get("VAD_ZCR_THRESHOLD", "0.25"))
+    VAD_MIN_SPEECH_MS = int(os.environ.get("VAD_MIN_SPEECH_MS", "100"))
+    VAD_PADDING_MS = int(os.environ.get("VAD_PADDING_MS", "200"))
     
     # ElevenLabs TTS
     ELEVENLABS_API_KEY = os.environ.get("ELEVENLABS_API_KEY", "")
     ELEVENLABS_VOICE_ID = os.environ.get("ELEVENLABS_VOICE_ID", "")
+    ELEVENLABS_BASE_URL = os.environ.get("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io/v1")
+    ELEVENLABS_TIMEOUT = float(os.environ.get("ELEVENLABS_TIMEOUT", "30"))
+    ELEVENLABS_STREAM_LATENCY = int(os.environ.get("ELEVENLABS_STREAM_LATENCY", "2"))
+    TTS_STREAM_CHUNK_SIZE = int(os.environ.get("TTS_STREAM_CHUNK_SIZE", "4096"))
+    # Play a new synthesis while it is still streamed to disk instead of after it completes
+    TTS_STREAM_PLAYBACK = os.environ.get("TTS_STREAM_PLAYBACK", "true").lower() == "true"
+    # ElevenLabs format (ulaw_8000, alaw_8000 or pcm_<rate>); ulaw_8000 needs no conversion on a ulaw channel
+    TTS_OUTPUT_FORMAT = os.environ.get("TTS_OUTPUT_FORMAT", "ulaw_8000")
+    # Asterisk-native format TTS audio is normalized to: ulaw, alaw, sln or sln16
+    CHANNEL_CODEC = os.environ.get("CHANNEL_CODEC", "ulaw")
     
-    # Ollama AI - Always use localhost for Ollama
-    OLLAMA_HOST = "http://localhost:11434"
+    # TTS audio cache
+    TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR", "data/tts_cache")
+    TTS_CACHE_MEMORY_BYTES = int(os.environ.get("TTS_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+    TTS_CACHE_DISK_BYTES = int(os.environ.get("TTS_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+    WELCOME_TEXT = os.environ.get("WELCOME_TEXT", "Hola, soy tu asistente virtual. ¿En qué puedo ayudarte?")
+    TTS_PREWARM_PHRASES = [
+        phrase.strip() for phrase in os.environ.get(
+            "TTS_PREWARM_PHRASES",
+            f"{WELCOME_TEXT}|Lo siento, hay un problema técnico.|Lo siento, no pude procesar tu solicitud."
+        ).split("|") if phrase.strip()
+    ]
+    
+    # Ollama AI - runs on the same host unless pointed elsewhere (e.g. a benchmark stand-in)
+    OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
     OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "llama2")
+    OLLAMA_TIMEOUT = float(os.environ.get("OLLAMA_TIMEOUT", "30"))
+    OLLAMA_SYSTEM_PROMPT = os.environ.get(
+        "OLLAMA_SYSTEM_PROMPT",
+        "Eres un asistente telefónico amigable. Responde de manera natural, útil y breve, en una o dos frases."
+    )
+    OLLAMA_NUM_PREDICT = int(os.environ.get("OLLAMA_NUM_PREDICT", "150"))
+    OLLAMA_HISTORY_TOKENS = int(os.environ.get("OLLAMA_HISTORY_TOKENS", "1024"))
+    # How long Ollama keeps the model loaded after a request ("-1" pins it in memory)
+    OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "-1")
+    OLLAMA_WARMUP_ENABLED = os.environ.get("OLLAMA_WARMUP_ENABLED", "true").lower() == "true"
+    OLLAMA_WARMUP_INTERVAL = float(os.environ.get("OLLAMA_WARMUP_INTERVAL", "60"))
+    
+    # AI response cache (set RESPONSE_CACHE_EMBED_MODEL, e.g. nomic-embed-text, for similarity lookups)
+    RESPONSE_CACHE_ENABLED = os.environ.get("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+    RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "3600"))
+    RESPONSE_CACHE_EMBED_MODEL = os.environ.get("RESPONSE_CACHE_EMBED_MODEL", "")
+    RESPONSE_CACHE_SIMILARITY = float(os.environ.get("RESPONSE_CACHE_SIMILARITY", "0.92"))
+    
+    # Streaming LLM-to-TTS pipeline
+    PIPELINE_STREAMING = os.environ.get("PIPELINE_STREAMING", "true").lower() == "true"
+    PIPELINE_MIN_CLAUSE_CHARS = int(os.environ.get("PIPELINE_MIN_CLAUSE_CHARS", "40"))
+    PIPELINE_MAX_CHUNK_CHARS = int(os.environ.get("PIPELINE_MAX_CHUNK_CHARS", "200"))
+    PIPELINE_MAX_PENDING = int(os.environ.get("PIPELINE_MAX_PENDING", "4"))
+    
+    # Barge-in: the caller talking over the AI stops its playback (TALK_DETECT events over AMI).
+    # BARGE_IN_TALK_THRESHOLD is the Asterisk DSP energy level counted as talking
+    BARGE_IN_ENABLED = os.environ.get("BARGE_IN_ENABLED", "false").lower() == "true"
+    BARGE_IN_MIN_SPEECH_MS = int(os.environ.get("BARGE_IN_MIN_SPEECH_MS", "300"))
+    BARGE_IN_TALK_THRESHOLD = int(os.environ.get("BARGE_IN_TALK_THRESHOLD", "256"))
+    
+    # Speculative generation: Ollama starts from interim transcripts (needs STT_STREAMING).
+    # SPECULATIVE_STABLE_MS should exceed the gap between interim results while the caller talks;
+    # SPECULATIVE_MAX_WASTED caps the generations each call may throw away
+    SPECULATIVE_ENABLED = os.environ.get("SPECULATIVE_ENABLED", "false").lower() == "true"
+    SPECULATIVE_STABLE_MS = int(os.environ.get("SPECULATIVE_STABLE_MS", "600"))
+    SPECULATIVE_SIMILARITY = float(os.environ.get("SPECULATIVE_SIMILARITY", "0.9"))
+    SPECULATIVE_MAX_WASTED = int(os.environ.get("SPECULATIVE_MAX_WASTED", "2"))
+    
+    # Latency masking: a short acknowledgement plays after the caller's turn when the answer's
+    # first audio is expected to take longer than FILLER_THRESHOLD_MS
+    FILLER_ENABLED = os.environ.get("FILLER_ENABLED", "false").lower() == "true"
+    FILLER_THRESHOLD_MS = int(os.environ.get("FILLER_THRESHOLD_MS", "700"))
+    FILLER_PHRASES = [
+        phrase.strip() for phrase in os.environ.get("FILLER_PHRASES", "Mm-hm.|Déjame ver.|Claro.").split("|")
+        if phrase.strip()
+    ]
+    
+    # Shared HTTP client pool
+    HTTP_POOL_LIMIT = int(os.environ.get("HTTP_POOL_LIMIT", "100"))
+    HTTP_POOL_LIMIT_PER_HOST = int(os.environ.get("HTTP_POOL_LIMIT_PER_HOST", "30"))
+    HTTP_DNS_CACHE_TTL = int(os.environ.get("HTTP_DNS_CACHE_TTL", "300"))
+    HTTP_KEEPALIVE_TIMEOUT = float(os.environ.get("HTTP_KEEPALIVE_TIMEOUT", "60"))
+    HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5"))
+    HTTP_DEFAULT_TIMEOUT = float(os.environ.get("HTTP_DEFAULT_TIMEOUT", "30"))
+    
+    # FastAGI Server
+    AGI_SERVER_ENABLED = os.environ.get("AGI_SERVER_ENABLED", "true").lower() == "true"
+    AGI_HOST = os.environ.get("AGI_HOST", "0.0.0.0")
+    AGI_PORT = int(os.environ.get("AGI_PORT", "4573"))
+    AGI_MAX_CALLS = int(os.environ.get("AGI_MAX_CALLS", "500"))
+    # SO_REUSEPORT: several processes listen on AGI_PORT and the kernel spreads the connections
+    AGI_REUSE_PORT = os.environ.get("AGI_REUSE_PORT", "false").lower() == "true"
+    
+    # Worker mode: WORKERS > 1 runs that many processes, each with its own event loop and services,
+    # dialing the stored campaign; DIALER_MAX_CHANNELS and DIALER_CPS are split between them
+    WORKERS = int(os.environ.get("WORKERS", "1"))
+    WORKER_RESTART_DELAY = float(os.environ.get("WORKER_RESTART_DELAY", "2"))
+    
+    # Provider health monitoring
+    HEALTH_PROBE_INTERVAL = float(os.environ.get("HEALTH_PROBE_INTERVAL", "15"))
+    HEALTH_PROBE_TIMEOUT = float(os.environ.get("HEALTH_PROBE_TIMEOUT", "5"))
+    HEALTH_CACHE_TTL = float(os.environ.get("HEALTH_CACHE_TTL", "60"))
+    BREAKER_FAILURE_THRESHOLD = int(os.environ.get("BREAKER_FAILURE_THRESHOLD", "3"))
+    BREAKER_RESET_TIMEOUT = float(os.environ.get("BREAKER_RESET_TIMEOUT", "30"))
+    FALLBACK_SOUND = os.environ.get("FALLBACK_SOUND", "an-error-has-occured")
     
     # Server Configuration
     HOST = os.environ.get("HOST", "0.0.0.0")
@@ -56,6 +236,15 @@ class Config:
         if not cls.ELEVENLABS_VOICE_ID:
             errors.append("ELEVENLABS_VOICE_ID not configured")
         
+        if cls.ROUTES_FILE and not os.path.exists(cls.ROUTES_FILE):
+            errors.append(f"ROUTES_FILE not found: {cls.ROUTES_FILE}")
+        
+        if cls.CHANNEL_CODEC not in ("ulaw", "alaw", "sln", "sln16"):
+            errors.append(f"CHANNEL_CODEC not supported: {cls.CHANNEL_CODEC}")
+        
+        if cls.TTS_OUTPUT_FORMAT.split("_")[0] not in ("ulaw", "alaw", "pcm"):
+            errors.append(f"TTS_OUTPUT_FORMAT not supported: {cls.TTS_OUTPUT_FORMAT}")
+        
         return {"errors": errors, "valid": len(errors) == 0}
     
     @classmethod
@@ -71,6 +260,16 @@ class Config:
                 "host": cls.OLLAMA_HOST,
                 "model": cls.OLLAMA_MODEL
             },
+            "agi": {
+                "host": cls.AGI_HOST,
+                "port": cls.AGI_PORT,
+                "max_calls": cls.AGI_MAX_CALLS
+            },
+            "dialer": {
+                "max_channels": cls.DIALER_MAX_CHANNELS,
+                "cps": cls.DIALER_CPS,
+                "routes_file": cls.ROUTES_FILE or None
+            },
             "server": {
                 "host": cls.HOST,
                 "port": cls.PORT,
@@ -7,9 +7,9 @@ import logging
 import signal
 import sys
 import os
-from typing import List
 from src.core.config import Config
 from src.services.call_manager import CallManager
+from src.services.worker_pool import WorkerPool
 
 # Configure logging
 logging.basicConfig(
@@ -23,6 +23,8 @@ class SIPAIApplication:
     
     def __init__(self):
         self.call_manager = CallManager()
+        # With WORKERS > 1 calls run in worker processes and this one only supervises them
+        self.worker_pool = WorkerPool() if Config.WORKERS > 1 else None
         self.is_running = False
         self.shutdown_event = asyncio.Event()
         
@@ -57,6 +59,10 @@ class SIPAIApplication:
             logger.info(f"  AI: {config_summary['ai']['host']} ({config_summary['ai']['model']})")
             logger.info(f"  Server: {config_summary['server']['host']}:{config_summary['server']['port']}")
             
+            if self.worker_pool:
+                logger.info(f"👷 Modo workers: {self.worker_pool.workers} procesos")
+                return True
+            
             # Initialize call manager
             if not await self.call_manager.initialize():
                 logger.error("❌ Error inicializando Call Manager")
@@ -75,14 +81,18 @@ class SIPAIApplication:
         self.is_running = True
         
         try:
-            # Read numbers from file
-            numbers = await self._read_numbers_file()
-            if numbers:
-                logger.info(f"📞 Procesando {len(numbers)} números...")
-                await self.call_manager.process_numbers(numbers)
+            if self.worker_pool:
+                await self.worker_pool.serve(Config.NUMBERS_FILE, self.shutdown_event)
+                return
+            
+            # Dial numbers as they are read from the file
+            if os.path.exists(Config.NUMBERS_FILE):
+                counts = await self.call_manager.process_numbers_file(Config.NUMBERS_FILE)
+                if not counts:
+                    logger.info("📞 No se encontraron números para procesar")
+                    logger.info(f"📝 Agrega números en {Config.NUMBERS_FILE}")
             else:
-                logger.info("📞 No se encontraron números para procesar")
-                logger.info("📝 Agrega números en numbers.txt")
+                logger.warning(f"⚠️ Archivo {Config.NUMBERS_FILE} no encontrado")
             
             # Keep running until shutdown
             while self.is_running and not self.shutdown_event.is_set():
@@ -95,25 +105,12 @@ class SIPAIApplication:
         finally:
             await self.shutdown()
     
-    async def _read_numbers_file(self) -> List[str]:
-        """Read numbers from data/numbers.txt file"""
-        try:
-            if os.path.exists("data/numbers.txt"):
-                with open("data/numbers.txt", "r") as f:
-                    numbers = [line.strip() for line in f.readlines() if line.strip()]
-                return numbers
-            else:
-                logger.warning("⚠️ Archivo data/numbers.txt no encontrado")
-                return []
-        except Exception as e:
-            logger.error(f"❌ Error leyendo data/numbers.txt: {e}")
-            return []
-    
     async def shutdown(self) -> None:
         """Shutdown the application"""
         logger.info("🛑 Cerrando aplicación...")
         self.is_running = False
-        await self.call_manager.shutdown()
+        if not self.worker_pool:
+            await self.call_manager.shutdown()
         logger.info("✅ Aplicación cerrada correctamente")
 
 async def main():
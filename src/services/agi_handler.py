@@ -0,0 +1,498 @@
+"""
+AGI Handler for Asterisk - AI Call Processing
+"""
+
+import asyncio
+import logging
+import os
+import re
+import tempfile
+import time
+import uuid
+from typing import AsyncIterator, Optional
+from src.services.stt_service import STTService
+from src.services.tts_service import TTSService
+from src.services.ai_service import AIService
+from src.services.tts_cache import TTSCache
+from src.services.response_cache import ResponseCache
+from src.services.barge_in import BargeIn
+from src.services.filler import FillerAudio
+from src.services.speculation import Speculator
+from src.services.health_monitor import health_monitor
+from src.services.pipeline import ResponsePipeline
+from src.services.conversation import ConversationSession
+from src.services.metrics import metrics
+from src.utils.vad import SpeechGate, VoiceActivityDetector, decode_wav, encode_wav
+from src.utils.codec import CHANNEL_CODECS
+from src.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Asterisk "sln" recordings are headerless 16-bit 8 kHz PCM, so they can be streamed while written
+STREAM_RECORD_FORMAT = "sln"
+STREAM_SAMPLE_RATE = 8000
+STREAM_CHUNK_BYTES = 1600
+STREAM_POLL_INTERVAL = 0.02
+PLAYBACK_END_POSITION = re.compile(r"endpos=(\d+)")
+
+class AGIHangup(Exception):
+    """Raised when the channel hangs up or the AGI connection closes"""
+
+class CallerInterrupted(Exception):
+    """Raised when the caller talks over the AI's playback (barge-in)"""
+
+class AGIHandler:
+    """Handles a single AGI session over an asyncio stream"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 stt_service: STTService, tts_service: TTSService, ai_service: AIService,
+                 tts_cache: TTSCache, response_cache: ResponseCache, barge_in: Optional[BargeIn] = None,
+                 filler: Optional[FillerAudio] = None):
+        self.reader = reader
+        self.writer = writer
+        self.stt_service = stt_service
+        self.tts_service = tts_service
+        self.ai_service = ai_service
+        self.tts_cache = tts_cache
+        self.response_cache = response_cache
+        self.barge_in = barge_in
+        # Caller speech watch of this channel while barge-in is on
+        self.watch = None
+        self.filler = filler
+        # Acknowledgement playing while the current answer is prepared
+        self.filler_playback = None
+        # Speculative head start of the current generated answer, for the filler's latency estimate
+        self.turn_head_start = None
+        self.pipeline = ResponsePipeline(ai_service, tts_cache)
+        self.session = ConversationSession()
+        # Answers generated from interim transcripts, while the caller is still talking
+        self.speculator = Speculator(ai_service, self.session) \
+            if Config.SPECULATIVE_ENABLED and Config.STT_STREAMING else None
+        self.agi_vars = {}
+        self.hung_up = False
+        self.trace = None
+        # When the current turn's transcript was ready, until its first audio plays
+        self.turn_started = None
+
+    async def read_agi_vars(self):
+        """Read AGI variables sent by Asterisk at session start"""
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                raise AGIHangup("Conexión AGI cerrada")
+            line = line.decode(errors="ignore").strip()
+            if line == "":
+                break
+            if ":" in line:
+                key, value = line.split(":", 1)
+                self.agi_vars[key.strip()] = value.strip()
+
+    async def send_agi_command(self, command: str):
+        """Send command to Asterisk"""
+        if self.hung_up:
+            raise AGIHangup("Canal colgado")
+        self.writer.write(f"{command}\n".encode())
+        await self.writer.drain()
+
+    async def get_agi_response(self) -> str:
+        """Get response from Asterisk"""
+        line = await self.reader.readline()
+        if not line:
+            self.hung_up = True
+            raise AGIHangup("Conexión AGI cerrada")
+        response = line.decode(errors="ignore").strip()
+        # FastAGI notifies a hangup with a bare HANGUP line before the command result
+        if response == "HANGUP":
+            self.hung_up = True
+            raise AGIHangup("Canal colgado")
+        return response
+
+    async def process_call(self):
+        """Main call processing logic"""
+        try:
+            logger.info("🎤 Iniciando procesamiento de llamada AGI")
+
+            # Get call information
+            caller_id = self.agi_vars.get('agi_callerid', 'Unknown')
+            channel = self.agi_vars.get('agi_channel', 'Unknown')
+
+            logger.info(f"📞 Llamada de: {caller_id} en canal: {channel}")
+            self.trace = metrics.start_trace(channel)
+
+            # Answer the call
+            await self.send_agi_command("ANSWER")
+            response = await self.get_agi_response()
+            logger.info(f"Respuesta ANSWER: {response}")
+
+            if self.barge_in:
+                await self.enable_barge_in(channel)
+
+            # Play welcome message; the caller may talk over it
+            try:
+                await self.play_ai_response(Config.WELCOME_TEXT)
+            except CallerInterrupted:
+                pass
+            self.session.add_assistant(Config.WELCOME_TEXT)
+
+            # Main conversation loop
+            conversation_rounds = 0
+            max_rounds = 5
+
+            while conversation_rounds < max_rounds:
+                self.trace.turn = conversation_rounds + 1
+
+                # Record and transcribe the caller's turn
+                transcript = await self.listen()
+                if not transcript:
+                    logger.warning("⚠️ No se pudo transcribir audio")
+                    if not health_monitor.is_healthy("deepgram"):
+                        await self.play_fallback()
+                    break
+
+                logger.info(f"👤 Usuario dice: {transcript}")
+
+                turn_started = self.turn_started = time.monotonic()
+                responded = await self.respond(transcript)
+                metrics.observe("response", time.monotonic() - turn_started)
+                self.turn_started = None
+                if not responded:
+                    break
+
+                conversation_rounds += 1
+
+            # End call
+            await self.send_agi_command("HANGUP")
+            logger.info("✅ Llamada finalizada")
+
+        except AGIHangup:
+            logger.info("📴 El usuario colgó la llamada")
+        except Exception as e:
+            logger.error(f"❌ Error en procesamiento AGI: {e}")
+            try:
+                await self.send_agi_command("HANGUP")
+            except Exception:
+                pass
+        finally:
+            if self.filler_playback:
+                self.filler_playback.cancel()
+            if self.speculator:
+                self.speculator.discard()
+            if self.watch:
+                self.barge_in.unwatch(self.watch)
+            if self.trace:
+                metrics.finish_trace(self.trace)
+
+    async def respond(self, transcript: str) -> bool:
+        """Answer one caller turn; False when no response could be produced
+
+        If the caller talks over the answer, the rest of it is neither generated, synthesized
+        nor played, and the turn ends so the caller is recorded right away.
+        """
+        try:
+            return await self._respond(transcript)
+        except CallerInterrupted:
+            # A cut-short answer is not cached: the next caller would get it whole
+            logger.info("✋ Respuesta interrumpida, escuchando al usuario")
+            return True
+
+    async def _respond(self, transcript: str) -> bool:
+        chunks = await self.response_cache.get(transcript)
+        if chunks:
+            if self.speculator:
+                # Answered from the cache, the speculative generation is not needed
+                self.speculator.discard()
+            # Chunks were synthesized before, so their audio comes straight from the TTS cache
+            self.session.record_turn(transcript, " ".join(chunks))
+            for chunk in chunks:
+                await self.play_ai_response(chunk)
+            return True
+
+        # A generation started from the interim transcript, if it still fits the final one
+        speculation = self.speculator.take(transcript) if self.speculator else None
+        if self.filler:
+            self.turn_head_start = speculation.head_start if speculation else 0.0
+            if self.filler.should_play(self.turn_head_start):
+                # Played while the answer is generated; the answer's first audio waits for it to end
+                self.filler_playback = asyncio.create_task(self.play_filler())
+        try:
+            if Config.PIPELINE_STREAMING:
+                # Generate, synthesize and play sentence by sentence
+                ai_response = await self.pipeline.run(
+                    transcript, self.play_file, self.session,
+                    tokens=speculation.stream(transcript) if speculation else None
+                )
+                chunks = self.pipeline.last_chunks
+            elif speculation:
+                ai_response = await speculation.result(transcript)
+                chunks = [ai_response]
+            else:
+                # Generate AI response
+                ai_response = await self.ai_service.generate_response(transcript, self.session)
+                chunks = [ai_response]
+        finally:
+            if speculation:
+                speculation.cancel()
+            self.turn_head_start = None
+            # Never cut: an AGI command cannot be abandoned halfway, and the filler is short
+            await self._finish_filler()
+
+        if not ai_response:
+            logger.warning("⚠️ No se pudo generar respuesta AI")
+            await self.play_fallback()
+            return False
+
+        if not Config.PIPELINE_STREAMING:
+            logger.info(f"🤖 AI responde: {ai_response}")
+
+            # Play AI response
+            await self.play_ai_response(ai_response)
+
+        await self.response_cache.put(transcript, chunks)
+        return True
+
+    async def enable_barge_in(self, channel: str) -> None:
+        """Turn on caller speech events for the channel, so playback stops when the caller talks"""
+        await self.send_agi_command(self.barge_in.talk_detect_command())
+        response = await self.get_agi_response()
+        if "200" in response and "result=1" in response:
+            self.watch = self.barge_in.watch(channel)
+        else:
+            logger.warning(f"⚠️ TALK_DETECT no disponible, llamada sin barge-in: {response}")
+
+    def _recording_base(self) -> str:
+        """Temporary recording path without extension; Asterisk appends the format"""
+        return os.path.join(tempfile.gettempdir(), f"agi-turn-{uuid.uuid4().hex}")
+
+    async def _record(self, base_path: str, audio_format: str, silence_seconds: int) -> bool:
+        """Run RECORD FILE until the caller stops talking, presses # or hits the time limit"""
+        with metrics.timer("record", "asterisk"):
+            await self.send_agi_command(
+                f"RECORD FILE {base_path} {audio_format} # {Config.RECORD_MAX_SECONDS * 1000} s={silence_seconds}"
+            )
+            response = await self.get_agi_response()
+        if "200" not in response or "result=-1" in response:
+            logger.error(f"❌ Error grabando audio: {response}")
+            return False
+        return True
+
+    async def listen(self) -> Optional[str]:
+        """Capture the caller's turn and return its transcript"""
+        if Config.STT_STREAMING:
+            return await self.listen_streaming()
+        user_audio = await self.record_user_input()
+        if not user_audio:
+            logger.warning("⚠️ No se pudo grabar audio del usuario")
+            return None
+        if Config.VAD_ENABLED:
+            user_audio = self._trim_silence(user_audio)
+            if not user_audio:
+                return None
+        with metrics.timer("stt", "deepgram"):
+            return await self.stt_service.transcribe_audio(user_audio)
+
+    def _trim_silence(self, audio_data: bytes) -> Optional[bytes]:
+        """Drop leading and trailing silence; None when the turn has no speech"""
+        try:
+            samples, sample_rate = decode_wav(audio_data)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo analizar la voz del turno: {e}")
+            return audio_data
+        with metrics.timer("vad"):
+            turn = VoiceActivityDetector(sample_rate).trim(samples)
+        logger.info(f"🗣️ Voz en el turno: {turn['speech_seconds']:.2f}s de {turn['total_seconds']:.2f}s")
+        if not turn["has_speech"]:
+            logger.info("🔇 Turno sin voz, se omite la transcripción")
+            return None
+        return encode_wav(turn["samples"], sample_rate)
+
+    async def listen_streaming(self) -> Optional[str]:
+        """Stream the recording to Deepgram while the caller is still speaking"""
+        base_path = self._recording_base()
+        audio_path = f"{base_path}.{STREAM_RECORD_FORMAT}"
+        recorded = asyncio.Event()
+        audio = self._tail_recording(audio_path, recorded)
+        gate = None
+        if Config.VAD_ENABLED:
+            # Leading silence is held back, so a silent turn never reaches Deepgram
+            gate = SpeechGate(VoiceActivityDetector(STREAM_SAMPLE_RATE))
+            audio = gate.filter(audio)
+        if self.speculator:
+            self.speculator.start_turn()
+        transcription = asyncio.create_task(self.stt_service.transcribe_stream(
+            audio,
+            sample_rate=STREAM_SAMPLE_RATE,
+            on_transcript=self._on_transcript
+        ))
+        try:
+            ok = await self._record(base_path, STREAM_RECORD_FORMAT, Config.STT_STREAM_SILENCE_SECONDS)
+            recorded.set()
+            if not ok:
+                transcription.cancel()
+                return None
+            # Audio was sent while recording, so only the final results are still pending
+            with metrics.timer("stt", "deepgram"):
+                transcript = await transcription
+            if gate:
+                metrics.observe("vad", gate.processing_seconds)
+                logger.info(f"🗣️ Voz en el turno: {gate.speech_seconds:.2f}s de {gate.total_seconds:.2f}s")
+            return transcript
+        finally:
+            recorded.set()
+            if not transcription.done():
+                transcription.cancel()
+            try:
+                os.unlink(audio_path)
+            except OSError:
+                pass
+
+    async def _tail_recording(self, path: str, recorded: asyncio.Event) -> AsyncIterator[bytes]:
+        """Yield audio appended to a recording while Asterisk is still writing it"""
+        audio_file = None
+        try:
+            while True:
+                # Checked before reading: once set, Asterisk has flushed the whole file
+                finished = recorded.is_set()
+                if audio_file is None and os.path.exists(path):
+                    audio_file = open(path, 'rb')
+                chunk = audio_file.read(STREAM_CHUNK_BYTES) if audio_file else b""
+                if chunk:
+                    yield chunk
+                    continue
+                if finished:
+                    break
+                await asyncio.sleep(STREAM_POLL_INTERVAL)
+        finally:
+            if audio_file:
+                audio_file.close()
+
+    def _on_transcript(self, text: str, is_final: bool, speech_final: bool) -> None:
+        if self.speculator:
+            self.speculator.on_transcript(text, is_final, speech_final)
+        if speech_final:
+            logger.info("🔚 Fin de turno detectado por Deepgram")
+        elif not is_final:
+            logger.debug(f"🎤 Parcial: {text}")
+
+    async def record_user_input(self) -> Optional[bytes]:
+        """Record audio from user"""
+        base_path = self._recording_base()
+        audio_path = f"{base_path}.wav"
+        try:
+            if not await self._record(base_path, "wav", Config.RECORD_SILENCE_SECONDS):
+                return None
+
+            # Read the recorded file
+            with open(audio_path, 'rb') as f:
+                audio_data = f.read()
+
+            logger.info(f"🎤 Audio grabado: {len(audio_data)} bytes")
+            return audio_data
+
+        except AGIHangup:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Error en grabación: {e}")
+            return None
+        finally:
+            # Clean up
+            try:
+                os.unlink(audio_path)
+            except OSError:
+                pass
+
+    async def play_ai_response(self, text: str):
+        """Generate and play AI response"""
+        # Cached, Asterisk-ready audio is synthesized only once per phrase; a new one plays while streaming
+        audio_path = await self.tts_cache.get_playable(text)
+        if not audio_path:
+            logger.error("❌ No se pudo generar audio")
+            await self.play_fallback()
+            return
+        await self.play_file(audio_path)
+
+    async def play_file(self, audio_path: str):
+        """Play an Asterisk-native audio file on the channel
+
+        With barge-in the file is played with CONTROL STREAM FILE, which AMI can stop when the
+        caller talks over it; CallerInterrupted is raised then.
+        """
+        watch = self.watch
+        interrupted = False
+        try:
+            if self.turn_started:
+                # Time from the end of the caller's turn to the answer, masked by a filler if one played
+                first_audio = time.monotonic() - self.turn_started
+                metrics.observe("first_audio", first_audio)
+                if self.turn_head_start is not None:
+                    self.filler.observe(first_audio + self.turn_head_start)
+                    self.turn_head_start = None
+                self.turn_started = None
+            if self.filler_playback:
+                # The answer starts right after the acknowledgement, without a gap
+                waited = time.monotonic()
+                await self._finish_filler()
+                self.filler.record_wait(time.monotonic() - waited)
+            # STREAM FILE takes the path without extension and picks the format itself
+            command = "CONTROL STREAM FILE" if watch else "STREAM FILE"
+            with metrics.timer("playback", "asterisk"):
+                try:
+                    if watch:
+                        watch.start_playback()
+                    await self.send_agi_command(f'{command} {os.path.splitext(audio_path)[0]} ""')
+                    response = await self.get_agi_response()
+                finally:
+                    if watch:
+                        interrupted = watch.end_playback()
+
+            if interrupted:
+                self._record_cut(audio_path, response)
+                raise CallerInterrupted()
+            if "200" in response:
+                logger.info("🔊 Audio reproducido correctamente")
+            else:
+                logger.error(f"❌ Error reproduciendo audio: {response}")
+
+        except (AGIHangup, CallerInterrupted):
+            raise
+        except Exception as e:
+            logger.error(f"❌ Error reproduciendo audio: {e}")
+
+    async def play_filler(self) -> None:
+        """Play an acknowledgement so the caller does not wait in silence for the answer"""
+        audio_path = await self.filler.next_file()
+        if not audio_path:
+            return
+        await self.send_agi_command(f'STREAM FILE {os.path.splitext(audio_path)[0]} ""')
+        response = await self.get_agi_response()
+        if "200" not in response:
+            logger.warning(f"⚠️ Error reproduciendo audio de relleno: {response}")
+
+    async def _finish_filler(self) -> None:
+        """Wait for the acknowledgement to end; a hangup during it is raised here"""
+        playback, self.filler_playback = self.filler_playback, None
+        if playback:
+            await playback
+
+    def _record_cut(self, audio_path: str, response: str) -> None:
+        """Count the part of an interrupted file that was not played"""
+        match = PLAYBACK_END_POSITION.search(response)
+        extension = os.path.splitext(audio_path)[1].lstrip(".")
+        if not match or extension not in CHANNEL_CODECS:
+            return
+        sample_width = 1 if extension in ("ulaw", "alaw") else 2
+        try:
+            samples = os.path.getsize(audio_path) // sample_width
+        except OSError:
+            return
+        self.barge_in.record_cut(max(0, samples - int(match.group(1))) / CHANNEL_CODECS[extension])
+
+    async def play_fallback(self):
+        """Play the canned fallback sound while a provider is down"""
+        try:
+            await self.send_agi_command(f'STREAM FILE {Config.FALLBACK_SOUND} ""')
+            response = await self.get_agi_response()
+            logger.info(f"🔁 Audio de contingencia reproducido: {response}")
+        except AGIHangup:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Error reproduciendo audio de contingencia: {e}")
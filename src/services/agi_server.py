@@ -0,0 +1,110 @@
+"""
+FastAGI server for Asterisk
+"""
+
+import asyncio
+import logging
+from typing import Optional
+from src.services.agi_handler import AGIHandler, AGIHangup
+from src.services.stt_service import STTService
+from src.services.tts_service import TTSService
+from src.services.ai_service import AIService
+from src.services.tts_cache import TTSCache
+from src.services.response_cache import ResponseCache
+from src.services.barge_in import BargeIn
+from src.services.filler import FillerAudio
+from src.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+class FastAGIServer:
+    """Long-lived FastAGI server that serves every channel from one process"""
+
+    def __init__(self, stt_service: STTService, tts_service: TTSService, ai_service: AIService,
+                 tts_cache: TTSCache, response_cache: ResponseCache,
+                 host: Optional[str] = None, port: Optional[int] = None, barge_in: Optional[BargeIn] = None,
+                 filler: Optional[FillerAudio] = None):
+        self.stt_service = stt_service
+        self.tts_service = tts_service
+        self.ai_service = ai_service
+        self.tts_cache = tts_cache
+        self.response_cache = response_cache
+        self.barge_in = barge_in
+        self.filler = filler
+        self.host = host or Config.AGI_HOST
+        self.port = port or Config.AGI_PORT
+        self.max_calls = Config.AGI_MAX_CALLS
+        self.server = None
+        self.active_calls = {}
+        self.total_calls = 0
+        self.rejected_calls = 0
+
+    async def start(self) -> bool:
+        """Start listening for FastAGI connections"""
+        try:
+            self.server = await asyncio.start_server(self._handle_connection, self.host, self.port,
+                                                     reuse_port=Config.AGI_REUSE_PORT or None)
+            logger.info(f"✅ Servidor FastAGI escuchando en {self.host}:{self.port}")
+            return True
+        except Exception as e:
+            logger.error(f"❌ Error iniciando servidor FastAGI: {e}")
+            return False
+
+    async def serve_forever(self) -> None:
+        """Run the server until cancelled"""
+        if not self.server and not await self.start():
+            return
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve one AGI session on a new connection"""
+        handler = AGIHandler(reader, writer, self.stt_service, self.tts_service, self.ai_service,
+                             self.tts_cache, self.response_cache, self.barge_in, self.filler)
+        task = asyncio.current_task()
+        try:
+            await handler.read_agi_vars()
+            channel = handler.agi_vars.get('agi_channel', 'Unknown')
+
+            if len(self.active_calls) >= self.max_calls:
+                self.rejected_calls += 1
+                logger.warning(f"⚠️ Límite de llamadas AGI alcanzado, rechazando canal: {channel}")
+                await handler.send_agi_command("HANGUP")
+                return
+
+            self.active_calls[task] = channel
+            self.total_calls += 1
+            await handler.process_call()
+        except AGIHangup:
+            logger.info("📴 Sesión AGI cerrada antes de iniciar")
+        except Exception as e:
+            logger.error(f"❌ Error en sesión FastAGI: {e}")
+        finally:
+            self.active_calls.pop(task, None)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def stop(self) -> None:
+        """Stop accepting connections and cancel active sessions"""
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        for task in list(self.active_calls):
+            task.cancel()
+        logger.info("🔌 Servidor FastAGI detenido")
+
+    def get_status(self) -> dict:
+        """Get FastAGI server status"""
+        return {
+            "listening": self.server is not None,
+            "port": self.port,
+            "active_calls": len(self.active_calls),
+            "total_calls": self.total_calls,
+            "rejected_calls": self.rejected_calls,
+            "barge_in": self.barge_in.get_status() if self.barge_in else None,
+            "filler": self.filler.get_status() if self.filler else None
+        }
@@ -4,79 +4,258 @@ AI service using Ollama
 
 import asyncio
 import logging
-import aiohttp
 import json
-from typing import Optional
+import time
+from typing import AsyncIterator, Optional, Union
+from src.services.http_client import http_client
+from src.services.health_monitor import health_monitor
+from src.services.conversation import ConversationSession
+from src.services.metrics import metrics
 from src.core.config import Config
 
 logger = logging.getLogger(__name__)
 
+NO_RESPONSE_TEXT = "Lo siento, no pude procesar tu solicitud."
+ERROR_RESPONSE_TEXT = "Lo siento, hay un problema técnico."
+FALLBACK_RESPONSES = (NO_RESPONSE_TEXT, ERROR_RESPONSE_TEXT)
+
 class AIService:
     """AI service using Ollama"""
     
     def __init__(self):
         self.host = Config.OLLAMA_HOST
         self.model = Config.OLLAMA_MODEL
+        self.breaker = health_monitor.breakers["ollama"]
+        self.keep_alive = self._parse_keep_alive(Config.OLLAMA_KEEP_ALIVE)
+        self.warmup_stats = {"cold_first_token_ms": None, "warm_first_token_ms": None,
+                             "load_ms": None, "rewarms": 0, "warmed_at": None}
+        self._warm_task = None
+        
+    @staticmethod
+    def _parse_keep_alive(value: str) -> Union[int, str]:
+        """Ollama takes keep_alive as seconds (a number) or a duration string like 30m"""
+        return int(value) if value.lstrip("-").isdigit() else value
         
     async def check_ollama(self) -> bool:
         """Check if Ollama is running"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.host}/api/tags", timeout=5) as response:
-                    if response.status == 200:
-                        logger.info("✅ Ollama está funcionando")
-                        return True
-                    else:
-                        logger.error("❌ Ollama no responde correctamente")
-                        return False
-        except Exception as e:
-            logger.error(f"❌ Error conectando con Ollama: {self.host}/api/tags - {e}")
-            return False
+        if await health_monitor.probe("ollama"):
+            logger.info("✅ Ollama está funcionando")
+            return True
+        logger.error(f"❌ Error conectando con Ollama: {self.host}/api/tags")
+        return False
+    
+    def _build_request(self, messages: list, stream: bool) -> dict:
+        """Build the Ollama chat payload"""
+        return {
+            "model": self.model,
+            "messages": messages,
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+            "options": {
+                "temperature": 0.7,
+                "top_p": 0.9,
+                "num_predict": Config.OLLAMA_NUM_PREDICT
+            }
+        }
     
-    async def generate_response(self, text: str) -> Optional[str]:
+    async def generate_response(self, text: str, session: Optional[ConversationSession] = None) -> Optional[str]:
         """Generate AI response using Ollama"""
         try:
-            if not await self.check_ollama():
+            # Cached health state keeps the probe off the latency-critical path
+            if not health_monitor.is_available("ollama"):
+                logger.warning("⚠️ Ollama no disponible, omitiendo generación")
                 return None
             
-            url = f"{self.host}/api/generate"
+            session = session or ConversationSession()
+            started = time.monotonic()
+            url = f"{self.host}/api/chat"
+            data = self._build_request(session.build_messages(text), stream=False)
             
-            data = {
-                "model": self.model,
-                "prompt": f"Eres un asistente telefónico amigable. Responde de manera natural y útil a: {text}",
-                "stream": False,
-                "options": {
-                    "temperature": 0.7,
-                    "top_p": 0.9,
-                    "max_tokens": 150
-                }
-            }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    url,
-                    json=data,
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as response:
+            async with http_client.session.post(
+                url,
+                json=data,
+                timeout=http_client.timeout("ollama")
+            ) as response:
+                
+                if response.status == 200:
+                    self.breaker.record_success()
+                    result = await response.json()
+                    response_text = result.get("message", {}).get("content", "").strip()
+                    metrics.observe("llm_total", time.monotonic() - started, "ollama")
                     
-                    if response.status == 200:
-                        result = await response.json()
-                        response_text = result.get("response", "").strip()
-                        
-                        if response_text:
-                            logger.info(f"🤖 Respuesta AI: {response_text}")
-                            return response_text
-                        else:
-                            logger.warning("⚠️ No se generó respuesta de AI")
-                            return "Lo siento, no pude procesar tu solicitud."
+                    if response_text:
+                        session.record_turn(text, response_text)
+                        logger.info(f"🤖 Respuesta AI: {response_text}")
+                        return response_text
                     else:
-                        error_text = await response.text()
-                        logger.error(f"❌ Error en Ollama API: {response.status} - {error_text}")
-                        return "Lo siento, hay un problema técnico."
-                        
+                        logger.warning("⚠️ No se generó respuesta de AI")
+                        return NO_RESPONSE_TEXT
+                else:
+                    self.breaker.record_failure()
+                    error_text = await response.text()
+                    logger.error(f"❌ Error en Ollama API: {response.status} - {error_text}")
+                    return ERROR_RESPONSE_TEXT
+                    
         except Exception as e:
+            self.breaker.record_failure()
             logger.error(f"❌ Error generando respuesta AI: {e}")
-            return "Lo siento, hay un problema técnico."
+            return ERROR_RESPONSE_TEXT
+    
+    async def stream_response(self, text: str, session: Optional[ConversationSession] = None,
+                              record: bool = True) -> AsyncIterator[str]:
+        """Stream AI response tokens from Ollama as they are generated
+
+        record=False leaves the turn out of the session, for generations that may be thrown away.
+        """
+        if not health_monitor.is_available("ollama"):
+            logger.warning("⚠️ Ollama no disponible, omitiendo generación")
+            return
+        
+        session = session or ConversationSession()
+        parts = []
+        started = time.monotonic()
+        try:
+            async with http_client.session.post(
+                f"{self.host}/api/chat",
+                json=self._build_request(session.build_messages(text), stream=True),
+                timeout=http_client.timeout("ollama")
+            ) as response:
+                
+                if response.status != 200:
+                    self.breaker.record_failure()
+                    error_text = await response.text()
+                    logger.error(f"❌ Error en Ollama API: {response.status} - {error_text}")
+                    return
+                
+                self.breaker.record_success()
+                # Ollama streams one JSON object per line
+                async for line in response.content:
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    token = chunk.get("message", {}).get("content", "")
+                    if token:
+                        if not parts:
+                            metrics.observe("llm_first_token", time.monotonic() - started, "ollama")
+                        parts.append(token)
+                        yield token
+                    if chunk.get("done"):
+                        metrics.observe("llm_total", time.monotonic() - started, "ollama")
+                        break
+                        
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.breaker.record_failure()
+            logger.error(f"❌ Error en streaming de respuesta AI: {e}")
+        finally:
+            # Whatever was generated is what the caller heard, even if the turn was cut short
+            response_text = "".join(parts).strip()
+            if response_text and record:
+                session.record_turn(text, response_text)
+    
+    async def embed(self, text: str, model: str) -> Optional[list]:
+        """Get an embedding vector for the text from Ollama"""
+        try:
+            if not health_monitor.is_available("ollama"):
+                return None
+            async with http_client.session.post(
+                f"{self.host}/api/embeddings",
+                json={"model": model, "prompt": text, "keep_alive": self.keep_alive},
+                timeout=http_client.timeout("ollama")
+            ) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    logger.error(f"❌ Error en embeddings de Ollama: {response.status} - {error_text}")
+                    return None
+                result = await response.json()
+                return result.get("embedding")
+        except Exception as e:
+            logger.error(f"❌ Error generando embedding: {e}")
+            return None
+    
+    async def is_model_loaded(self) -> bool:
+        """Check /api/ps for the configured model"""
+        model = self.model if ":" in self.model else f"{self.model}:latest"
+        async with http_client.session.get(
+            f"{self.host}/api/ps",
+            timeout=http_client.timeout("probe")
+        ) as response:
+            if response.status != 200:
+                return False
+            result = await response.json()
+        return any(m.get("name") == model or m.get("model") == model for m in result.get("models", []))
+    
+    async def _time_first_token(self) -> dict:
+        """Run a tiny generation behind the real system prompt and time its first token"""
+        started = time.monotonic()
+        first_token_ms = None
+        data = self._build_request(
+            [{"role": "system", "content": Config.OLLAMA_SYSTEM_PROMPT}, {"role": "user", "content": "Hola"}],
+            stream=True
+        )
+        data["options"]["num_predict"] = 8
+        async with http_client.session.post(
+            f"{self.host}/api/chat",
+            json=data,
+            timeout=http_client.timeout("ollama")
+        ) as response:
+            response.raise_for_status()
+            async for line in response.content:
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if first_token_ms is None and chunk.get("message", {}).get("content"):
+                    first_token_ms = round((time.monotonic() - started) * 1000, 1)
+                if chunk.get("done"):
+                    # Ollama reports durations in nanoseconds
+                    return {"first_token_ms": first_token_ms, "load_ms": round(chunk.get("load_duration", 0) / 1e6, 1)}
+        return {"first_token_ms": first_token_ms, "load_ms": None}
+    
+    async def warmup(self) -> bool:
+        """Load the model, pin it with keep_alive and prime the system prompt cache"""
+        try:
+            cold = await self._time_first_token()
+            warm = await self._time_first_token()
+            self.warmup_stats.update({
+                "cold_first_token_ms": cold["first_token_ms"],
+                "warm_first_token_ms": warm["first_token_ms"],
+                "load_ms": cold["load_ms"],
+                "warmed_at": time.time()
+            })
+            logger.info(
+                f"🔥 Ollama calentado: primer token en frío {cold['first_token_ms']} ms "
+                f"(carga {cold['load_ms']} ms), en caliente {warm['first_token_ms']} ms"
+            )
+            return True
+        except Exception as e:
+            logger.error(f"❌ Error calentando Ollama: {e}")
+            return False
+    
+    async def _warm_loop(self) -> None:
+        while True:
+            await asyncio.sleep(Config.OLLAMA_WARMUP_INTERVAL)
+            try:
+                if await self.is_model_loaded():
+                    continue
+                logger.warning(f"⚠️ Modelo {self.model} descargado de memoria, recalentando")
+                if await self.warmup():
+                    self.warmup_stats["rewarms"] += 1
+            except Exception as e:
+                logger.error(f"❌ Error comprobando modelo cargado: {e}")
+    
+    async def start(self) -> None:
+        """Warm the model and re-warm it whenever Ollama evicts it"""
+        if not Config.OLLAMA_WARMUP_ENABLED:
+            return
+        await self.warmup()
+        if not self._warm_task or self._warm_task.done():
+            self._warm_task = asyncio.create_task(self._warm_loop())
+    
+    async def stop(self) -> None:
+        if self._warm_task:
+            self._warm_task.cancel()
+            self._warm_task = None
     
     async def test_connection(self) -> bool:
         """Test Ollama connection"""
@@ -1,111 +1,306 @@
+"""
+Asterisk Manager Interface (AMI) service
+"""
+
 import asyncio
+import itertools
 import logging
-import socket
-from typing import Optional, Callable
+import os
+import time
+from typing import Optional, Callable, Dict, List
 from src.core.config import Config
+from src.services.metrics import metrics
+from src.services.dnc import dnc_list
 
 logger = logging.getLogger(__name__)
 
 class AsteriskService:
-    def __init__(self):
-        self.ami_host = "localhost"
-        self.ami_port = 5038
-        self.ami_username = "admin"
-        self.ami_secret = "paradixe123"
-        self.socket = None
+    """Non-blocking AMI client with a persistent event reader"""
+
+    def __init__(self, name: str = "default", host: Optional[str] = None, port: Optional[int] = None,
+                 username: Optional[str] = None, secret: Optional[str] = None):
+        self.name = name
+        self.ami_host = host or Config.AMI_HOST
+        self.ami_port = int(port or Config.AMI_PORT)
+        self.ami_username = username or Config.AMI_USERNAME
+        self.ami_secret = secret or Config.AMI_SECRET
+        self.reader = None
+        self.writer = None
         self.is_connected = False
-        self.callbacks = {}
+        self.callbacks: Dict[str, List[Callable]] = {}
+        self.pending: Dict[str, asyncio.Future] = {}
+        self._action_ids = itertools.count(1)
+        self._action_prefix = f"eve-{os.getpid()}"
+        self._connect_lock = asyncio.Lock()
+        self._reader_task = None
+        self._keepalive_task = None
+        self._reconnect_task = None
+        self._callback_tasks = set()
+        self._closing = False
 
     async def connect(self) -> bool:
-        try:
-            logger.info("🔌 Conectando a Asterisk AMI...")
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.connect((self.ami_host, self.ami_port))
-            
-            # Login to AMI
-            login_msg = f"Action: Login\r\nUsername: {self.ami_username}\r\nSecret: {self.ami_secret}\r\n\r\n"
-            self.socket.send(login_msg.encode())
-            
-            # Wait for response
-            response = ""
-            while True:
-                data = self.socket.recv(1024).decode()
-                response += data
-                if "\r\n\r\n" in response:
-                    break
-            
-            if "Success" in response:
-                self.is_connected = True
-                logger.info("✅ Conectado a Asterisk AMI")
+        async with self._connect_lock:
+            if self.is_connected:
                 return True
-            else:
-                logger.error("❌ Error en login AMI")
+            try:
+                logger.info(f"🔌 Conectando a Asterisk AMI {self.name} ({self.ami_host}:{self.ami_port})...")
+                self._closing = False
+                self.reader, self.writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.ami_host, self.ami_port, limit=Config.AMI_READ_LIMIT),
+                    timeout=Config.AMI_ACTION_TIMEOUT
+                )
+
+                # AMI greets with a single banner line before any packet
+                banner = await asyncio.wait_for(self.reader.readline(), timeout=Config.AMI_ACTION_TIMEOUT)
+                logger.debug(f"AMI banner: {banner.decode(errors='ignore').strip()}")
+
+                self._reader_task = asyncio.create_task(self._read_loop())
+
+                # Login to AMI
+                response = await self.send_action("Login", {
+                    "Username": self.ami_username,
+                    "Secret": self.ami_secret
+                })
+
+                if response and response.get("Response") == "Success":
+                    self.is_connected = True
+                    if not self._keepalive_task or self._keepalive_task.done():
+                        self._keepalive_task = asyncio.create_task(self._keepalive_loop())
+                    logger.info(f"✅ Conectado a Asterisk AMI {self.name}")
+                    return True
+                else:
+                    logger.error(f"❌ Error en login AMI: {response}")
+                    await self._close_transport()
+                    return False
+            except Exception as e:
+                logger.error(f"❌ Error conectando a Asterisk {self.name}: {e}")
+                await self._close_transport()
                 return False
+
+    def next_action_id(self) -> str:
+        """Reserve a unique ActionID, so events can be routed before the response returns"""
+        return f"{self._action_prefix}-{next(self._action_ids)}"
+
+    async def send_action(self, action: str, fields: Optional[dict] = None,
+                          timeout: Optional[float] = None, action_id: Optional[str] = None) -> Optional[dict]:
+        """Send an AMI action and wait for the response matching its ActionID"""
+        if not self.writer:
+            return None
+
+        action_id = action_id or self.next_action_id()
+        future = asyncio.get_running_loop().create_future()
+        self.pending[action_id] = future
+
+        lines = [f"Action: {action}", f"ActionID: {action_id}"]
+        for key, value in (fields or {}).items():
+            if isinstance(value, (list, tuple)):
+                lines.extend(f"{key}: {item}" for item in value)
+            else:
+                lines.append(f"{key}: {value}")
+        packet = "\r\n".join(lines) + "\r\n\r\n"
+
+        try:
+            self.writer.write(packet.encode())
+            await self.writer.drain()
+            return await asyncio.wait_for(future, timeout=timeout or Config.AMI_ACTION_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.error(f"❌ Timeout esperando respuesta AMI a {action} ({action_id})")
+            return None
         except Exception as e:
-            logger.error(f"❌ Error conectando a Asterisk: {e}")
-            return False
+            logger.error(f"❌ Error enviando acción AMI {action}: {e}")
+            return None
+        finally:
+            self.pending.pop(action_id, None)
 
-    async def make_call(self, number: str) -> bool:
+    async def _read_loop(self) -> None:
+        """Read AMI packets and route responses and events"""
+        try:
+            while True:
+                data = await self.reader.readuntil(b"\r\n\r\n")
+                packet = self._parse_packet(data)
+                if not packet:
+                    continue
+
+                # Events such as OriginateResponse also carry a Response/ActionID
+                if "Event" in packet:
+                    self._dispatch_event(packet)
+                elif "Response" in packet:
+                    future = self.pending.get(packet.get("ActionID"))
+                    if future and not future.done():
+                        future.set_result(packet)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.IncompleteReadError:
+            logger.warning("⚠️ Conexión AMI cerrada por Asterisk")
+        except Exception as e:
+            logger.error(f"❌ Error leyendo eventos AMI: {e}")
+
+        self._connection_lost()
+
+    def _connection_lost(self) -> None:
+        """Release waiters, tell subscribers the event stream broke and reconnect"""
+        self.is_connected = False
+        self._fail_pending()
+        # Events emitted while disconnected are lost; subscribers must reconcile
+        self._dispatch_event({"Event": "ConnectionLost"})
+        if not self._closing:
+            self._schedule_reconnect()
+
+    @staticmethod
+    def _parse_packet(data: bytes) -> dict:
+        """Parse a raw AMI packet into a dict"""
+        packet = {}
+        for line in data.decode(errors="ignore").split("\r\n"):
+            key, sep, value = line.partition(":")
+            if sep:
+                packet[key.strip()] = value.strip()
+        return packet
+
+    def _dispatch_event(self, event: dict) -> None:
+        """Deliver an unsolicited event to its subscribers"""
+        name = event.get("Event")
+        for callback in self.callbacks.get(name, []) + self.callbacks.get("*", []):
+            try:
+                result = callback(event)
+                if asyncio.iscoroutine(result):
+                    # Keep a reference so the task is not garbage-collected mid-run
+                    task = asyncio.create_task(result)
+                    self._callback_tasks.add(task)
+                    task.add_done_callback(self._on_callback_done)
+            except Exception as e:
+                logger.error(f"❌ Error en callback de evento {name}: {e}")
+
+    def _on_callback_done(self, task: asyncio.Task) -> None:
+        self._callback_tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"❌ Error en callback de evento: {task.exception()}")
+
+    def _fail_pending(self) -> None:
+        """Release callers waiting on a connection that is gone"""
+        for future in self.pending.values():
+            if not future.done():
+                future.set_result(None)
+        self.pending.clear()
+
+    def _schedule_reconnect(self) -> None:
+        if not self._reconnect_task or self._reconnect_task.done():
+            self._reconnect_task = asyncio.create_task(self._reconnect_loop())
+
+    async def _reconnect_loop(self) -> None:
+        """Reconnect with exponential backoff until AMI is back"""
+        delay = 1
+        while not self._closing and not self.is_connected:
+            logger.info(f"🔄 Reintentando conexión AMI en {delay}s...")
+            await asyncio.sleep(delay)
+            await self._close_transport()
+            if await self.connect():
+                return
+            delay = min(delay * 2, Config.AMI_RECONNECT_MAX_DELAY)
+
+    async def _keepalive_loop(self) -> None:
+        """Ping AMI periodically and drop the connection when it stops answering"""
+        while not self._closing:
+            await asyncio.sleep(Config.AMI_PING_INTERVAL)
+            if not self.is_connected:
+                continue
+            response = await self.send_action("Ping")
+            if not response and not self._closing:
+                # A half-open TCP connection may never deliver EOF to the reader
+                logger.warning("⚠️ AMI no responde al Ping, reconectando...")
+                await self._close_transport()
+                self._connection_lost()
+
+    async def _close_transport(self) -> None:
+        if self._reader_task and self._reader_task is not asyncio.current_task():
+            self._reader_task.cancel()
+        self._reader_task = None
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+        self.reader = None
+        self.writer = None
+        self.is_connected = False
+
+    @staticmethod
+    def _clean_number(number: str) -> str:
+        # Remove + and @ from number for dialing
+        clean_number = number.replace("+", "").replace("@1998010101.tscpbx.net", "")
+        # Remove sip: prefix if present
+        return clean_number.replace("sip:", "")
+
+    async def originate(self, number: str, variables: Optional[dict] = None, action_id: Optional[str] = None,
+                        channel: Optional[str] = None, context: Optional[str] = None,
+                        exten: str = "s", callerid: Optional[str] = None) -> Optional[str]:
+        """Originate a call asynchronously and return its ActionID
+
+        channel is a template where {number} is the dialed number; it defaults to AMI_ORIGINATE_CHANNEL.
+        """
         try:
             if not self.is_connected:
                 if not await self.connect():
-                    return False
-            
-            # Remove + and @ from number for dialing
-            clean_number = number.replace("+", "").replace("@1998010101.tscpbx.net", "")
-            # Remove sip: prefix if present
-            clean_number = clean_number.replace("sip:", "")
-            
+                    return None
+
+            clean_number = self._clean_number(number)
             logger.info(f"📞 Llamando a: {clean_number}")
-            
-            # Originate call via AMI
-            originate_msg = f"""Action: Originate
-Channel: SIP/paradixe01/{clean_number}
-Context: paradixe
-Exten: s
-Priority: 1
-Callerid: paradixe01
-Timeout: 30000
-Async: yes
-\r\n"""
-            
-            self.socket.send(originate_msg.encode())
-            
-            # Wait for response
-            response = ""
-            while True:
-                data = self.socket.recv(1024).decode()
-                response += data
-                if "\r\n\r\n" in response:
-                    break
-            
-            if "Success" in response:
+
+            fields = {
+                "Channel": (channel or Config.AMI_ORIGINATE_CHANNEL).format(number=clean_number),
+                "Context": context or Config.AMI_ORIGINATE_CONTEXT,
+                "Exten": exten,
+                "Priority": 1,
+                "Callerid": callerid or Config.AMI_CALLER_ID,
+                "Timeout": Config.AMI_ORIGINATE_TIMEOUT * 1000,
+                "Async": "yes"
+            }
+            if variables:
+                fields["Variable"] = [f"{key}={value}" for key, value in variables.items()]
+
+            started = time.monotonic()
+            response = await self.send_action("Originate", fields, action_id=action_id)
+            metrics.ami_originate_seconds.observe(time.monotonic() - started)
+
+            if response and response.get("Response") == "Success":
                 logger.info("✅ Llamada iniciada correctamente")
-                return True
+                return response.get("ActionID")
             else:
                 logger.error(f"❌ Error iniciando llamada: {response}")
-                return False
-                
+                return None
+
         except Exception as e:
             logger.error(f"❌ Error haciendo llamada: {e}")
+            return None
+
+    async def make_call(self, number: str) -> bool:
+        if dnc_list.is_suppressed(number):
+            logger.info(f"🚫 {number} está en lista DNC, no se marca")
             return False
+        return await self.originate(number) is not None
 
     async def hangup_call(self, channel: str) -> bool:
         try:
-            hangup_msg = f"""Action: Hangup
-Channel: {channel}
-\r\n"""
-            self.socket.send(hangup_msg.encode())
-            return True
+            response = await self.send_action("Hangup", {"Channel": channel})
+            return bool(response and response.get("Response") == "Success")
         except Exception as e:
             logger.error(f"❌ Error colgando llamada: {e}")
             return False
 
     async def disconnect(self):
-        if self.socket:
-            self.socket.close()
-        self.is_connected = False
-        logger.info("🔌 Desconectado de Asterisk AMI")
+        self._closing = True
+        for task in (self._keepalive_task, self._reconnect_task):
+            if task:
+                task.cancel()
+        if self.is_connected:
+            await self.send_action("Logoff", timeout=2)
+        await self._close_transport()
+        logger.info(f"🔌 Desconectado de Asterisk AMI {self.name}")
 
     def set_callback(self, event: str, callback: Callable):
-        self.callbacks[event] = callback 
\ No newline at end of file
+        """Subscribe to an AMI event by name, or '*' for every event"""
+        self.callbacks.setdefault(event, []).append(callback)
+
+    def remove_callback(self, event: str, callback: Callable):
+        if callback in self.callbacks.get(event, []):
+            self.callbacks[event].remove(callback)
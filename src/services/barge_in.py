@@ -0,0 +1,129 @@
+"""
+Barge-in: stop the AI's playback as soon as the caller talks over it
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict
+from src.services.call_router import CallRouter
+from src.services.metrics import metrics
+from src.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Silence after which TALK_DETECT reports that the caller stopped talking; short, so brief
+# noises end before BARGE_IN_MIN_SPEECH_MS and do not cut the playback
+TALK_DETECT_SILENCE_MS = 150
+
+class ChannelWatch:
+    """Talking state of one AGI channel and whether its current playback was interrupted"""
+
+    def __init__(self, barge_in: "BargeIn", channel: str):
+        self.barge_in = barge_in
+        self.channel = channel
+        # AMI server that reports this channel's events; ControlPlayback goes there
+        self.server = None
+        self.talking_since = None
+        self.playing = False
+        self.interrupted = False
+        self._confirm = None
+
+    def start_playback(self) -> None:
+        self.playing = True
+        self.interrupted = False
+        if self.talking_since is not None:
+            # The caller was already talking when the prompt started
+            self._schedule()
+
+    def end_playback(self) -> bool:
+        """Mark the playback finished; True when it ended because the caller talked over it"""
+        self.playing = False
+        self._cancel()
+        return self.interrupted
+
+    def _schedule(self) -> None:
+        if self._confirm and not self._confirm.done():
+            return
+        self._confirm = asyncio.create_task(self.barge_in._confirm(self))
+
+    def _cancel(self) -> bool:
+        """Drop a pending confirmation; one already stopping the playback is left to finish"""
+        if self._confirm and not self._confirm.done() and not self.interrupted:
+            self._confirm.cancel()
+            return True
+        return False
+
+class BargeIn:
+    """Caller speech detection during playback through AMI TALK_DETECT events
+
+    Each AGI session enables TALK_DETECT on its channel and plays audio with CONTROL STREAM FILE.
+    A ChannelTalkingStart during playback that lasts BARGE_IN_MIN_SPEECH_MS stops the playback
+    with the AMI ControlPlayback action, so the session can record the caller right away.
+    """
+
+    def __init__(self, router: CallRouter):
+        self.router = router
+        self.channels: Dict[str, ChannelWatch] = {}
+        self.stats = {"interruptions": 0, "false_starts": 0, "stop_errors": 0, "cut_seconds": 0.0}
+        for name, server in router.servers.items():
+            server.set_callback("ChannelTalkingStart", lambda event, name=name: self._on_talking(name, event, True))
+            server.set_callback("ChannelTalkingStop", lambda event, name=name: self._on_talking(name, event, False))
+
+    @staticmethod
+    def talk_detect_command() -> str:
+        """AGI command that turns on caller speech events for the channel"""
+        return f'SET VARIABLE TALK_DETECT(set) "{TALK_DETECT_SILENCE_MS},{Config.BARGE_IN_TALK_THRESHOLD}"'
+
+    def watch(self, channel: str) -> ChannelWatch:
+        watch = self.channels[channel] = ChannelWatch(self, channel)
+        return watch
+
+    def unwatch(self, watch: ChannelWatch) -> None:
+        watch.end_playback()
+        if self.channels.get(watch.channel) is watch:
+            del self.channels[watch.channel]
+
+    def _on_talking(self, server: str, event: dict, talking: bool) -> None:
+        watch = self.channels.get(event.get("Channel"))
+        if watch is None:
+            return
+        watch.server = server
+        if talking:
+            watch.talking_since = time.monotonic()
+            if watch.playing:
+                watch._schedule()
+        else:
+            watch.talking_since = None
+            if watch._cancel():
+                self.stats["false_starts"] += 1
+
+    async def _confirm(self, watch: ChannelWatch) -> None:
+        """Stop the playback once the caller has been talking for BARGE_IN_MIN_SPEECH_MS"""
+        since = watch.talking_since
+        remaining = Config.BARGE_IN_MIN_SPEECH_MS / 1000 - (time.monotonic() - since)
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+        if not watch.playing or watch.talking_since != since:
+            return
+        # Set first: the playback may end before the AMI response arrives. Even if it cannot be
+        # stopped, the caller is talking, so the rest of the answer is skipped and they are recorded
+        watch.interrupted = True
+        server = self.router.servers.get(watch.server)
+        response = await server.send_action("ControlPlayback", {"Channel": watch.channel, "Control": "stop"}) \
+            if server else None
+        if not response or response.get("Response") != "Success":
+            self.stats["stop_errors"] += 1
+            logger.debug(f"No se pudo detener la reproducción en {watch.channel}: {response}")
+            return
+        self.stats["interruptions"] += 1
+        # From the start of the caller's speech to the playback stopping
+        metrics.observe("barge_in", time.monotonic() - since, "asterisk")
+        logger.info(f"✋ El usuario interrumpió la reproducción en {watch.channel}")
+
+    def record_cut(self, seconds: float) -> None:
+        """Audio the caller did not have to sit through"""
+        self.stats["cut_seconds"] += seconds
+
+    def get_status(self) -> dict:
+        return {**self.stats, "cut_seconds": round(self.stats["cut_seconds"], 1), "watched": len(self.channels)}
@@ -0,0 +1,303 @@
+"""
+Background call jobs: calls and campaigns run behind IDs the API returns immediately
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+import uuid
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional
+from src.services.dialer import Dialer
+from src.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+class CallJobs:
+    """Registry of queued, running and finished calls with a feed of their state changes"""
+
+    def __init__(self, dialer: Dialer, max_records: Optional[int] = None,
+                 subscriber_queue_size: Optional[int] = None, max_campaigns: Optional[int] = None):
+        self.dialer = dialer
+        self.max_records = max_records or Config.CALL_JOBS_MAX_RECORDS
+        self.max_campaigns = max_campaigns or Config.CALL_JOBS_MAX_CAMPAIGNS
+        self.subscriber_queue_size = subscriber_queue_size or Config.CALL_EVENTS_QUEUE_SIZE
+        self.calls: Dict[str, dict] = {}
+        self.campaigns: Dict[str, dict] = {}
+        # Finished calls and finished campaigns, oldest first; a campaign's summary outlives its calls
+        self.finished_calls = deque()
+        self.finished_campaigns = deque()
+        self.subscribers = {}
+        self.tasks = set()
+        self.active_calls = 0
+        self._event_ids = itertools.count(1)
+        self.stats = {"calls_submitted": 0, "campaigns_submitted": 0, "events": 0, "events_dropped": 0,
+                      "evicted": 0, "campaigns_evicted": 0}
+
+    def submit_call(self, number: str, campaign_id: Optional[str] = None) -> dict:
+        """Queue one call and return its record; dialing happens in the background"""
+        call = self._new_call(number, campaign_id)
+        self._spawn(self._run_call(call))
+        return call
+
+    def submit_campaign(self, numbers: List[str]) -> dict:
+        """Queue a campaign and return its record; calls go out max_channels at a time"""
+        campaign = self._new_campaign()
+        calls = [self._add_campaign_call(campaign, number) for number in numbers if number.strip()]
+        self._publish("campaign", self._campaign_summary(campaign))
+        self._spawn(self._run_campaign(campaign, self._iterate(calls)))
+        return campaign
+
+    def submit_campaign_stream(self, numbers: AsyncIterator[str], ingest: Optional[dict] = None) -> dict:
+        """Start a campaign whose numbers are still arriving; calls are registered as they are read
+
+        ingest is a live dict of ingest counts, shown with the campaign.
+        """
+        campaign = self._new_campaign()
+        campaign["ingesting"] = True
+        if ingest is not None:
+            campaign["ingest"] = ingest
+        self._publish("campaign", self._campaign_summary(campaign))
+        self._spawn(self._run_campaign(campaign, self._register(campaign, numbers)))
+        return campaign
+
+    def _new_campaign(self) -> dict:
+        campaign = {
+            "id": uuid.uuid4().hex,
+            "state": "queued",
+            "created_at": time.time(),
+            "ended_at": None,
+            "total": 0,
+            "counts": {},
+            # IDs of the campaign's calls still held in self.calls, in submission order; evicted
+            # calls leave it, so a multi-million-row campaign keeps only its counts and a window
+            "call_ids": {}
+        }
+        self.campaigns[campaign["id"]] = campaign
+        self.stats["campaigns_submitted"] += 1
+        return campaign
+
+    def _add_campaign_call(self, campaign: dict, number: str) -> dict:
+        call = self._new_call(number, campaign["id"])
+        campaign["call_ids"][call["id"]] = None
+        campaign["total"] += 1
+        campaign["counts"]["queued"] = campaign["counts"].get("queued", 0) + 1
+        return call
+
+    @staticmethod
+    async def _iterate(calls: List[dict]) -> AsyncIterator[dict]:
+        for call in calls:
+            yield call
+
+    async def _register(self, campaign: dict, numbers: AsyncIterator[str]) -> AsyncIterator[dict]:
+        try:
+            async for number in numbers:
+                yield self._add_campaign_call(campaign, number)
+        finally:
+            campaign["ingesting"] = False
+
+    def _new_call(self, number: str, campaign_id: Optional[str]) -> dict:
+        call = {
+            "id": uuid.uuid4().hex,
+            "campaign_id": campaign_id,
+            "number": number.strip(),
+            "state": "queued",
+            "result": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "answered_at": None,
+            "ended_at": None,
+            "duration": 0.0,
+            "channel": None,
+            "error": None
+        }
+        self.calls[call["id"]] = call
+        self.active_calls += 1
+        self.stats["calls_submitted"] += 1
+        if not campaign_id:
+            self._publish("call", call)
+        return call
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _run_call(self, call: dict) -> None:
+        await self._dial(call)
+
+    async def _dial(self, call: dict) -> None:
+        try:
+            await self.dialer.dial(call["number"], on_update=lambda update: self._on_update(call, update))
+        except asyncio.CancelledError:
+            self._complete(call, "failed", "cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"❌ Error en llamada {call['number']}: {e}")
+            self._complete(call, "failed", str(e))
+
+    async def _run_campaign(self, campaign: dict, calls: AsyncIterator[dict]) -> None:
+        campaign["state"] = "running"
+        self._publish("campaign", self._campaign_summary(campaign))
+        # Bounded, so a streamed list is only read as fast as it is dialed
+        queue = asyncio.Queue(maxsize=Config.INGEST_QUEUE_SIZE)
+
+        async def produce():
+            try:
+                async for call in calls:
+                    await queue.put(call)
+            except Exception as e:
+                campaign["error"] = str(e)
+                logger.error(f"❌ Error leyendo números de la campaña {campaign['id']}: {e}")
+            finally:
+                for _ in range(self.dialer.max_channels):
+                    await queue.put(None)
+
+        async def worker():
+            while (call := await queue.get()) is not None:
+                await self._dial(call)
+
+        producer = asyncio.create_task(produce())
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.dialer.max_channels)))
+            await producer
+        finally:
+            producer.cancel()
+            for call_id in list(campaign["call_ids"]):
+                call = self.calls.get(call_id)
+                if call and call["state"] == "queued":
+                    self._complete(call, "failed", "cancelled")
+            campaign["state"] = "completed"
+            campaign["ended_at"] = time.time()
+            self._publish("campaign", self._campaign_summary(campaign))
+            logger.info(f"✅ Campaña {campaign['id']} completada: {self._campaign_summary(campaign)['counts']}")
+            self._retire_campaign(campaign["id"])
+
+    def _on_update(self, call: dict, update: dict) -> None:
+        """Mirror a dialer state change into the job record"""
+        for key in ("started_at", "answered_at", "ended_at", "duration", "channel"):
+            call[key] = update.get(key)
+        if update.get("ended_at"):
+            self._complete(call, update["status"], update.get("error"))
+            return
+        self._set_state(call, "in_call" if update["status"] == "answered" else "dialing")
+
+    def _complete(self, call: dict, result: str, error: Optional[str] = None) -> None:
+        if call["state"] == "completed":
+            return
+        call["error"] = error
+        call["ended_at"] = call["ended_at"] or time.time()
+        self._set_state(call, "completed", result)
+
+    def _set_state(self, call: dict, state: str, result: Optional[str] = None) -> None:
+        """Change a call's state, keep its campaign's counts current and publish the change"""
+        campaign = self.campaigns.get(call["campaign_id"])
+        if campaign:
+            # Campaigns count calls by state, and finished calls by result
+            counts = campaign["counts"]
+            old_key = call["result"] or call["state"]
+            counts[old_key] -= 1
+            if not counts[old_key]:
+                del counts[old_key]
+            new_key = result or state
+            counts[new_key] = counts.get(new_key, 0) + 1
+        if state == "completed":
+            self.active_calls -= 1
+        call["state"] = state
+        call["result"] = result
+        self._publish("call", call)
+        if state == "completed":
+            self._retire_call(call["id"])
+
+    def _retire_call(self, call_id: str) -> None:
+        """Keep finished calls around for polling, dropping the oldest past max_records calls"""
+        self.finished_calls.append(call_id)
+        while len(self.calls) > self.max_records and self.finished_calls:
+            call = self.calls.pop(self.finished_calls.popleft(), None)
+            campaign = self.campaigns.get(call["campaign_id"]) if call else None
+            if campaign:
+                campaign["call_ids"].pop(call["id"], None)
+            self.stats["evicted"] += 1
+
+    def _retire_campaign(self, campaign_id: str) -> None:
+        """Keep finished campaign summaries, dropping the oldest past max_campaigns
+
+        The campaign that just finished is always kept, even if its calls were evicted.
+        """
+        self.finished_campaigns.append(campaign_id)
+        while len(self.finished_campaigns) > max(1, self.max_campaigns):
+            self.campaigns.pop(self.finished_campaigns.popleft(), None)
+            self.stats["campaigns_evicted"] += 1
+
+    def get_call(self, call_id: str) -> Optional[dict]:
+        return self.calls.get(call_id)
+
+    def get_campaign(self, campaign_id: str, offset: int = 0, limit: int = 100) -> Optional[dict]:
+        """Campaign summary plus one page of the calls still held (in flight or recently finished)"""
+        campaign = self.campaigns.get(campaign_id)
+        if not campaign:
+            return None
+        page = itertools.islice(campaign["call_ids"], offset, offset + limit)
+        return {
+            **self._campaign_summary(campaign),
+            "offset": offset,
+            "limit": limit,
+            "calls_retained": len(campaign["call_ids"]),
+            "calls": [self.calls[call_id] for call_id in page if call_id in self.calls]
+        }
+
+    @staticmethod
+    def _campaign_summary(campaign: dict) -> dict:
+        summary = {key: value for key, value in campaign.items() if key != "call_ids"}
+        summary["counts"] = dict(campaign["counts"])
+        return summary
+
+    def _publish(self, kind: str, data: dict) -> None:
+        """Fan a state change out to every event stream"""
+        event = {"id": next(self._event_ids), "type": kind, "data": dict(data)}
+        self.stats["events"] += 1
+        for subscriber in self.subscribers.values():
+            if subscriber["call_id"] and data.get("id") != subscriber["call_id"]:
+                continue
+            if subscriber["campaign_id"] and subscriber["campaign_id"] not in (data.get("id"), data.get("campaign_id")):
+                continue
+            if subscriber["queue"].full():
+                # A slow client loses events instead of growing memory without bound
+                subscriber["dropped"] += 1
+                self.stats["events_dropped"] += 1
+                continue
+            subscriber["queue"].put_nowait(event)
+
+    def subscribe(self, call_id: Optional[str] = None, campaign_id: Optional[str] = None) -> dict:
+        """Start receiving state changes, optionally only for one call or one campaign
+
+        Events arrive on subscriber["queue"]; call unsubscribe() when the stream ends.
+        """
+        subscriber = {
+            "queue": asyncio.Queue(maxsize=self.subscriber_queue_size),
+            "call_id": call_id,
+            "campaign_id": campaign_id,
+            "dropped": 0
+        }
+        self.subscribers[id(subscriber)] = subscriber
+        return subscriber
+
+    def unsubscribe(self, subscriber: dict) -> None:
+        self.subscribers.pop(id(subscriber), None)
+
+    async def stop(self) -> None:
+        """Cancel queued and running jobs"""
+        for task in list(self.tasks):
+            task.cancel()
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            "calls": len(self.calls),
+            "active_calls": self.active_calls,
+            "campaigns": len(self.campaigns),
+            "subscribers": len(self.subscribers)
+        }
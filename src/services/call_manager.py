@@ -4,11 +4,24 @@ Call Manager - Main orchestrator for SIP calls with AI
 
 import asyncio
 import logging
-from typing import List, Optional
-from src.services.asterisk_service import AsteriskService
+from typing import Dict, List, Optional
+from src.services.call_router import CallRouter
 from src.services.stt_service import STTService
 from src.services.tts_service import TTSService
 from src.services.ai_service import AIService
+from src.services.tts_cache import TTSCache
+from src.services.response_cache import ResponseCache
+from src.services.agi_server import FastAGIServer
+from src.services.barge_in import BargeIn
+from src.services.filler import FillerAudio
+from src.services.speculation import speculation_stats
+from src.services.dialer import Dialer
+from src.services.call_jobs import CallJobs
+from src.services.campaign_store import CampaignRunner, CampaignStore, start_file_campaign
+from src.services.dnc import dnc_list
+from src.services.http_client import http_client
+from src.services.health_monitor import health_monitor
+from src.services.metrics import metrics
 from src.core.config import Config
 
 logger = logging.getLogger(__name__)
@@ -17,10 +30,20 @@ class CallManager:
     """Main call manager orchestrating Asterisk, STT, TTS, and AI"""
     
     def __init__(self):
-        self.asterisk_service = AsteriskService()
+        self.router = CallRouter()
         self.stt_service = STTService()
         self.tts_service = TTSService()
         self.ai_service = AIService()
+        self.tts_cache = TTSCache(self.tts_service)
+        self.response_cache = ResponseCache(self.ai_service)
+        self.barge_in = BargeIn(self.router) if Config.BARGE_IN_ENABLED else None
+        self.filler = FillerAudio(self.tts_cache) if Config.FILLER_ENABLED else None
+        self.agi_server = FastAGIServer(self.stt_service, self.tts_service, self.ai_service,
+                                        self.tts_cache, self.response_cache, barge_in=self.barge_in,
+                                        filler=self.filler)
+        self.dialer = Dialer(self.router)
+        self.jobs = CallJobs(self.dialer)
+        self.campaign_store = CampaignStore()
         self.is_running = False
         self.current_call = None
         
@@ -29,15 +52,33 @@ class CallManager:
         try:
             logger.info("🚀 Inicializando Call Manager...")
             
+            # Probe providers and keep their health cached in the background
+            await health_monitor.start()
+            
             # Test AI service first
             if not await self.ai_service.test_connection():
                 logger.error("❌ No se pudo conectar con Ollama")
                 return False
             
-            # Initialize Asterisk service
-            if not await self.asterisk_service.connect():
+            # Load and pin the model so the first call does not pay for it
+            await self.ai_service.start()
+            
+            # Connect to the AMI servers behind the call routes
+            if not await self.router.connect():
                 logger.warning("⚠️ No se pudo conectar con Asterisk AMI")
             
+            # Map the DNC lists before any number is queued
+            await dnc_list.start()
+            
+            # Synthesize fixed phrases before the first call needs them
+            await self.tts_cache.prewarm()
+            if self.filler:
+                await self.filler.prepare()
+            
+            # Start FastAGI server sharing the warm services
+            if Config.AGI_SERVER_ENABLED and not await self.agi_server.start():
+                logger.warning("⚠️ No se pudo iniciar el servidor FastAGI")
+            
             logger.info("✅ Call Manager inicializado")
             return True
             
@@ -45,28 +86,57 @@ class CallManager:
             logger.error(f"❌ Error inicializando Call Manager: {e}")
             return False
     
-    async def process_numbers(self, numbers: List[str]) -> None:
+    async def process_numbers(self, numbers: List[str]) -> List[dict]:
         """Process list of phone numbers"""
-        for number in numbers:
-            if number.strip():
-                logger.info(f"📞 Procesando número: {number}")
-                await self.make_call(number)
-                await asyncio.sleep(2)  # Wait between calls
+        self.is_running = True
+        try:
+            logger.info(f"📞 Procesando números con {self.dialer.max_channels} canales a {self.dialer.cps} CPS")
+            results = await self.dialer.run(numbers)
+            logger.info(f"✅ Campaña completada: {self.dialer.get_status()['results']}")
+            return results
+        finally:
+            self.is_running = False
+    
+    async def process_numbers_file(self, path: str, ingest_format: Optional[str] = None) -> Dict[str, int]:
+        """Dial a contact list (text, CSV or NDJSON) as a durable campaign
+
+        Numbers are stored as they are read and dialed from the store, so a restart with
+        the same file resumes the unfinished campaign instead of starting over.
+        """
+        campaign_id, importer = await start_file_campaign(self.campaign_store, path, ingest_format,
+                                                          suppression=dnc_list)
+        logger.info(f"📞 Procesando {path} con {self.dialer.max_channels} canales a {self.dialer.cps} CPS")
+        try:
+            return await self.run_campaign(campaign_id)
+        finally:
+            if importer:
+                importer.cancel()
+                await asyncio.gather(importer, return_exceptions=True)
+    
+    async def run_campaign(self, campaign_id: int, owner: Optional[str] = None) -> Dict[str, int]:
+        """Dial a stored campaign until nothing is pending; other processes may lease from it too"""
+        self.is_running = True
+        try:
+            await self.campaign_store.open()
+            counts = await CampaignRunner(self.campaign_store, self.dialer, owner).run(campaign_id)
+            progress = await self.campaign_store.get_progress(campaign_id)
+            logger.info(f"✅ Campaña completada: {counts} (total: {progress})")
+            return counts
+        finally:
+            self.is_running = False
     
     async def make_call(self, number: str) -> bool:
         """Make a call via Asterisk"""
         try:
             logger.info(f"📞 Iniciando llamada a: {number}")
             
-            # Make call via Asterisk
-            if not await self.asterisk_service.make_call(number):
+            # Dial and wait for AMI to report the end of the call
+            result = await self.dialer.dial(number)
+            if result["status"] == "failed":
                 logger.error("❌ Error iniciando llamada Asterisk")
                 return False
             
-            # Wait for call to be processed by AGI
-            await asyncio.sleep(30)  # Give time for AGI to process
-            
-            logger.info(f"✅ Llamada completada: {number}")
+            logger.info(f"✅ Llamada completada: {number} ({result['status']})")
             return True
             
         except Exception as e:
@@ -77,7 +147,14 @@ class CallManager:
         """Shutdown all services"""
         try:
             logger.info("🛑 Cerrando Call Manager...")
-            await self.asterisk_service.disconnect()
+            await self.jobs.stop()
+            await self.campaign_store.close()
+            await dnc_list.stop()
+            await self.agi_server.stop()
+            await self.ai_service.stop()
+            await self.router.disconnect()
+            await health_monitor.stop()
+            await http_client.close()
             self.is_running = False
             logger.info("✅ Call Manager cerrado")
         except Exception as e:
@@ -86,9 +163,22 @@ class CallManager:
     def get_status(self) -> dict:
         """Get system status"""
         return {
-            "asterisk_connected": self.asterisk_service.is_connected,
-            "ai_available": True,  # Will be updated with actual check
+            "asterisk_connected": self.router.is_connected,
+            "routes": self.router.get_status(),
+            "ai_available": health_monitor.is_healthy("ollama"),
+            "ai_warmup": self.ai_service.warmup_stats,
             "stt_configured": bool(Config.DEEPGRAM_API_KEY),
             "tts_configured": bool(Config.ELEVENLABS_API_KEY),
+            "agi": self.agi_server.get_status(),
+            "dialer": self.dialer.get_status(),
+            "jobs": self.jobs.get_stats(),
+            "campaign_store": self.campaign_store.get_stats(),
+            "dnc": dnc_list.get_stats(),
+            "http": http_client.get_stats(),
+            "tts_cache": self.tts_cache.get_stats(),
+            "response_cache": self.response_cache.get_stats(),
+            "speculation": speculation_stats.get_stats() if Config.SPECULATIVE_ENABLED else None,
+            "providers": health_monitor.get_status(),
+            "calls": metrics.get_status(),
             "running": self.is_running
         } 
\ No newline at end of file
@@ -0,0 +1,263 @@
+"""
+Call routing over a pool of AMI servers and trunks, each with its own channel and CPS limits
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Optional
+from src.services.asterisk_service import AsteriskService
+from src.services.health_monitor import CircuitBreaker
+from src.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+# How often a call waiting for a free route checks again for routes coming back into rotation
+ROUTE_POLL_INTERVAL = 1.0
+
+class RateLimiter:
+    """Spaces out calls so they never exceed a calls-per-second cap"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._next_slot = max(now, self._next_slot) + self.interval
+
+class Route:
+    """A trunk reached through one AMI server, with its own channel limit, CPS cap and circuit breaker"""
+
+    def __init__(self, name: str, server: str, channel: str, context: str, exten: str, callerid: str,
+                 max_channels: int = 0, cps: float = 0, prefixes: Optional[List[str]] = None):
+        """channel: Originate channel template, {number} is replaced by the dialed number
+
+        max_channels and cps of 0 leave the limit to the dialer.
+        """
+        self.name = name
+        self.server = server
+        self.channel = channel
+        self.context = context
+        self.exten = exten
+        self.callerid = callerid
+        self.max_channels = max_channels
+        self.cps = cps
+        self.prefixes = [prefix.lstrip("+") for prefix in prefixes or []]
+        self.active = 0
+        self.rate_limiter = RateLimiter(cps)
+        self.breaker = CircuitBreaker(f"ruta {name}", Config.ROUTE_FAILURE_THRESHOLD, Config.ROUTE_RESET_TIMEOUT)
+        self.stats = {"originated": 0, "completed": 0, "failed": 0}
+
+    def match(self, number: str) -> int:
+        """Length of the longest prefix matching the number; 0 for a catch-all route, -1 if not allowed"""
+        if not self.prefixes:
+            return 0
+        return max((len(prefix) for prefix in self.prefixes if number.startswith(prefix)), default=-1)
+
+    @property
+    def load(self) -> float:
+        return self.active / (self.max_channels or Config.DIALER_MAX_CHANNELS)
+
+    @property
+    def saturated(self) -> bool:
+        return bool(self.max_channels) and self.active >= self.max_channels
+
+    @property
+    def healthy(self) -> bool:
+        """Not failing, or failing long enough ago that a trial call may go through"""
+        breaker = self.breaker
+        return breaker.state != "open" or time.monotonic() - breaker.opened_at >= breaker.reset_timeout
+
+    def get_status(self) -> dict:
+        return {
+            **self.stats,
+            "server": self.server,
+            "active": self.active,
+            "max_channels": self.max_channels,
+            "cps": self.cps,
+            "prefixes": self.prefixes,
+            "breaker": self.breaker.get_status()
+        }
+
+class CallRouter:
+    """Sends each Originate to the least-loaded healthy route allowed for the number
+
+    Numbers matching a route prefix use those routes first and overflow to the routes without
+    prefixes. A saturated route is skipped until a call on it ends; a failing one is taken out
+    of rotation by its circuit breaker. The Dialer sees the same interface as one AsteriskService.
+    """
+
+    def __init__(self, routes_file: Optional[str] = None, share: Optional[float] = None):
+        """share: part of each route's channels and CPS this process may use (worker mode)"""
+        routes_file = Config.ROUTES_FILE if routes_file is None else routes_file
+        self.share = share or 1 / max(1, Config.WORKERS)
+        self.servers: Dict[str, AsteriskService] = {}
+        self.routes: List[Route] = []
+        if routes_file:
+            self._load(routes_file)
+        else:
+            # Single AMI server and trunk from the AMI_* settings
+            self.servers["default"] = AsteriskService("default")
+            self.routes.append(Route("default", "default", Config.AMI_ORIGINATE_CHANNEL,
+                                     Config.AMI_ORIGINATE_CONTEXT, "s", Config.AMI_CALLER_ID))
+        # ActionID of each call in flight -> its route
+        self.calls: Dict[str, Route] = {}
+        self._action_ids = itertools.count(1)
+        # Distinct from the ActionIDs each AMI connection reserves for its own actions
+        self._action_prefix = f"eve-{os.getpid()}-call"
+        self._released = asyncio.Event()
+        self.stats = {"no_route": 0, "waited": 0}
+
+    def _load(self, path: str) -> None:
+        """AMI servers and routes from a JSON file (see config/routes.example.json)"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                spec = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"No se pudo leer el archivo de rutas {path}: {e}")
+
+        for name, server in spec.get("servers", {}).items():
+            self.servers[name] = AsteriskService(name, server.get("host"), server.get("port"),
+                                                 server.get("username"), server.get("secret"))
+        for index, route in enumerate(spec.get("routes", [])):
+            name = route.get("name", f"route{index + 1}")
+            server = route.get("server") or (next(iter(self.servers)) if len(self.servers) == 1 else None)
+            if server not in self.servers:
+                raise ValueError(f"Ruta {name}: servidor AMI desconocido {server}")
+            if "{number}" not in route.get("channel", ""):
+                raise ValueError(f"Ruta {name}: el canal debe incluir {{number}}")
+            max_channels = int(route.get("max_channels", 0))
+            self.routes.append(Route(
+                name, server, route["channel"],
+                route.get("context", Config.AMI_ORIGINATE_CONTEXT),
+                route.get("exten", "s"),
+                route.get("callerid", Config.AMI_CALLER_ID),
+                # Worker processes split each trunk's limits the way they split the dialer's
+                max(1, int(max_channels * self.share)) if max_channels else 0,
+                float(route.get("cps", 0)) * self.share,
+                route.get("prefixes")
+            ))
+        if not self.routes:
+            raise ValueError(f"El archivo de rutas {path} no define rutas")
+        logger.info(f"🧭 {len(self.routes)} rutas sobre {len(self.servers)} servidores AMI")
+
+    @property
+    def is_connected(self) -> bool:
+        return any(server.is_connected for server in self.servers.values())
+
+    async def connect(self) -> bool:
+        """Connect every AMI server; routes on a server that is down fail until it reconnects"""
+        results = await asyncio.gather(*(server.connect() for server in self.servers.values()))
+        return any(results)
+
+    async def disconnect(self) -> None:
+        await asyncio.gather(*(server.disconnect() for server in self.servers.values()))
+
+    def next_action_id(self) -> str:
+        """Reserve an ActionID unique across all AMI servers"""
+        return f"{self._action_prefix}-{next(self._action_ids)}"
+
+    def set_callback(self, event: str, callback: Callable) -> None:
+        """Subscribe to an AMI event from every server
+
+        ConnectionLost carries the server name and the ActionIDs of the calls routed through it,
+        so only those calls are failed.
+        """
+        for name, server in self.servers.items():
+            if event == "ConnectionLost":
+                server.set_callback(event, lambda event, name=name: callback(
+                    {**event, "Server": name, "ActionIDs": self._calls_on(name)}))
+            else:
+                server.set_callback(event, callback)
+
+    def _calls_on(self, server: str) -> List[str]:
+        return [action_id for action_id, route in self.calls.items() if route.server == server]
+
+    def _select(self, number: str) -> Optional[Route]:
+        """Least-loaded usable route for the number, most specific prefix first"""
+        tiers = {}
+        for route in self.routes:
+            length = route.match(number)
+            if length >= 0:
+                tiers.setdefault(length, []).append(route)
+        for length in sorted(tiers, reverse=True):
+            # Routes on a connected server first, then by load
+            ranked = sorted(tiers[length], key=lambda route: (not self.servers[route.server].is_connected,
+                                                               route.load))
+            for route in ranked:
+                # The breaker is asked last: in half-open state it hands out its single trial call
+                if not route.saturated and route.breaker.allow_request():
+                    return route
+        return None
+
+    def _routable(self, number: str) -> bool:
+        """Whether some route for the number is healthy, only busy"""
+        return any(route.match(number) >= 0 and route.healthy for route in self.routes)
+
+    async def originate(self, number: str, variables: Optional[dict] = None,
+                        action_id: Optional[str] = None) -> Optional[str]:
+        """Originate through the best route, waiting while every healthy route is saturated
+
+        The route stays reserved until release() is called with the call's result.
+        """
+        action_id = action_id or self.next_action_id()
+        clean_number = AsteriskService._clean_number(number)
+        route = self._select(clean_number)
+        if route is None and self._routable(clean_number):
+            self.stats["waited"] += 1
+        while route is None:
+            if not self._routable(clean_number):
+                self.stats["no_route"] += 1
+                logger.error(f"❌ Sin rutas disponibles para {clean_number}")
+                return None
+            released = self._released
+            try:
+                await asyncio.wait_for(released.wait(), timeout=ROUTE_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            route = self._select(clean_number)
+
+        route.active += 1
+        route.stats["originated"] += 1
+        self.calls[action_id] = route
+        await route.rate_limiter.acquire()
+        logger.debug(f"🧭 {clean_number} por la ruta {route.name}")
+        return await self.servers[route.server].originate(
+            number, variables, action_id=action_id, channel=route.channel,
+            context=route.context, exten=route.exten, callerid=route.callerid
+        )
+
+    def release(self, action_id: str, status: str) -> None:
+        """Free the call's channel on its route and feed the result to the route's breaker"""
+        route = self.calls.pop(action_id, None)
+        if route is None:
+            return
+        route.active -= 1
+        if status == "failed":
+            route.stats["failed"] += 1
+            route.breaker.record_failure()
+        elif status in ("answered", "busy", "no_answer"):
+            # The trunk worked even if nobody picked up; a cancelled call says nothing either way
+            route.stats["completed"] += 1
+            route.breaker.record_success()
+        # Wake the calls waiting for a free route
+        released, self._released = self._released, asyncio.Event()
+        released.set()
+
+    def get_status(self) -> dict:
+        return {
+            **self.stats,
+            "servers": {name: server.is_connected for name, server in self.servers.items()},
+            "routes": {route.name: route.get_status() for route in self.routes}
+        }
@@ -0,0 +1,418 @@
+"""
+Durable campaign queue: per-number state in SQLite (WAL) with leases, retries and batched writes
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from src.services.dialer import Dialer
+from src.services.number_ingest import NumberIngest, detect_format, read_lines
+from src.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Number states: pending (due at retry_at), dialing (leased to a worker) and done
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS campaigns (
+    id INTEGER PRIMARY KEY,
+    source TEXT,
+    state TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_campaigns_source ON campaigns (source, state);
+CREATE TABLE IF NOT EXISTS campaign_numbers (
+    id INTEGER PRIMARY KEY,
+    campaign_id INTEGER NOT NULL,
+    number TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    retry_at REAL NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    outcome TEXT,
+    lease_owner TEXT,
+    lease_until REAL,
+    updated_at REAL,
+    UNIQUE (campaign_id, number)
+);
+-- Next batch: an index range scan over the due pending rows, whatever the campaign size
+CREATE INDEX IF NOT EXISTS idx_numbers_next ON campaign_numbers (campaign_id, state, retry_at);
+-- Expired leases: only rows being dialed are visited
+CREATE INDEX IF NOT EXISTS idx_numbers_lease ON campaign_numbers (state, lease_until);
+"""
+
+def parse_retry_backoff(spec: str) -> Dict[str, float]:
+    """"busy:300,no_answer:900" -> base retry delay in seconds by outcome"""
+    backoff = {}
+    for item in spec.split(","):
+        if ":" in item:
+            outcome, seconds = item.split(":", 1)
+            backoff[outcome.strip()] = float(seconds)
+    return backoff
+
+def new_owner_id() -> str:
+    """Lease owner for this process: readable in the database, unique across restarts"""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+class CampaignStore:
+    """SQLite campaign store; every query runs on one dedicated thread, off the event loop"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or Config.CAMPAIGN_DB_PATH
+        self.conn: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="campaign-store")
+        # (state, outcome, retry_at, updated_at, number_id, owner) rows waiting for the next flush
+        self._results: List[Tuple] = []
+        self.stats = {"leased": 0, "results": 0, "flushes": 0, "leases_expired": 0}
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def open(self) -> None:
+        if self.conn is None:
+            await self._run(self._open)
+
+    def _open(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit; transactions are explicit so each batch is one commit
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL with synchronous=NORMAL only risks the last commits on power loss, never corruption
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        self.conn = conn
+        logger.info(f"🗄️ Almacén de campañas: {self.path}")
+
+    async def close(self) -> None:
+        if self.conn is None:
+            return
+        await self.flush()
+        await self._run(self.conn.close)
+        self.conn = None
+        self._executor.shutdown(wait=False)
+
+    def _transaction(self, fn, *args):
+        """Run fn(conn, *args) in one write transaction"""
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn, *args)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    async def create_campaign(self, source: Optional[str] = None) -> int:
+        now = time.time()
+        # Integer ids keep the per-number rows and their indexes small
+        return await self._run(self._transaction, lambda conn: conn.execute(
+            "INSERT INTO campaigns (source, state, created_at, updated_at) VALUES (?, 'importing', ?, ?)",
+            (source, now, now)
+        ).lastrowid)
+
+    async def find_campaign(self, source: str) -> Optional[dict]:
+        """Most recent unfinished campaign for a source, to resume it"""
+        def query():
+            row = self.conn.execute(
+                "SELECT id, state, total FROM campaigns WHERE source = ? AND state != 'completed' "
+                "ORDER BY created_at DESC LIMIT 1", (source,)
+            ).fetchone()
+            return {"id": row[0], "state": row[1], "total": row[2]} if row else None
+        return await self._run(query)
+
+    async def set_campaign_state(self, campaign_id: int, state: str) -> None:
+        await self._run(self._transaction, lambda conn: conn.execute(
+            "UPDATE campaigns SET state = ?, updated_at = ? WHERE id = ?", (state, time.time(), campaign_id)
+        ))
+
+    async def add_numbers(self, campaign_id: int, numbers: AsyncIterator[str],
+                          batch_size: Optional[int] = None) -> int:
+        """Insert numbers as they arrive, one transaction per batch; numbers already stored are ignored
+
+        Importing the same source again after a crash is therefore safe.
+        """
+        batch_size = batch_size or Config.CAMPAIGN_WRITE_BATCH
+        added = 0
+
+        def insert(conn, batch):
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO campaign_numbers (campaign_id, number) VALUES (?, ?)",
+                [(campaign_id, number) for number in batch]
+            )
+            inserted = conn.total_changes - before
+            conn.execute("UPDATE campaigns SET total = total + ?, updated_at = ? WHERE id = ?",
+                         (inserted, time.time(), campaign_id))
+            return inserted
+
+        batch = []
+        async for number in numbers:
+            batch.append(number)
+            if len(batch) >= batch_size:
+                added += await self._run(self._transaction, insert, batch)
+                batch = []
+        if batch:
+            added += await self._run(self._transaction, insert, batch)
+        return added
+
+    async def lease(self, campaign_id: int, owner: str, limit: int,
+                    lease_seconds: Optional[float] = None) -> List[Tuple[int, str, int]]:
+        """Take up to limit due numbers for owner; returns (number_id, number, attempts)"""
+        lease_seconds = lease_seconds or Config.CAMPAIGN_LEASE_SECONDS
+
+        def lease(conn):
+            now = time.time()
+            return conn.execute(
+                "UPDATE campaign_numbers SET state = 'dialing', lease_owner = ?, lease_until = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE id IN ("
+                "SELECT id FROM campaign_numbers WHERE campaign_id = ? AND state = 'pending' AND retry_at <= ? "
+                "ORDER BY retry_at LIMIT ?) RETURNING id, number, attempts",
+                (owner, now + lease_seconds, now, campaign_id, now, limit)
+            ).fetchall()
+
+        leased = await self._run(self._transaction, lease)
+        self.stats["leased"] += len(leased)
+        return leased
+
+    async def renew(self, owner: str, lease_seconds: Optional[float] = None) -> int:
+        """Extend every lease owner holds; a worker that stops renewing loses its numbers"""
+        lease_seconds = lease_seconds or Config.CAMPAIGN_LEASE_SECONDS
+        return await self._run(self._transaction, lambda conn: conn.execute(
+            "UPDATE campaign_numbers SET lease_until = ? WHERE state = 'dialing' AND lease_owner = ?",
+            (time.time() + lease_seconds, owner)
+        ).rowcount)
+
+    async def release_expired(self) -> int:
+        """Return numbers whose lease ran out (crashed or stopped worker) to the queue"""
+        released = await self._run(self._transaction, lambda conn: conn.execute(
+            "UPDATE campaign_numbers SET state = 'pending', lease_owner = NULL, lease_until = NULL "
+            "WHERE state = 'dialing' AND lease_until < ?", (time.time(),)
+        ).rowcount)
+        if released:
+            self.stats["leases_expired"] += released
+            logger.warning(f"⚠️ {released} números con lease vencido vuelven a la cola")
+        return released
+
+    async def release_owner(self, owner: str) -> int:
+        """Return every number leased by owner (a worker known to be dead) without waiting for expiry"""
+        return await self._run(self._transaction, lambda conn: conn.execute(
+            "UPDATE campaign_numbers SET state = 'pending', lease_owner = NULL, lease_until = NULL "
+            "WHERE state = 'dialing' AND lease_owner = ?", (owner,)
+        ).rowcount)
+
+    async def release(self, owner: str, number_ids: List[int]) -> None:
+        """Give back numbers leased but never dialed, without counting the attempt"""
+        if not number_ids:
+            return
+        await self._run(self._transaction, lambda conn: conn.executemany(
+            "UPDATE campaign_numbers SET state = 'pending', lease_owner = NULL, lease_until = NULL, "
+            "attempts = attempts - 1 WHERE id = ? AND lease_owner = ?",
+            [(number_id, owner) for number_id in number_ids]
+        ))
+
+    def record_result(self, number_id: int, owner: str, state: str, outcome: str, retry_at: float = 0.0) -> bool:
+        """Buffer a call result for the next flush; returns True once a full batch is waiting"""
+        self._results.append((state, outcome, retry_at, time.time(), number_id, owner))
+        self.stats["results"] += 1
+        return len(self._results) >= Config.CAMPAIGN_WRITE_BATCH
+
+    async def flush(self) -> int:
+        """Write buffered results in one transaction"""
+        if not self._results or self.conn is None:
+            return 0
+        results, self._results = self._results, []
+        try:
+            # A row re-leased by another worker after this lease expired keeps the newer owner's state
+            await self._run(self._transaction, lambda conn: conn.executemany(
+                "UPDATE campaign_numbers SET state = ?, outcome = ?, retry_at = ?, updated_at = ?, "
+                "lease_owner = NULL, lease_until = NULL WHERE id = ? AND lease_owner = ?", results
+            ))
+        except Exception:
+            # Kept for the next flush; meanwhile the rows stay leased
+            self._results[:0] = results
+            raise
+        self.stats["flushes"] += 1
+        return len(results)
+
+    async def complete_campaign(self, campaign_id: int) -> None:
+        """Mark a fully imported campaign completed; one whose import failed stays open to be imported again"""
+        await self._run(self._transaction, lambda conn: conn.execute(
+            "UPDATE campaigns SET state = 'completed', updated_at = ? WHERE id = ? AND state = 'running'",
+            (time.time(), campaign_id)
+        ))
+
+    async def remaining(self, campaign_id: int) -> Tuple[int, Optional[float], bool]:
+        """Numbers being dialed, when the next pending one is due (None if none is left)
+        and whether numbers are still being imported"""
+        def query():
+            importing = self.conn.execute(
+                "SELECT state = 'importing' FROM campaigns WHERE id = ?", (campaign_id,)
+            ).fetchone()
+            dialing = self.conn.execute(
+                "SELECT COUNT(*) FROM campaign_numbers WHERE campaign_id = ? AND state = 'dialing'", (campaign_id,)
+            ).fetchone()[0]
+            next_due = self.conn.execute(
+                "SELECT MIN(retry_at) FROM campaign_numbers WHERE campaign_id = ? AND state = 'pending'", (campaign_id,)
+            ).fetchone()[0]
+            return dialing, next_due, bool(importing and importing[0])
+        return await self._run(query)
+
+    async def get_progress(self, campaign_id: int) -> dict:
+        """Counts by state, and by outcome for finished numbers"""
+        def query():
+            counts = {}
+            for state, outcome, count in self.conn.execute(
+                "SELECT state, outcome, COUNT(*) FROM campaign_numbers WHERE campaign_id = ? GROUP BY state, outcome",
+                (campaign_id,)
+            ):
+                key = outcome if state == "done" else state
+                counts[key] = counts.get(key, 0) + count
+            return counts
+        return await self._run(query)
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "path": self.path, "buffered_results": len(self._results)}
+
+async def start_file_campaign(store: CampaignStore, path: str, ingest_format: Optional[str] = None,
+                              suppression=None) -> Tuple[int, Optional[asyncio.Task]]:
+    """Resume the unfinished campaign of a contact list (text, CSV or NDJSON), or create it
+
+    Returns the campaign id and the task still importing the file, None when a fully imported
+    campaign is resumed. The campaign can be dialed while it imports.
+    """
+    await store.open()
+    stat = os.stat(path)
+    source = f"{os.path.abspath(path)}:{stat.st_size}:{int(stat.st_mtime)}"
+    campaign = await store.find_campaign(source)
+    if campaign and campaign["state"] == "running":
+        logger.info(f"🔁 Reanudando campaña {campaign['id']} de {path} ({campaign['total']} números)")
+        return campaign["id"], None
+    # A campaign whose import did not finish is imported again; stored numbers are skipped
+    campaign_id = campaign["id"] if campaign else await store.create_campaign(source)
+    ingest = NumberIngest(ingest_format or detect_format(path), suppression=suppression)
+    return campaign_id, asyncio.create_task(_import_file(store, campaign_id, path, ingest))
+
+async def _import_file(store: CampaignStore, campaign_id: int, path: str, ingest: NumberIngest) -> None:
+    try:
+        await store.add_numbers(campaign_id, ingest.numbers(read_lines(path)))
+    except Exception as e:
+        logger.error(f"❌ Error importando {path}: {e}")
+        await store.set_campaign_state(campaign_id, "import_failed")
+        return
+    await store.set_campaign_state(campaign_id, "running")
+    logger.info(f"📥 Campaña {campaign_id} importada")
+
+class CampaignRunner:
+    """Dials a stored campaign through leases until no number is pending or being dialed
+
+    Stopping at any point (even a crash) leaves the rest of the campaign in the store:
+    unfinished leases expire and the next run picks up where this one stopped.
+    """
+
+    def __init__(self, store: CampaignStore, dialer: Dialer, owner: Optional[str] = None):
+        self.store = store
+        self.dialer = dialer
+        self.owner = owner or new_owner_id()
+        self.backoff = parse_retry_backoff(Config.CAMPAIGN_RETRY_BACKOFF)
+        self.max_attempts = Config.CAMPAIGN_MAX_ATTEMPTS
+        self._flush_needed = asyncio.Event()
+        # Replaced after every finished call, so idle workers re-check right away
+        self._call_finished = asyncio.Event()
+
+    def next_state(self, outcome: str, attempts: int) -> Tuple[str, float]:
+        """(state, retry_at) after a call: retried outcomes back off exponentially per attempt"""
+        base = self.backoff.get(outcome)
+        if base is None or attempts >= self.max_attempts:
+            return "done", 0.0
+        delay = min(base * 2 ** (attempts - 1), Config.CAMPAIGN_RETRY_MAX_DELAY)
+        return "pending", time.time() + delay
+
+    async def run(self, campaign_id: int) -> Dict[str, int]:
+        """Dial the campaign with max_channels workers; returns counts by outcome for this run"""
+        counts = {}
+        buffered: List[Tuple[int, str, int]] = []
+        lease_lock = asyncio.Lock()
+        await self.store.release_expired()
+
+        async def next_number() -> Optional[Tuple[int, str, int]]:
+            while True:
+                async with lease_lock:
+                    if not buffered:
+                        buffered.extend(await self.store.lease(campaign_id, self.owner, self.dialer.max_channels))
+                    if buffered:
+                        return buffered.pop(0)
+                    # Nothing due: results still buffered may hold retries, so write them first
+                    await self.store.flush()
+                    dialing, next_due, importing = await self.store.remaining(campaign_id)
+                if not dialing and next_due is None and not importing:
+                    return None
+                # Calls in flight may schedule retries; otherwise sleep until the next one is due
+                wait = Config.CAMPAIGN_POLL_INTERVAL
+                if importing:
+                    wait = Config.CAMPAIGN_FLUSH_INTERVAL
+                elif next_due is not None:
+                    wait = min(wait, max(next_due - time.time(), 0.0))
+                try:
+                    await asyncio.wait_for(self._call_finished.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+
+        async def worker():
+            while (item := await next_number()) is not None:
+                number_id, number, attempts = item
+                try:
+                    result = await self.dialer.dial(number)
+                    outcome = result["status"]
+                except Exception as e:
+                    logger.error(f"❌ Error en llamada {number}: {e}")
+                    outcome = "failed"
+                counts[outcome] = counts.get(outcome, 0) + 1
+                state, retry_at = self.next_state(outcome, attempts)
+                if self.store.record_result(number_id, self.owner, state, outcome, retry_at):
+                    self._flush_needed.set()
+                self._call_finished.set()
+                self._call_finished = asyncio.Event()
+
+        background = [asyncio.create_task(self._flush_loop()), asyncio.create_task(self._renew_loop())]
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.dialer.max_channels)))
+            await self.store.complete_campaign(campaign_id)
+        finally:
+            for task in background:
+                task.cancel()
+            await asyncio.gather(*background, return_exceptions=True)
+            await self.store.flush()
+            # Leased but not started: back to the queue now instead of after the lease expires
+            await self.store.release(self.owner, [item[0] for item in buffered])
+        return counts
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_needed.wait(), timeout=Config.CAMPAIGN_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_needed.clear()
+            try:
+                await self.store.flush()
+            except Exception as e:
+                logger.error(f"❌ Error guardando resultados de campaña: {e}")
+
+    async def _renew_loop(self) -> None:
+        """Keep this runner's leases alive and reclaim the ones other runners stopped renewing"""
+        while True:
+            await asyncio.sleep(Config.CAMPAIGN_LEASE_SECONDS / 3)
+            try:
+                await self.store.renew(self.owner)
+                await self.store.release_expired()
+            except Exception as e:
+                logger.error(f"❌ Error renovando leases de campaña: {e}")
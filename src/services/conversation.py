@@ -0,0 +1,72 @@
+"""
+Per-call conversation state for Ollama chat requests
+"""
+
+import logging
+from typing import List, Optional
+from src.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token) for budgeting history"""
+    return len(text) // 4 + 1
+
+class ConversationSession:
+    """Chat history for one call behind a fixed system prompt"""
+
+    def __init__(self, system_prompt: Optional[str] = None, token_budget: Optional[int] = None):
+        self.system_prompt = system_prompt or Config.OLLAMA_SYSTEM_PROMPT
+        self.token_budget = token_budget or Config.OLLAMA_HISTORY_TOKENS
+        self.history = []
+        self.history_tokens = 0
+        self.turns = 0
+
+    def build_messages(self, text: str) -> List[dict]:
+        """Messages for the next request: system prompt, history, then the new user turn"""
+        # The system prompt never changes, so Ollama can reuse its cached prefill
+        return [
+            {"role": "system", "content": self.system_prompt},
+            *self.history,
+            {"role": "user", "content": text}
+        ]
+
+    def add_assistant(self, text: str) -> None:
+        """Record something the assistant said outside a turn, such as the greeting"""
+        self._append("assistant", text)
+        self._trim()
+
+    def record_turn(self, user_text: str, assistant_text: str) -> None:
+        """Record a completed user/assistant exchange"""
+        self._append("user", user_text)
+        self._append("assistant", assistant_text)
+        self.turns += 1
+        self._trim()
+
+    def _append(self, role: str, text: str) -> None:
+        self.history.append({"role": role, "content": text})
+        self.history_tokens += estimate_tokens(text)
+
+    def _trim(self) -> None:
+        """Drop the oldest messages once over budget
+
+        History is cut down to half the budget so the prompt prefix then stays
+        stable, and cacheable, for several turns instead of shifting every turn.
+        """
+        if self.history_tokens <= self.token_budget:
+            return
+        while self.history and self.history_tokens > self.token_budget // 2:
+            dropped = self.history.pop(0)
+            self.history_tokens -= estimate_tokens(dropped["content"])
+        # Chat history should resume on a user message
+        while self.history and self.history[0]["role"] != "user":
+            dropped = self.history.pop(0)
+            self.history_tokens -= estimate_tokens(dropped["content"])
+        logger.debug(f"✂️ Historial recortado a {len(self.history)} mensajes")
+
+    def get_stats(self) -> dict:
+        return {
+            "turns": self.turns,
+            "messages": len(self.history),
+            "history_tokens": self.history_tokens
+        }
@@ -0,0 +1,245 @@
+"""
+Campaign dialer driven by AMI events
+"""
+
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional
+from src.services.call_router import CallRouter, RateLimiter
+from src.services.dnc import dnc_list
+from src.services.metrics import metrics
+from src.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+# OriginateResponse Reason codes reported by Asterisk
+ORIGINATE_REASONS = {
+    0: "failed",
+    1: "no_answer",
+    3: "no_answer",
+    4: "answered",
+    5: "busy",
+    8: "failed"
+}
+
+class Dialer:
+    """Concurrent dialer with a channel limit and a CPS cap; the router picks the trunk of each call"""
+
+    def __init__(self, router: CallRouter,
+                 max_channels: Optional[int] = None, cps: Optional[float] = None):
+        self.router = router
+        self.max_channels = max_channels or Config.DIALER_MAX_CHANNELS
+        self.cps = cps if cps is not None else Config.DIALER_CPS
+        self.semaphore = asyncio.Semaphore(self.max_channels)
+        self.rate_limiter = RateLimiter(self.cps)
+        self.calls = {}
+        self.channels = {}
+        self.listeners = {}
+        self.stats = {"answered": 0, "busy": 0, "no_answer": 0, "failed": 0, "suppressed": 0}
+
+        router.set_callback("OriginateResponse", self._on_originate_response)
+        router.set_callback("Hangup", self._on_hangup)
+        router.set_callback("ConnectionLost", self._on_connection_lost)
+
+    async def dial(self, number: str, on_update: Optional[Callable[[dict], None]] = None) -> dict:
+        """Dial a number and wait until AMI reports the call finished
+
+        on_update(call) is called when the call starts dialing, is answered and ends.
+        Numbers on a DNC list end as "suppressed" without taking a channel.
+        """
+        if dnc_list.is_suppressed(number):
+            return self._suppressed(number, on_update)
+
+        queued = time.monotonic()
+        async with self.semaphore:
+            await self.rate_limiter.acquire()
+            metrics.dialer_queue_wait_seconds.observe(time.monotonic() - queued)
+
+            action_id = self.router.next_action_id()
+            call = {
+                "number": number,
+                "status": "dialing",
+                "channel": None,
+                "uniqueid": None,
+                "started_at": time.time(),
+                "answered_at": None,
+                "ended_at": None,
+                "duration": 0.0
+            }
+            done = asyncio.get_running_loop().create_future()
+            originated = asyncio.Event()
+            self.calls[action_id] = (call, done, originated)
+            if on_update:
+                self.listeners[action_id] = on_update
+            self._notify(action_id)
+
+            try:
+                if not await self.router.originate(number, action_id=action_id):
+                    self._finish(action_id, "failed")
+                else:
+                    await self._wait_for_end(action_id)
+            finally:
+                self.router.release(action_id, call["status"])
+                self.calls.pop(action_id, None)
+                self.listeners.pop(action_id, None)
+                if call["uniqueid"]:
+                    self.channels.pop(call["uniqueid"], None)
+
+            logger.info(f"📞 Resultado {number}: {call['status']} ({call['duration']:.1f}s)")
+            return call
+
+    def _suppressed(self, number: str, on_update: Optional[Callable[[dict], None]]) -> dict:
+        now = time.time()
+        call = {"number": number, "status": "suppressed", "channel": None, "uniqueid": None,
+                "started_at": now, "answered_at": None, "ended_at": now, "duration": 0.0}
+        self.stats["suppressed"] += 1
+        logger.info(f"🚫 {number} está en lista DNC, no se marca")
+        if on_update:
+            try:
+                on_update(call)
+            except Exception as e:
+                logger.error(f"❌ Error notificando estado de llamada: {e}")
+        return call
+
+    async def _wait_for_end(self, action_id: str) -> None:
+        """Wait for OriginateResponse and, if answered, for the Hangup event"""
+        call, done, originated = self.calls[action_id]
+        try:
+            await asyncio.wait_for(originated.wait(), timeout=Config.AMI_ORIGINATE_TIMEOUT + Config.DIALER_EVENT_GRACE)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Sin OriginateResponse para {call['number']}")
+            self._finish(action_id, "failed")
+            return
+
+        if done.done():
+            return
+
+        # Answered: the talk time limit counts from the answer, not from the Originate
+        try:
+            await asyncio.wait_for(done, timeout=Config.DIALER_MAX_CALL_DURATION)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Sin evento Hangup para {call['number']}, cerrando resultado")
+            self._finish(action_id, "answered")
+
+    def _on_originate_response(self, event: dict) -> None:
+        action_id = event.get("ActionID")
+        if action_id not in self.calls:
+            return
+        call, _, originated = self.calls[action_id]
+        originated.set()
+        call["channel"] = event.get("Channel")
+        call["uniqueid"] = event.get("Uniqueid")
+
+        try:
+            reason = int(event.get("Reason", 0))
+        except ValueError:
+            reason = 0
+        status = ORIGINATE_REASONS.get(reason, "failed")
+
+        if event.get("Response") == "Success" and status == "answered":
+            call["status"] = "answered"
+            call["answered_at"] = time.time()
+            if call["uniqueid"]:
+                self.channels[call["uniqueid"]] = action_id
+            self._notify(action_id)
+        else:
+            self._finish(action_id, status)
+
+    def _on_hangup(self, event: dict) -> None:
+        action_id = self.channels.pop(event.get("Uniqueid"), None)
+        if action_id in self.calls:
+            call = self.calls[action_id][0]
+            call["hangup_cause"] = event.get("Cause-txt") or event.get("Cause")
+            self._finish(action_id, "answered")
+
+    def _on_connection_lost(self, event: dict) -> None:
+        """Fail in-flight calls whose OriginateResponse/Hangup can no longer arrive
+
+        Only the calls routed through the AMI server that dropped (event ActionIDs) are affected.
+        """
+        lost = set(event.get("ActionIDs", self.calls))
+        for action_id, (call, done, _) in list(self.calls.items()):
+            if action_id in lost and not done.done():
+                call["error"] = "ami_connection_lost"
+                self._finish(action_id, "failed")
+        for uniqueid, action_id in list(self.channels.items()):
+            if action_id in lost:
+                del self.channels[uniqueid]
+
+    def _finish(self, action_id: str, status: str) -> None:
+        call, done, originated = self.calls[action_id]
+        originated.set()
+        if done.done():
+            return
+        call["status"] = status
+        call["ended_at"] = time.time()
+        if call["answered_at"]:
+            call["duration"] = call["ended_at"] - call["answered_at"]
+        self.stats[status] += 1
+        done.set_result(call)
+        self._notify(action_id)
+
+    def _notify(self, action_id: str) -> None:
+        listener = self.listeners.get(action_id)
+        if not listener:
+            return
+        try:
+            listener(self.calls[action_id][0])
+        except Exception as e:
+            logger.error(f"❌ Error notificando estado de llamada: {e}")
+
+    async def run(self, numbers: Iterable[str]) -> List[dict]:
+        """Dial every number keeping up to max_channels calls in flight"""
+        pending = (number.strip() for number in numbers if number.strip())
+        results = []
+
+        async def worker():
+            for number in pending:
+                results.append(await self.dial(number))
+
+        await asyncio.gather(*(worker() for _ in range(self.max_channels)))
+        return results
+
+    async def run_stream(self, numbers: AsyncIterator[str],
+                         on_result: Optional[Callable[[dict], None]] = None) -> Dict[str, int]:
+        """Dial numbers as they arrive, through a bounded queue, and return counts by status
+
+        A full queue stops pulling from numbers, so a large list is read only as fast as it is dialed.
+        """
+        queue = asyncio.Queue(maxsize=Config.INGEST_QUEUE_SIZE)
+        counts = {}
+
+        async def produce():
+            try:
+                async for number in numbers:
+                    await queue.put(number)
+            finally:
+                for _ in range(self.max_channels):
+                    await queue.put(None)
+
+        async def worker():
+            while (number := await queue.get()) is not None:
+                result = await self.dial(number)
+                counts[result["status"]] = counts.get(result["status"], 0) + 1
+                if on_result:
+                    on_result(result)
+
+        producer = asyncio.create_task(produce())
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.max_channels)))
+        except BaseException:
+            producer.cancel()
+            raise
+        # Re-raises a read error once the numbers already queued were dialed
+        await producer
+        return counts
+
+    def get_status(self) -> dict:
+        """Get dialer status"""
+        return {
+            "max_channels": self.max_channels,
+            "cps": self.cps,
+            "active_calls": len(self.calls),
+            "results": dict(self.stats)
+        }
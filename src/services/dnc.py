@@ -0,0 +1,210 @@
+"""
+Do-not-call suppression: DNC files as sorted, memory-mapped arrays of E.164 numbers
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+import numpy as np
+from src.services.number_ingest import NumberIngest, detect_format
+from src.utils.numbers import normalize_number
+from src.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "dnc-"
+CACHE_SUFFIX = ".npy"
+
+class DNCList:
+    """Numbers that must never be dialed, checked in memory before a call is queued
+
+    Each DNC file is normalized once into a sorted int64 array saved under DNC_CACHE_DIR and
+    memory-mapped, so lookups are binary searches and the pages are shared with the OS cache.
+    A reload only rebuilds the files whose size or modification time changed.
+    """
+
+    def __init__(self, sources: Optional[List[str]] = None, cache_dir: Optional[str] = None):
+        if sources is None:
+            sources = [path.strip() for path in Config.DNC_FILES.split(",") if path.strip()]
+        self.sources = sources
+        self.cache_dir = cache_dir or Config.DNC_CACHE_DIR
+        # File signature (path, size, mtime) -> its sorted array
+        self.tables: Dict[str, np.ndarray] = {}
+        self._arrays = ()
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._missing = set()
+        self.stats = {"reloads": 0, "files_built": 0, "load_seconds": 0.0, "loaded_at": None,
+                      "lookups": 0, "lookup_seconds": 0.0, "suppressed": 0, "errors": 0}
+
+    def _source_files(self) -> List[str]:
+        """Configured files, and the files inside configured directories"""
+        files = []
+        for source in self.sources:
+            if os.path.isdir(source):
+                files.extend(os.path.join(source, name) for name in sorted(os.listdir(source))
+                             if not name.startswith(".") and os.path.isfile(os.path.join(source, name)))
+            elif os.path.exists(source):
+                files.append(source)
+                self._missing.discard(source)
+            elif source not in self._missing:
+                self._missing.add(source)
+                logger.warning(f"⚠️ Archivo DNC {source} no encontrado")
+        return files
+
+    @staticmethod
+    def _signature(path: str) -> str:
+        stat = os.stat(path)
+        return f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def _cache_path(self, signature: str) -> str:
+        digest = hashlib.sha1(signature.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{CACHE_PREFIX}{digest}{CACHE_SUFFIX}")
+
+    @staticmethod
+    def _build(path: str, cache_path: str) -> None:
+        """Normalize a DNC file (text, CSV or NDJSON) into a sorted array of unique numbers"""
+        ingest = NumberIngest(detect_format(path))
+        chunks = []
+        with open(path, "r", encoding="utf-8", errors="replace", newline="") as f:
+            while lines := f.readlines(Config.INGEST_READ_BYTES):
+                values = ingest.normalize(lines)
+                chunks.append(values[values != 0])
+        values = np.unique(np.concatenate(chunks)) if chunks else np.zeros(0, dtype=np.int64)
+        # Written aside and renamed, so a reader never maps a half-written file
+        temp_path = f"{cache_path}.tmp"
+        with open(temp_path, "wb") as f:
+            np.save(f, values)
+        os.replace(temp_path, cache_path)
+
+    @staticmethod
+    def _open(cache_path: str) -> np.ndarray:
+        table = np.load(cache_path, mmap_mode="r")
+        # A plain ndarray over the mapping: same pages, without the memmap subclass overhead per lookup
+        return np.asarray(table) if len(table) else np.zeros(0, dtype=np.int64)
+
+    def _load(self) -> Dict[str, np.ndarray]:
+        """Tables for the current files, reusing the ones that did not change"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tables = {}
+        for path in self._source_files():
+            signature = self._signature(path)
+            table = self.tables.get(signature)
+            if table is None:
+                cache_path = self._cache_path(signature)
+                if not os.path.exists(cache_path):
+                    started = time.monotonic()
+                    self._build(path, cache_path)
+                    self.stats["files_built"] += 1
+                    logger.info(f"🚫 DNC {path} indexado en {time.monotonic() - started:.2f}s")
+                table = self._open(cache_path)
+            tables[signature] = table
+
+        # Arrays of files that changed or were removed are no longer needed on disk
+        current = {os.path.basename(self._cache_path(signature)) for signature in tables}
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(CACHE_PREFIX) and name.endswith(CACHE_SUFFIX) and name not in current:
+                os.unlink(os.path.join(self.cache_dir, name))
+        return tables
+
+    def _changed(self) -> bool:
+        try:
+            return {self._signature(path) for path in self._source_files()} != set(self.tables)
+        except OSError:
+            return True
+
+    async def reload(self) -> dict:
+        """Pick up added, changed and removed DNC files; lookups keep using the old tables meanwhile"""
+        async with self._lock:
+            started = time.monotonic()
+            try:
+                tables = await asyncio.to_thread(self._load)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"❌ Error cargando listas DNC: {e}")
+                raise
+            self.tables = tables
+            # One tuple swap: a lookup sees either the old set of tables or the new one
+            self._arrays = tuple(table for table in tables.values() if len(table))
+            self.stats["reloads"] += 1
+            self.stats["load_seconds"] = round(time.monotonic() - started, 3)
+            self.stats["loaded_at"] = time.time()
+            logger.info(f"🚫 Listas DNC: {self.entries} números en {len(tables)} archivos "
+                        f"({self.stats['load_seconds']}s)")
+            return self.get_stats()
+
+    async def start(self) -> None:
+        """Load the configured DNC files and watch them for changes"""
+        if not self.sources:
+            return
+        try:
+            await self.reload()
+        except Exception:
+            pass
+        if Config.DNC_RELOAD_INTERVAL > 0 and (not self._task or self._task.done()):
+            self._task = asyncio.create_task(self._reload_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _reload_loop(self) -> None:
+        while True:
+            await asyncio.sleep(Config.DNC_RELOAD_INTERVAL)
+            if await asyncio.to_thread(self._changed):
+                try:
+                    await self.reload()
+                except Exception:
+                    pass
+
+    @property
+    def entries(self) -> int:
+        return sum(len(table) for table in self._arrays)
+
+    def contains(self, values: np.ndarray) -> np.ndarray:
+        """Mask of the E.164 values (int64, as from normalize_e164) that are on a DNC list"""
+        started = time.perf_counter()
+        found = np.zeros(len(values), dtype=bool)
+        for table in self._arrays:
+            index = np.minimum(np.searchsorted(table, values), len(table) - 1)
+            found |= table[index] == values
+        self.stats["lookups"] += len(values)
+        self.stats["lookup_seconds"] += time.perf_counter() - started
+        self.stats["suppressed"] += int(found.sum())
+        return found
+
+    def is_suppressed(self, number: str) -> bool:
+        """Check one raw number (any format the ingest accepts) against the DNC lists"""
+        arrays = self._arrays
+        if not arrays:
+            return False
+        started = time.perf_counter()
+        value = normalize_number(number, Config.NUMBERS_DEFAULT_COUNTRY_CODE, Config.NUMBERS_NATIONAL_LENGTH)
+        found = False
+        if value:
+            for table in arrays:
+                index = int(table.searchsorted(value))
+                if index < len(table) and table[index] == value:
+                    found = True
+                    break
+        self.stats["lookups"] += 1
+        self.stats["lookup_seconds"] += time.perf_counter() - started
+        self.stats["suppressed"] += found
+        return found
+
+    def get_stats(self) -> dict:
+        lookup_seconds = self.stats["lookup_seconds"]
+        return {
+            **self.stats,
+            "lookup_seconds": round(lookup_seconds, 6),
+            "lookups_per_second": round(self.stats["lookups"] / lookup_seconds) if lookup_seconds else None,
+            "files": len(self.tables),
+            "entries": self.entries,
+            "mapped_bytes": sum(table.nbytes for table in self._arrays)
+        }
+
+dnc_list = DNCList()
@@ -0,0 +1,84 @@
+"""
+Latency masking: short acknowledgements played while the answer is still being prepared
+"""
+
+import asyncio
+import itertools
+import logging
+from typing import Optional
+from src.services.tts_cache import TTSCache
+from src.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Weight of the latest turn in the running estimate of the response latency
+LATENCY_SMOOTHING = 0.3
+
+class FillerAudio:
+    """Acknowledgements ("mm-hm", "déjame ver") played right after the caller stops talking
+
+    A filler plays only when the predicted time to the answer's first audio is over
+    FILLER_THRESHOLD_MS. The prediction is a running average of that time over the generated
+    turns, less the head start of a speculative generation. The audio is synthesized once
+    through the TTS cache, so it is stored on disk in the channel's codec like any answer.
+    """
+
+    def __init__(self, tts_cache: TTSCache):
+        self.tts_cache = tts_cache
+        self.phrases = list(Config.FILLER_PHRASES)
+        self._next_phrase = itertools.cycle(self.phrases)
+        # Seconds from the final transcript to the first audio of a generated answer
+        self.latency = None
+        self.stats = {"played": 0, "skipped": 0, "failed": 0, "waited_seconds": 0.0}
+
+    async def prepare(self) -> int:
+        """Synthesize the fillers before the first call needs them"""
+        results = await asyncio.gather(*(self.tts_cache.get_file(phrase) for phrase in self.phrases))
+        ready = sum(1 for path in results if path)
+        logger.info(f"🫧 Audios de relleno listos: {ready}/{len(self.phrases)}")
+        return ready
+
+    def predict(self, head_start: float = 0.0) -> Optional[float]:
+        """Expected seconds until the answer's first audio; None before any turn was measured"""
+        if self.latency is None:
+            return None
+        return max(0.0, self.latency - head_start)
+
+    def should_play(self, head_start: float = 0.0) -> bool:
+        """Whether the caller would otherwise wait long enough in silence to need a filler"""
+        if not self.phrases:
+            return False
+        predicted = self.predict(head_start)
+        # Until a turn is measured assume the worst: the first turns of a process are the slowest
+        if predicted is not None and predicted * 1000 < Config.FILLER_THRESHOLD_MS:
+            self.stats["skipped"] += 1
+            return False
+        return True
+
+    def observe(self, seconds: float) -> None:
+        """Feed the measured time to first audio of a generated answer"""
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += LATENCY_SMOOTHING * (seconds - self.latency)
+
+    async def next_file(self) -> Optional[str]:
+        """Audio file of the next filler; a cache hit unless it was evicted"""
+        path = await self.tts_cache.get_file(next(self._next_phrase))
+        if path:
+            self.stats["played"] += 1
+        else:
+            self.stats["failed"] += 1
+        return path
+
+    def record_wait(self, seconds: float) -> None:
+        """Time the answer's audio was ready but waited for the filler to finish"""
+        self.stats["waited_seconds"] += seconds
+
+    def get_status(self) -> dict:
+        return {
+            **self.stats,
+            "waited_seconds": round(self.stats["waited_seconds"], 2),
+            "predicted_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "threshold_ms": Config.FILLER_THRESHOLD_MS
+        }
@@ -0,0 +1,167 @@
+"""
+Provider health monitoring and circuit breakers
+"""
+
+import asyncio
+import logging
+import time
+from typing import Optional
+from src.services.http_client import http_client
+from src.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+class CircuitBreaker:
+    """Opens after repeated failures so callers fail fast until the provider recovers"""
+
+    def __init__(self, name: str, failure_threshold: Optional[int] = None, reset_timeout: Optional[float] = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or Config.BREAKER_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout or Config.BREAKER_RESET_TIMEOUT
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_started_at = None
+
+    def allow_request(self) -> bool:
+        """Check whether a request may go through"""
+        now = time.monotonic()
+        if self.state == "open" and now - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+        if self.state == "half_open":
+            # Only one trial request at a time; a lost trial is retried after reset_timeout
+            if self.trial_started_at is not None and now - self.trial_started_at < self.reset_timeout:
+                return False
+            self.trial_started_at = now
+            return True
+        return self.state == "closed"
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info(f"✅ Circuito {self.name} cerrado")
+        self.state = "closed"
+        self.failures = 0
+        self.trial_started_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.trial_started_at = None
+        if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            logger.warning(f"⚠️ Circuito {self.name} abierto tras {self.failures} fallos")
+
+    def get_status(self) -> dict:
+        return {"state": self.state, "failures": self.failures}
+
+class HealthMonitor:
+    """Probes Ollama, Deepgram and ElevenLabs in the background and caches the results"""
+
+    def __init__(self):
+        self.probes = {
+            "ollama": self._probe_ollama,
+            "deepgram": self._probe_deepgram,
+            "elevenlabs": self._probe_elevenlabs
+        }
+        self.results = {name: {"available": None, "latency_ms": None, "checked_at": None, "error": None}
+                        for name in self.probes}
+        self.breakers = {name: CircuitBreaker(name) for name in self.probes}
+        self._task = None
+
+    async def _probe_ollama(self) -> bool:
+        async with http_client.session.get(f"{Config.OLLAMA_HOST}/api/tags",
+                                           timeout=http_client.timeout("probe")) as response:
+            return response.status == 200
+
+    async def _probe_deepgram(self) -> bool:
+        if not Config.DEEPGRAM_API_KEY:
+            return False
+        async with http_client.session.get(f"{Config.DEEPGRAM_BASE_URL}/projects",
+                                           headers={"Authorization": f"Token {Config.DEEPGRAM_API_KEY}"},
+                                           timeout=http_client.timeout("probe")) as response:
+            return response.status == 200
+
+    async def _probe_elevenlabs(self) -> bool:
+        if not Config.ELEVENLABS_API_KEY:
+            return False
+        async with http_client.session.get(f"{Config.ELEVENLABS_BASE_URL}/models",
+                                           headers={"xi-api-key": Config.ELEVENLABS_API_KEY},
+                                           timeout=http_client.timeout("probe")) as response:
+            return response.status == 200
+
+    async def probe(self, name: str) -> bool:
+        """Probe one provider and update its cached state and breaker"""
+        started = time.monotonic()
+        error = None
+        try:
+            available = await self.probes[name]()
+        except Exception as e:
+            available = False
+            error = str(e) or type(e).__name__
+
+        self.results[name] = {
+            "available": available,
+            "latency_ms": round((time.monotonic() - started) * 1000, 1),
+            "checked_at": time.time(),
+            "error": error
+        }
+        if available:
+            self.breakers[name].record_success()
+        else:
+            self.breakers[name].record_failure()
+            logger.warning(f"⚠️ {name} no disponible{f': {error}' if error else ''}")
+        return available
+
+    async def probe_all(self) -> dict:
+        await asyncio.gather(*(self.probe(name) for name in self.probes))
+        return self.get_status()
+
+    async def _probe_loop(self) -> None:
+        while True:
+            await asyncio.sleep(Config.HEALTH_PROBE_INTERVAL)
+            await self.probe_all()
+
+    async def start(self) -> None:
+        """Run a first probe and keep probing in the background"""
+        await self.probe_all()
+        if not self._task or self._task.done():
+            self._task = asyncio.create_task(self._probe_loop())
+            logger.info("🩺 Monitor de salud iniciado")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def is_available(self, name: str) -> bool:
+        """Check cached availability before a request, without any network round trip"""
+        breaker = self.breakers[name]
+        if not breaker.allow_request():
+            return False
+        if breaker.state == "half_open":
+            # This caller holds the trial request
+            return True
+        result = self.results[name]
+        if result["checked_at"] is None or time.time() - result["checked_at"] > Config.HEALTH_CACHE_TTL:
+            # Unknown or stale: let the breaker decide
+            return True
+        return bool(result["available"])
+
+    def is_healthy(self, name: str) -> bool:
+        """Report cached health without reserving a breaker trial"""
+        return self.results[name]["available"] is not False and self.breakers[name].state == "closed"
+
+    def get_status(self) -> dict:
+        """Get cached availability and last probe latency per provider"""
+        return {
+            name: {
+                "available": self.is_healthy(name),
+                "latency_ms": self.results[name]["latency_ms"],
+                "checked_at": self.results[name]["checked_at"],
+                "error": self.results[name]["error"],
+                "breaker": self.breakers[name].get_status()
+            }
+            for name in self.probes
+        }
+
+health_monitor = HealthMonitor()
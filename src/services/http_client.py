@@ -0,0 +1,97 @@
+"""
+Shared HTTP client for Ollama, Deepgram and ElevenLabs
+"""
+
+import asyncio
+import logging
+import aiohttp
+from src.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+class HTTPClient:
+    """Process-wide pooled aiohttp session with per-provider timeouts"""
+
+    def __init__(self):
+        self._session = None
+        self._loop = None
+        self.stats = {
+            "requests": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+            "dns_cache_hits": 0,
+            "dns_cache_misses": 0
+        }
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Get the shared session, creating it on first use"""
+        loop = asyncio.get_running_loop()
+        if self._session is not None and not self._session.closed and self._loop is not loop:
+            # The old session's connector can only be closed from its own loop
+            raise RuntimeError("La sesión HTTP pertenece a otro event loop; llama a http_client.close() antes")
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=Config.HTTP_POOL_LIMIT,
+                limit_per_host=Config.HTTP_POOL_LIMIT_PER_HOST,
+                ttl_dns_cache=Config.HTTP_DNS_CACHE_TTL,
+                keepalive_timeout=Config.HTTP_KEEPALIVE_TIMEOUT
+            )
+            self._session = aiohttp.ClientSession(connector=connector, trace_configs=[self._build_trace_config()])
+            self._loop = loop
+            logger.info("🌐 Sesión HTTP compartida creada")
+        return self._session
+
+    def _build_trace_config(self) -> aiohttp.TraceConfig:
+        """Count new versus reused connections and DNS cache usage"""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            self.stats["requests"] += 1
+
+        async def on_connection_create_end(session, context, params):
+            self.stats["connections_created"] += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            self.stats["connections_reused"] += 1
+
+        async def on_dns_cache_hit(session, context, params):
+            self.stats["dns_cache_hits"] += 1
+
+        async def on_dns_cache_miss(session, context, params):
+            self.stats["dns_cache_misses"] += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace_config
+
+    @staticmethod
+    def timeout(provider: str) -> aiohttp.ClientTimeout:
+        """Get the request timeout configured for a provider"""
+        total = {
+            "ollama": Config.OLLAMA_TIMEOUT,
+            "deepgram": Config.DEEPGRAM_TIMEOUT,
+            "elevenlabs": Config.ELEVENLABS_TIMEOUT,
+            "probe": Config.HEALTH_PROBE_TIMEOUT
+        }.get(provider, Config.HTTP_DEFAULT_TIMEOUT)
+        return aiohttp.ClientTimeout(total=total, sock_connect=Config.HTTP_CONNECT_TIMEOUT)
+
+    async def close(self) -> None:
+        """Close the shared session and its connection pool"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+            logger.info("🔌 Sesión HTTP compartida cerrada")
+        self._session = None
+        self._loop = None
+
+    def get_stats(self) -> dict:
+        """Get connection reuse statistics"""
+        stats = dict(self.stats)
+        total = stats["connections_created"] + stats["connections_reused"]
+        stats["reuse_ratio"] = round(stats["connections_reused"] / total, 3) if total else 0.0
+        return stats
+
+http_client = HTTPClient()
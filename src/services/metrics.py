@@ -0,0 +1,142 @@
+"""
+Latency histograms, Prometheus exposition and per-call timelines
+"""
+
+import bisect
+import contextvars
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Trace of the call the current task belongs to; tasks created during a call inherit it
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels, in the Prometheus model"""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+        series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+        series["sum"] += value
+        series["count"] += 1
+
+    def _label_text(self, labels: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{value}"' for name, value in zip(self.label_names, labels)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, series in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["counts"]):
+                cumulative += count
+                bucket = self._label_text(labels, f'le="{bound}"')
+                yield f"{self.name}_bucket{bucket} {cumulative}"
+            bucket = self._label_text(labels, 'le="+Inf"')
+            yield f"{self.name}_bucket{bucket} {series['count']}"
+            yield f"{self.name}_sum{self._label_text(labels)} {series['sum']:.6f}"
+            yield f"{self.name}_count{self._label_text(labels)} {series['count']}"
+
+class CallTrace:
+    """Timeline of one call's stages, relative to when the call started"""
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self.started_at = time.time()
+        self.started = time.monotonic()
+        self.ended_at = None
+        self.turn = 0
+        self.events = []
+
+    def add(self, stage: str, seconds: float, provider: str) -> None:
+        self.events.append({
+            "turn": self.turn,
+            "stage": stage,
+            "provider": provider,
+            "at_ms": round((time.monotonic() - self.started - seconds) * 1000, 1),
+            "duration_ms": round(seconds * 1000, 1)
+        })
+
+    def to_dict(self) -> dict:
+        return {
+            "channel": self.channel,
+            "started_at": self.started_at,
+            "ended_at": self.ended_at,
+            "turns": self.turn,
+            "events": list(self.events)
+        }
+
+class Metrics:
+    """Process-wide latency metrics shared by every call"""
+
+    def __init__(self, recent_calls: int = 20):
+        self.stage_seconds = Histogram(
+            "eve_turn_stage_seconds", "Duration of each conversation turn stage", ("stage", "provider")
+        )
+        self.ami_originate_seconds = Histogram(
+            "eve_ami_originate_seconds", "Round trip of AMI Originate actions"
+        )
+        self.dialer_queue_wait_seconds = Histogram(
+            "eve_dialer_queue_wait_seconds", "Time a number waits for a channel and a CPS slot"
+        )
+        self.active_calls = {}
+        self.recent_calls = deque(maxlen=recent_calls)
+
+    def observe(self, stage: str, seconds: float, provider: str = "local") -> None:
+        """Record a stage duration, and add it to the current call's timeline if there is one"""
+        self.stage_seconds.observe(seconds, stage, provider)
+        trace = current_trace.get()
+        if trace:
+            trace.add(stage, seconds, provider)
+
+    @contextmanager
+    def timer(self, stage: str, provider: str = "local") -> Iterator[None]:
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.monotonic() - started, provider)
+
+    def start_trace(self, channel: str) -> CallTrace:
+        """Start a timeline for the call running in the current task"""
+        trace = CallTrace(channel)
+        self.active_calls[id(trace)] = trace
+        current_trace.set(trace)
+        return trace
+
+    def finish_trace(self, trace: CallTrace) -> None:
+        trace.ended_at = time.time()
+        self.active_calls.pop(id(trace), None)
+        self.recent_calls.append(trace)
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        for histogram in (self.stage_seconds, self.ami_originate_seconds, self.dialer_queue_wait_seconds):
+            lines.extend(histogram.render())
+        return "\n".join(lines) + "\n"
+
+    def get_status(self) -> Dict[str, list]:
+        """Per-call timelines for /status"""
+        return {
+            "active": [trace.to_dict() for trace in self.active_calls.values()],
+            "recent": [trace.to_dict() for trace in self.recent_calls]
+        }
+
+metrics = Metrics()
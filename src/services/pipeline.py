@@ -0,0 +1,127 @@
+"""
+Streaming LLM-to-TTS response pipeline
+"""
+
+import asyncio
+import contextlib
+import logging
+import re
+import time
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+from src.services.ai_service import AIService
+from src.services.tts_cache import TTSCache
+from src.services.conversation import ConversationSession
+from src.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_END = re.compile(r'[.!?…]+["»)\]]*\s')
+CLAUSE_END = re.compile(r'[,;:]\s')
+
+class SentenceChunker:
+    """Cuts a token stream at sentence or clause boundaries"""
+
+    def __init__(self, min_clause_chars: Optional[int] = None, max_chars: Optional[int] = None):
+        self.min_clause_chars = min_clause_chars or Config.PIPELINE_MIN_CLAUSE_CHARS
+        self.max_chars = max_chars or Config.PIPELINE_MAX_CHUNK_CHARS
+        self.buffer = ""
+
+    def feed(self, token: str) -> List[str]:
+        """Add a token and return every chunk that is now complete"""
+        self.buffer += token
+        chunks = []
+        while True:
+            cut = self._find_cut()
+            if cut is None:
+                break
+            chunk, self.buffer = self.buffer[:cut].strip(), self.buffer[cut:].lstrip()
+            if chunk:
+                chunks.append(chunk)
+        return chunks
+
+    def flush(self) -> Optional[str]:
+        """Return whatever text is left once the stream ends"""
+        chunk, self.buffer = self.buffer.strip(), ""
+        return chunk or None
+
+    def _find_cut(self) -> Optional[int]:
+        match = SENTENCE_END.search(self.buffer)
+        if match:
+            return match.end()
+
+        # Clauses only once there is enough text to sound natural on its own
+        for match in CLAUSE_END.finditer(self.buffer):
+            if match.end() >= self.min_clause_chars:
+                return match.end()
+
+        if len(self.buffer) >= self.max_chars:
+            space = self.buffer.rfind(" ", 0, self.max_chars)
+            return space + 1 if space > 0 else self.max_chars
+        return None
+
+class ResponsePipeline:
+    """Streams Ollama tokens into per-sentence TTS and plays the audio in order"""
+
+    def __init__(self, ai_service: AIService, tts_cache: TTSCache):
+        self.ai_service = ai_service
+        self.tts_cache = tts_cache
+        # Chunks of the last response, in the order they were synthesized and played
+        self.last_chunks = []
+
+    async def run(self, text: str, play: Callable[[str], Awaitable[None]],
+                  session: Optional[ConversationSession] = None,
+                  tokens: Optional[AsyncIterator[str]] = None) -> Optional[str]:
+        """Generate, synthesize and play a response; return the full response text
+
+        tokens: an already running generation (speculative) to use instead of asking Ollama
+        """
+        started = time.monotonic()
+        queue = asyncio.Queue(maxsize=Config.PIPELINE_MAX_PENDING)
+        chunker = SentenceChunker()
+        parts = self.last_chunks = []
+
+        async def produce():
+            try:
+                # Closed right away when the turn is cut short, so Ollama stops generating
+                stream = tokens or self.ai_service.stream_response(text, session)
+                async with contextlib.aclosing(stream):
+                    async for token in stream:
+                        for chunk in chunker.feed(token):
+                            parts.append(chunk)
+                            # Synthesis starts at once; the queue keeps playback order
+                            await queue.put(asyncio.create_task(self.tts_cache.get_playable(chunk)))
+                tail = chunker.flush()
+                if tail:
+                    parts.append(tail)
+                    await queue.put(asyncio.create_task(self.tts_cache.get_playable(tail)))
+            except Exception as e:
+                logger.error(f"❌ Error en pipeline de respuesta: {e}")
+            await queue.put(None)
+
+        producer = asyncio.create_task(produce())
+        first_audio = True
+        try:
+            while True:
+                task = await queue.get()
+                if task is None:
+                    break
+                audio_path = await task
+                if not audio_path:
+                    logger.error("❌ No se pudo generar audio para un fragmento")
+                    continue
+                if first_audio:
+                    logger.info(f"⏱️ Primer audio listo en {time.monotonic() - started:.2f}s")
+                    first_audio = False
+                await play(audio_path)
+            await producer
+        finally:
+            producer.cancel()
+            while not queue.empty():
+                task = queue.get_nowait()
+                if task is not None:
+                    task.cancel()
+
+        response_text = " ".join(parts)
+        if response_text:
+            logger.info(f"🤖 Respuesta AI: {response_text}")
+        return response_text or None
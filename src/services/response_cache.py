@@ -0,0 +1,169 @@
+"""
+Cache of AI responses keyed on normalized caller transcripts
+"""
+
+import logging
+import re
+import time
+import unicodedata
+import numpy as np
+from collections import OrderedDict
+from typing import List, Optional
+from src.services.ai_service import AIService, FALLBACK_RESPONSES
+from src.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+FILLER_WORDS = {"eh", "ehh", "em", "emm", "mm", "mmm", "pues", "bueno", "oiga", "oye", "ah", "ay", "a ver"}
+PUNCTUATION = re.compile(r"[^\w\s]")
+
+def normalize_transcript(text: str) -> str:
+    """Lowercase, drop accents, punctuation and filler words"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = " ".join(PUNCTUATION.sub(" ", text).split())
+    for filler in sorted(FILLER_WORDS, key=len, reverse=True):
+        text = re.sub(rf"\b{filler}\b", " ", text)
+    return " ".join(text.split())
+
+class ResponseCache:
+    """Exact and embedding-similarity lookup of earlier answers, with TTL and LRU eviction"""
+
+    def __init__(self, ai_service: AIService, max_entries: Optional[int] = None, ttl: Optional[float] = None,
+                 embed_model: Optional[str] = None, similarity: Optional[float] = None):
+        self.ai_service = ai_service
+        self.enabled = Config.RESPONSE_CACHE_ENABLED
+        self.max_entries = max_entries or Config.RESPONSE_CACHE_MAX_ENTRIES
+        self.ttl = ttl or Config.RESPONSE_CACHE_TTL
+        self.embed_model = embed_model if embed_model is not None else Config.RESPONSE_CACHE_EMBED_MODEL
+        self.similarity = similarity or Config.RESPONSE_CACHE_SIMILARITY
+        self.entries = OrderedDict()
+        # Unit-length embeddings, one row per entry that has one; row_keys maps rows back to entries
+        self.vectors = None
+        self.row_keys = []
+        self.pending_vectors = OrderedDict()
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    async def get(self, text: str) -> Optional[List[str]]:
+        """Return the cached answer as its spoken chunks, or None"""
+        key = normalize_transcript(text)
+        if not self.enabled or not key:
+            return None
+
+        entry = self._fresh_entry(key)
+        if entry:
+            self.stats["exact_hits"] += 1
+            return self._hit(key, entry)
+
+        if self.embed_model:
+            vector = await self._embed(text)
+            if vector is not None:
+                self._keep_pending_vector(key, vector)
+                match = self._nearest(vector)
+                if match:
+                    self.stats["semantic_hits"] += 1
+                    return self._hit(match, self.entries[match])
+
+        self.stats["misses"] += 1
+        return None
+
+    def _hit(self, key: str, entry: dict) -> List[str]:
+        entry["hits"] += 1
+        self.entries.move_to_end(key)
+        logger.info(f"♻️ Respuesta en caché para: {key}")
+        return entry["chunks"]
+
+    def _fresh_entry(self, key: str) -> Optional[dict]:
+        entry = self.entries.get(key)
+        if entry and time.monotonic() - entry["created_at"] > self.ttl:
+            self.stats["expired"] += 1
+            self._remove(key)
+            return None
+        return entry
+
+    def _nearest(self, vector: np.ndarray) -> Optional[str]:
+        """Most similar cached transcript above the similarity threshold"""
+        if not self.row_keys:
+            return None
+        scores = self.vectors[:len(self.row_keys)] @ vector
+        row = int(np.argmax(scores))
+        if scores[row] < self.similarity:
+            return None
+        key = self.row_keys[row]
+        return key if self._fresh_entry(key) else None
+
+    async def _embed(self, text: str) -> Optional[np.ndarray]:
+        embedding = await self.ai_service.embed(text, self.embed_model)
+        if not embedding:
+            return None
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _keep_pending_vector(self, key: str, vector: np.ndarray) -> None:
+        """Hold a miss's embedding so put() does not have to compute it again"""
+        self.pending_vectors[key] = vector
+        while len(self.pending_vectors) > 256:
+            self.pending_vectors.popitem(last=False)
+
+    async def put(self, text: str, chunks: List[str]) -> None:
+        """Store an answer, as the chunks it was synthesized in, for a transcript"""
+        key = normalize_transcript(text)
+        response = " ".join(chunks)
+        if not self.enabled or not key or not response or response in FALLBACK_RESPONSES:
+            return
+        if key in self.entries:
+            self._remove(key)
+
+        vector = None
+        if self.embed_model:
+            vector = self.pending_vectors.pop(key, None)
+            if vector is None:
+                vector = await self._embed(text)
+
+        self.entries[key] = {"chunks": list(chunks), "created_at": time.monotonic(), "hits": 0, "row": None}
+        if vector is not None:
+            self._add_vector(key, vector)
+        while len(self.entries) > self.max_entries:
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+            self.stats["evictions"] += 1
+
+    def _add_vector(self, key: str, vector: np.ndarray) -> None:
+        if self.vectors is None or self.vectors.shape[1] != len(vector):
+            # First vector, or the embedding model changed: start a fresh matrix
+            for old_key in self.row_keys:
+                self.entries[old_key]["row"] = None
+            self.vectors = np.zeros((self.max_entries + 1, len(vector)), dtype=np.float32)
+            self.row_keys = []
+        row = len(self.row_keys)
+        self.vectors[row] = vector
+        self.row_keys.append(key)
+        self.entries[key]["row"] = row
+
+    def _remove(self, key: str) -> None:
+        entry = self.entries.pop(key)
+        row = entry["row"]
+        if row is None:
+            return
+        # Move the last row into the freed slot so the matrix stays dense
+        last = len(self.row_keys) - 1
+        if row != last:
+            moved = self.row_keys[last]
+            self.vectors[row] = self.vectors[last]
+            self.row_keys[row] = moved
+            self.entries[moved]["row"] = row
+        self.row_keys.pop()
+
+    def get_stats(self) -> dict:
+        """Get hit rates and sizes"""
+        hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "entries": len(self.entries),
+            "vectors": len(self.row_keys),
+            "enabled": self.enabled,
+            "embeddings": bool(self.embed_model)
+        }
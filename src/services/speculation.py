@@ -0,0 +1,193 @@
+"""
+Speculative LLM generation: start the answer from a stable interim transcript
+"""
+
+import asyncio
+import difflib
+import logging
+import time
+from typing import AsyncIterator, List, Optional
+from src.services.ai_service import AIService
+from src.services.conversation import ConversationSession
+from src.services.response_cache import normalize_transcript
+from src.services.metrics import metrics
+from src.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+def transcript_similarity(a: str, b: str) -> float:
+    """Word-level similarity (0-1) of two transcripts, ignoring case, accents, punctuation and fillers"""
+    words_a, words_b = normalize_transcript(a).split(), normalize_transcript(b).split()
+    if not words_a and not words_b:
+        return 1.0
+    return difflib.SequenceMatcher(None, words_a, words_b, autojunk=False).ratio()
+
+class SpeculationStats:
+    """Process-wide speculation counts: hit rate and the generation time saved"""
+
+    def __init__(self):
+        self.stats = {"started": 0, "hits": 0, "misses": 0, "wasted": 0, "capped": 0, "saved_seconds": 0.0}
+
+    def get_stats(self) -> dict:
+        decided = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "saved_seconds": round(self.stats["saved_seconds"], 3),
+            "hit_rate": round(self.stats["hits"] / decided, 3) if decided else 0.0,
+            "mean_saved_ms": round(self.stats["saved_seconds"] / self.stats["hits"] * 1000, 1)
+            if self.stats["hits"] else None
+        }
+
+speculation_stats = SpeculationStats()
+
+class SpeculativeGeneration:
+    """An Ollama generation for a transcript that may still change, buffering its tokens"""
+
+    def __init__(self, ai_service: AIService, text: str, session: ConversationSession):
+        self.text = text
+        self.session = session
+        self.tokens: List[str] = []
+        self.started = time.monotonic()
+        self.finished = None
+        self._more = asyncio.Event()
+        self.task = asyncio.create_task(self._run(ai_service))
+
+    async def _run(self, ai_service: AIService) -> None:
+        try:
+            # The turn is recorded only if the speculation is used, with the final transcript
+            async for token in ai_service.stream_response(self.text, self.session, record=False):
+                self.tokens.append(token)
+                self._more.set()
+        finally:
+            self.finished = time.monotonic()
+            self._more.set()
+
+    @property
+    def head_start(self) -> float:
+        """Generation time already done when the final transcript arrives"""
+        return (self.finished or time.monotonic()) - self.started
+
+    def cancel(self) -> None:
+        self.task.cancel()
+
+    async def stream(self, final_text: str) -> AsyncIterator[str]:
+        """Tokens generated so far, then the rest as they arrive
+
+        The turn goes into the conversation with the final transcript and what was generated.
+        """
+        index = 0
+        try:
+            while True:
+                while index < len(self.tokens):
+                    yield self.tokens[index]
+                    index += 1
+                if self.task.done():
+                    break
+                self._more.clear()
+                await self._more.wait()
+        finally:
+            # Stopped early (e.g. the caller interrupted): Ollama need not finish
+            self.cancel()
+            response_text = "".join(self.tokens[:index]).strip()
+            if response_text:
+                self.session.record_turn(final_text, response_text)
+
+    async def result(self, final_text: str) -> Optional[str]:
+        """The whole response, for the non-streaming path"""
+        tokens = [token async for token in self.stream(final_text)]
+        return "".join(tokens).strip() or None
+
+class Speculator:
+    """Starts the answer to one call's current turn from its interim transcripts
+
+    A transcript that stays unchanged for SPECULATIVE_STABLE_MS, or a segment Deepgram marks
+    final, starts a generation. When the final transcript is SPECULATIVE_SIMILARITY alike the
+    generation is used as the answer; otherwise it is dropped. Each call may drop at most
+    SPECULATIVE_MAX_WASTED generations, so speculation cannot take Ollama from other calls.
+    """
+
+    def __init__(self, ai_service: AIService, session: ConversationSession):
+        self.ai_service = ai_service
+        self.session = session
+        self.wasted = 0
+        self.generation: Optional[SpeculativeGeneration] = None
+        self._finals: List[str] = []
+        self._interim = ""
+        self._timer = None
+
+    @property
+    def text(self) -> str:
+        return " ".join(self._finals + ([self._interim] if self._interim else [])).strip()
+
+    def start_turn(self) -> None:
+        self.discard()
+        self._finals = []
+        self._interim = ""
+
+    def on_transcript(self, text: str, is_final: bool, speech_final: bool) -> None:
+        """Feed a Deepgram result (the same arguments as STTService.transcribe_stream's callback)"""
+        if is_final:
+            if text:
+                self._finals.append(text)
+            self._interim = ""
+            # Deepgram will not revise a final segment, so there is nothing to wait for
+            self._speculate()
+            return
+        if text == self._interim:
+            return
+        self._interim = text
+        if self._timer:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(Config.SPECULATIVE_STABLE_MS / 1000, self._speculate)
+
+    def _speculate(self) -> None:
+        self._timer = None
+        text = self.text
+        if not text:
+            return
+        generation = self.generation
+        if generation and transcript_similarity(generation.text, text) >= Config.SPECULATIVE_SIMILARITY:
+            return
+        if generation:
+            self._waste()
+        if self.wasted >= Config.SPECULATIVE_MAX_WASTED:
+            speculation_stats.stats["capped"] += 1
+            return
+        self.generation = SpeculativeGeneration(self.ai_service, text, self.session)
+        speculation_stats.stats["started"] += 1
+        logger.debug(f"🔮 Generación especulativa para: {text}")
+
+    def _waste(self) -> None:
+        self.generation.cancel()
+        self.generation = None
+        self.wasted += 1
+        speculation_stats.stats["wasted"] += 1
+
+    def take(self, final_text: str) -> Optional[SpeculativeGeneration]:
+        """The speculative generation if it answers the final transcript, else None"""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        generation = self.generation
+        if generation is None:
+            return None
+        self.generation = None
+        if transcript_similarity(generation.text, final_text) < Config.SPECULATIVE_SIMILARITY:
+            self.generation = generation
+            self._waste()
+            speculation_stats.stats["misses"] += 1
+            logger.info("🔮 Especulación descartada, la transcripción final cambió")
+            return None
+        speculation_stats.stats["hits"] += 1
+        speculation_stats.stats["saved_seconds"] += generation.head_start
+        metrics.observe("speculation_saved", generation.head_start, "ollama")
+        logger.info(f"🔮 Especulación aprovechada ({generation.head_start * 1000:.0f} ms de ventaja)")
+        return generation
+
+    def discard(self) -> None:
+        """Drop the turn's generation without using it (no transcript, cached answer, hangup)"""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if self.generation:
+            self._waste()
@@ -3,9 +3,13 @@ Speech-to-Text service using Deepgram
 """
 
 import asyncio
+import json
 import logging
-import aiohttp
-from typing import Optional
+import websockets
+from typing import AsyncIterator, Callable, Optional
+from urllib.parse import urlencode
+from src.services.http_client import http_client
+from src.services.health_monitor import health_monitor
 from src.core.config import Config
 
 logger = logging.getLogger(__name__)
@@ -15,7 +19,9 @@ class STTService:
     
     def __init__(self):
         self.api_key = Config.DEEPGRAM_API_KEY
-        self.base_url = "https://api.deepgram.com/v1/listen"
+        self.base_url = f"{Config.DEEPGRAM_BASE_URL}/listen"
+        self.ws_url = Config.DEEPGRAM_WS_URL
+        self.breaker = health_monitor.breakers["deepgram"]
         
     async def transcribe_audio(self, audio_data: bytes) -> Optional[str]:
         """Transcribe audio to text using Deepgram"""
@@ -24,35 +30,41 @@ class STTService:
                 logger.error("❌ Deepgram API key no configurada")
                 return None
             
+            if not health_monitor.is_available("deepgram"):
+                logger.warning("⚠️ Deepgram no disponible, omitiendo transcripción")
+                return None
+            
             headers = {
                 "Authorization": f"Token {self.api_key}",
                 "Content-Type": "audio/wav"
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.base_url,
-                    headers=headers,
-                    data=audio_data,
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as response:
+            async with http_client.session.post(
+                self.base_url,
+                headers=headers,
+                data=audio_data,
+                timeout=http_client.timeout("deepgram")
+            ) as response:
+                
+                if response.status == 200:
+                    self.breaker.record_success()
+                    result = await response.json()
+                    transcript = result.get("results", {}).get("channels", [{}])[0].get("alternatives", [{}])[0].get("transcript", "")
                     
-                    if response.status == 200:
-                        result = await response.json()
-                        transcript = result.get("results", {}).get("channels", [{}])[0].get("alternatives", [{}])[0].get("transcript", "")
-                        
-                        if transcript:
-                            logger.info(f"🎤 Transcripción: {transcript}")
-                            return transcript
-                        else:
-                            logger.warning("⚠️ No se detectó texto en el audio")
-                            return None
+                    if transcript:
+                        logger.info(f"🎤 Transcripción: {transcript}")
+                        return transcript
                     else:
-                        error_text = await response.text()
-                        logger.error(f"❌ Error en Deepgram API: {response.status} - {error_text}")
+                        logger.warning("⚠️ No se detectó texto en el audio")
                         return None
-                        
+                else:
+                    self.breaker.record_failure()
+                    error_text = await response.text()
+                    logger.error(f"❌ Error en Deepgram API: {response.status} - {error_text}")
+                    return None
+                    
         except Exception as e:
+            self.breaker.record_failure()
             logger.error(f"❌ Error en transcripción: {e}")
             return None
     
@@ -64,4 +76,87 @@ class STTService:
             return await self.transcribe_audio(audio_data)
         except Exception as e:
             logger.error(f"❌ Error leyendo archivo de audio: {e}")
-            return None 
\ No newline at end of file
+            return None
+    
+    def _stream_url(self, sample_rate: int) -> str:
+        """Live transcription URL for raw 16-bit mono audio"""
+        params = {
+            "encoding": "linear16",
+            "sample_rate": sample_rate,
+            "channels": 1,
+            "interim_results": "true",
+            "endpointing": Config.DEEPGRAM_ENDPOINTING_MS
+        }
+        return f"{self.ws_url}?{urlencode(params)}"
+    
+    async def transcribe_stream(self, audio_chunks: AsyncIterator[bytes], sample_rate: int = 8000,
+                                on_transcript: Optional[Callable[[str, bool, bool], None]] = None) -> Optional[str]:
+        """Transcribe audio while it is still being captured using Deepgram's websocket API
+        
+        on_transcript(text, is_final, speech_final) is called for every interim and final result.
+        """
+        if not self.api_key:
+            logger.error("❌ Deepgram API key no configurada")
+            return None
+        
+        if not health_monitor.is_available("deepgram"):
+            logger.warning("⚠️ Deepgram no disponible, omitiendo transcripción")
+            return None
+        
+        # Nothing is sent, and nothing billed, until there is audio
+        try:
+            first_chunk = await audio_chunks.__anext__()
+        except StopAsyncIteration:
+            logger.info("🔇 Sin audio que transcribir")
+            return None
+        
+        finals = []
+        
+        async def send(ws):
+            await ws.send(first_chunk)
+            async for chunk in audio_chunks:
+                await ws.send(chunk)
+            # Ask Deepgram to flush the remaining results and close the stream
+            await ws.send(json.dumps({"type": "CloseStream"}))
+        
+        async def receive(ws):
+            async for message in ws:
+                result = json.loads(message)
+                if result.get("type") != "Results":
+                    continue
+                text = result.get("channel", {}).get("alternatives", [{}])[0].get("transcript", "")
+                is_final = bool(result.get("is_final"))
+                speech_final = bool(result.get("speech_final"))
+                if is_final and text:
+                    finals.append(text)
+                if on_transcript and (text or speech_final):
+                    on_transcript(text, is_final, speech_final)
+        
+        try:
+            # Deepgram accepts the API key as a websocket subprotocol
+            async with websockets.connect(
+                self._stream_url(sample_rate),
+                subprotocols=["token", self.api_key],
+                open_timeout=Config.HTTP_CONNECT_TIMEOUT
+            ) as ws:
+                receiver = asyncio.create_task(receive(ws))
+                try:
+                    await send(ws)
+                    await asyncio.wait_for(receiver, timeout=Config.DEEPGRAM_TIMEOUT)
+                finally:
+                    receiver.cancel()
+            
+            self.breaker.record_success()
+            transcript = " ".join(finals).strip()
+            if transcript:
+                logger.info(f"🎤 Transcripción: {transcript}")
+                return transcript
+            logger.warning("⚠️ No se detectó texto en el audio")
+            return None
+            
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.breaker.record_failure()
+            logger.error(f"❌ Error en transcripción streaming: {e}")
+            return None
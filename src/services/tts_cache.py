@@ -0,0 +1,275 @@
+"""
+Content-addressed TTS audio cache
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional
+from src.services.tts_service import TTSService
+from src.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+# A finished synthesis keeps its partial file this long, for a playback that just picked up its path
+PARTIAL_LINGER_SECONDS = 30
+
+def normalize_tts_text(text: str) -> str:
+    """Normalize text for cache keys without changing how it is spoken"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _remove_file(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+class TTSCache:
+    """Two-tier (memory LRU + disk) cache in front of TTSService with single-flight synthesis
+
+    A miss is streamed from ElevenLabs into a partial file, which get_playable() hands out as
+    soon as its first audio lands, so playback starts while the rest is still synthesized.
+    The cache file itself only appears once the synthesis is complete.
+    """
+
+    def __init__(self, tts_service: TTSService, cache_dir: Optional[str] = None,
+                 memory_bytes: Optional[int] = None, disk_bytes: Optional[int] = None):
+        self.tts_service = tts_service
+        self.cache_dir = cache_dir or Config.TTS_CACHE_DIR
+        self.memory_limit = memory_bytes or Config.TTS_CACHE_MEMORY_BYTES
+        self.disk_limit = disk_bytes or Config.TTS_CACHE_DISK_BYTES
+        self.memory = OrderedDict()
+        self.memory_size = 0
+        self.disk_index = OrderedDict()
+        self.disk_size = 0
+        # Key -> (synthesis task, event set once its first audio is on disk)
+        self.inflight = {}
+        # Callers waiting on each in-flight synthesis
+        self.waiters = {}
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "shared": 0, "evictions": 0}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Per process, since worker processes share the cache directory
+        self.partial_dir = os.path.join(self.cache_dir, f"partial-{os.getpid()}")
+        self._clear_partial_dirs()
+        os.makedirs(self.partial_dir, exist_ok=True)
+        self._load_disk_index()
+
+    def _clear_partial_dirs(self) -> None:
+        """Delete partial files left by this process's predecessors or by dead processes"""
+        for name in os.listdir(self.cache_dir):
+            if not name.startswith("partial-"):
+                continue
+            pid = name[len("partial-"):]
+            if pid.isdigit() and int(pid) != os.getpid() and _process_alive(int(pid)):
+                continue
+            shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+
+    def _load_disk_index(self) -> None:
+        """Index existing cache files, least recently used first"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if os.path.isfile(path) and not name.endswith(".tmp"):
+                stat = os.stat(path)
+                entries.append((stat.st_atime, os.path.splitext(name)[0], stat.st_size))
+        for _, key, size in sorted(entries):
+            self.disk_index[key] = size
+            self.disk_size += size
+
+    def key(self, text: str) -> str:
+        """Cache key covering every parameter that changes the audio"""
+        material = json.dumps({
+            "voice_id": self.tts_service.voice_id,
+            "model_id": self.tts_service.model_id,
+            "voice_settings": self.tts_service.voice_settings,
+            "output_format": self.tts_service.output_format,
+            "channel_codec": self.tts_service.channel_codec,
+            "text": normalize_tts_text(text)
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.{self.tts_service.file_extension}")
+
+    def partial_path_for(self, key: str) -> str:
+        return os.path.join(self.partial_dir, f"{key}.{self.tts_service.file_extension}")
+
+    async def get_file(self, text: str) -> Optional[str]:
+        """Get an Asterisk-ready audio file for the text, synthesizing it once if needed"""
+        key = self.key(text)
+        if key in self.disk_index:
+            self._touch(key)
+            return self.path_for(key)
+        if await self._synthesize_once(key, text) is None:
+            return None
+        return self.path_for(key)
+
+    async def get_playable(self, text: str) -> Optional[str]:
+        """Get an audio file for the text that can be played as soon as its first audio is written
+
+        While the synthesis is running this is the partial file, which keeps growing; Asterisk
+        reads raw audio files as it plays them, so playback follows the synthesis.
+        """
+        if not Config.TTS_STREAM_PLAYBACK:
+            return await self.get_file(text)
+        key = self.key(text)
+        if key in self.disk_index:
+            self._touch(key)
+            return self.path_for(key)
+        if await self._synthesize_once(key, text, early=True) is None:
+            return None
+        return self.path_for(key) if key in self.disk_index else self.partial_path_for(key)
+
+    async def get_audio(self, text: str) -> Optional[bytes]:
+        """Get audio bytes for the text from memory, disk or a new synthesis"""
+        key = self.key(text)
+        if key in self.memory:
+            self.stats["memory_hits"] += 1
+            self.memory.move_to_end(key)
+            return self.memory[key]
+        if key in self.disk_index:
+            try:
+                audio_data = await asyncio.to_thread(self._read_file, self.path_for(key))
+                self.stats["disk_hits"] += 1
+                self.disk_index.move_to_end(key)
+                self._remember(key, audio_data)
+                return audio_data
+            except OSError:
+                self._forget_disk(key)
+        return await self._synthesize_once(key, text)
+
+    def _touch(self, key: str) -> None:
+        if key in self.memory:
+            self.stats["memory_hits"] += 1
+            self.memory.move_to_end(key)
+        else:
+            self.stats["disk_hits"] += 1
+        self.disk_index.move_to_end(key)
+
+    async def _synthesize_once(self, key: str, text: str, early: bool = False):
+        """Share one synthesis between concurrent requests for the same key
+
+        early: return True once the first audio is written instead of waiting for all of it.
+        """
+        if key in self.inflight:
+            task, ready = self.inflight[key]
+            self.stats["shared"] += 1
+        else:
+            self.stats["misses"] += 1
+            ready = asyncio.Event()
+            task = asyncio.create_task(self._synthesize(key, text, ready))
+            self.inflight[key] = (task, ready)
+            task.add_done_callback(lambda done: self.inflight.pop(key)
+                                   if self.inflight.get(key, (None,))[0] is done else None)
+        self.waiters[key] = self.waiters.get(key, 0) + 1
+        try:
+            if not early:
+                return await asyncio.shield(task)
+            ready_wait = asyncio.ensure_future(ready.wait())
+            try:
+                await asyncio.wait({task, ready_wait}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                ready_wait.cancel()
+            # The stream may still fail after its first audio; the playback then ends early
+            return task.result() if task.done() else True
+        except asyncio.CancelledError:
+            # The last caller waiting gave up (e.g. interrupted the answer): stop paying for the synthesis
+            if self.waiters[key] == 1 and not task.done():
+                task.cancel()
+            raise
+        finally:
+            self.waiters[key] -= 1
+            if not self.waiters[key]:
+                del self.waiters[key]
+
+    async def _synthesize(self, key: str, text: str, ready: asyncio.Event) -> Optional[bytes]:
+        partial_path = self.partial_path_for(key)
+        if not await self.tts_service.write_speech_stream(text, partial_path, ready):
+            return None
+        audio_data = await asyncio.to_thread(self._read_file, partial_path)
+        await asyncio.to_thread(self._write_file, self.path_for(key), audio_data)
+        # A playback may have just been handed the partial path and not opened it yet
+        asyncio.get_running_loop().call_later(PARTIAL_LINGER_SECONDS, _remove_file, partial_path)
+        self.disk_index[key] = len(audio_data)
+        self.disk_size += len(audio_data)
+        self._remember(key, audio_data)
+        self._evict_disk()
+        return audio_data
+
+    @staticmethod
+    def _read_file(path: str) -> bytes:
+        with open(path, 'rb') as f:
+            return f.read()
+
+    @staticmethod
+    def _write_file(path: str, audio_data: bytes) -> None:
+        # Write then rename so Asterisk never plays a partial file
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(audio_data)
+        os.replace(temp_path, path)
+
+    def _remember(self, key: str, audio_data: bytes) -> None:
+        """Keep audio in the memory tier, evicting least recently used entries"""
+        if len(audio_data) > self.memory_limit:
+            return
+        if key in self.memory:
+            self.memory_size -= len(self.memory.pop(key))
+        self.memory[key] = audio_data
+        self.memory_size += len(audio_data)
+        while self.memory_size > self.memory_limit:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_size -= len(evicted)
+
+    def _forget_disk(self, key: str) -> None:
+        self.disk_size -= self.disk_index.pop(key, 0)
+
+    def _evict_disk(self) -> None:
+        """Delete least recently used files once the disk tier is over its size limit"""
+        while self.disk_size > self.disk_limit and len(self.disk_index) > 1:
+            key = next(iter(self.disk_index))
+            self._forget_disk(key)
+            if key in self.memory:
+                self.memory_size -= len(self.memory.pop(key))
+            self.stats["evictions"] += 1
+            try:
+                os.unlink(self.path_for(key))
+            except OSError:
+                pass
+
+    async def prewarm(self, phrases: Optional[List[str]] = None) -> int:
+        """Synthesize the configured phrases ahead of the first call"""
+        phrases = phrases if phrases is not None else Config.TTS_PREWARM_PHRASES
+        started = time.monotonic()
+        results = await asyncio.gather(*(self.get_file(phrase) for phrase in phrases))
+        ready = sum(1 for path in results if path)
+        logger.info(f"🔥 Caché TTS precalentada: {ready}/{len(phrases)} frases en {time.monotonic() - started:.2f}s")
+        return ready
+
+    def get_stats(self) -> dict:
+        """Get cache hit rates and sizes"""
+        lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"] + self.stats["shared"]
+        hits = lookups - self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory_size,
+            "disk_entries": len(self.disk_index),
+            "disk_bytes": self.disk_size
+        }
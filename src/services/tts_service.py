@@ -4,78 +4,202 @@ Text-to-Speech service using ElevenLabs
 
 import asyncio
 import logging
-import aiohttp
 import tempfile
+import time
 import os
-from typing import Optional
+from typing import AsyncIterator, Optional
+from src.services.http_client import http_client
+from src.services.health_monitor import health_monitor
+from src.services.metrics import metrics
+from src.utils.codec import ChannelConverter, convert_audio
 from src.core.config import Config
 
 logger = logging.getLogger(__name__)
 
+# MIME type of each ElevenLabs output_format encoding
+OUTPUT_MEDIA_TYPES = {"pcm": "audio/L16", "ulaw": "audio/basic", "alaw": "audio/x-alaw-basic"}
+
 class TTSService:
     """Text-to-Speech service using ElevenLabs"""
     
     def __init__(self):
         self.api_key = Config.ELEVENLABS_API_KEY
         self.voice_id = Config.ELEVENLABS_VOICE_ID
-        self.base_url = "https://api.elevenlabs.io/v1"
+        self.base_url = Config.ELEVENLABS_BASE_URL
+        self.model_id = "eleven_monolingual_v1"
+        self.voice_settings = {
+            "stability": 0.5,
+            "similarity_boost": 0.5
+        }
+        self.output_format = Config.TTS_OUTPUT_FORMAT
+        self.channel_codec = Config.CHANNEL_CODEC
+        self.breaker = health_monitor.breakers["elevenlabs"]
+        
+    def _can_synthesize(self) -> bool:
+        """Check credentials and provider health before a request"""
+        if not self.api_key:
+            logger.error("❌ ElevenLabs API key no configurada")
+            return False
+            
+        if not self.voice_id:
+            logger.error("❌ ElevenLabs Voice ID no configurado")
+            return False
         
+        if not health_monitor.is_available("elevenlabs"):
+            logger.warning("⚠️ ElevenLabs no disponible, omitiendo síntesis")
+            return False
+        return True
+    
+    def _build_request(self, text: str) -> tuple:
+        """Build ElevenLabs request headers and payload"""
+        headers = {
+            "Accept": OUTPUT_MEDIA_TYPES.get(self.output_format.split("_")[0], "audio/*"),
+            "Content-Type": "application/json",
+            "xi-api-key": self.api_key
+        }
+        
+        data = {
+            "text": text,
+            "model_id": self.model_id,
+            "voice_settings": self.voice_settings
+        }
+        return headers, data
+    
+    @property
+    def file_extension(self) -> str:
+        """Asterisk file extension of the channel codec every synthesis is normalized to"""
+        return self.channel_codec
+    
     async def generate_speech(self, text: str) -> Optional[bytes]:
         """Generate speech from text using ElevenLabs"""
         try:
-            if not self.api_key:
-                logger.error("❌ ElevenLabs API key no configurada")
-                return None
-                
-            if not self.voice_id:
-                logger.error("❌ ElevenLabs Voice ID no configurado")
+            if not self._can_synthesize():
                 return None
             
             url = f"{self.base_url}/text-to-speech/{self.voice_id}"
+            headers, data = self._build_request(text)
+            started = time.monotonic()
             
-            headers = {
-                "Accept": "audio/mpeg",
-                "Content-Type": "application/json",
-                "xi-api-key": self.api_key
-            }
-            
-            data = {
-                "text": text,
-                "model_id": "eleven_monolingual_v1",
-                "voice_settings": {
-                    "stability": 0.5,
-                    "similarity_boost": 0.5
-                }
-            }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    url,
-                    headers=headers,
-                    json=data,
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as response:
+            async with http_client.session.post(
+                url,
+                headers=headers,
+                json=data,
+                params={"output_format": self.output_format},
+                timeout=http_client.timeout("elevenlabs")
+            ) as response:
+                
+                if response.status == 200:
+                    metrics.observe("tts_first_byte", time.monotonic() - started, "elevenlabs")
+                    audio_data = await response.read()
+                    metrics.observe("tts_total", time.monotonic() - started, "elevenlabs")
+                    self.breaker.record_success()
+                    # Normalized once here, so Asterisk never transcodes on playback
+                    audio_data = convert_audio(audio_data, self.output_format, self.channel_codec)
+                    logger.info(f"🔊 Audio generado: {len(audio_data)} bytes")
+                    return audio_data
+                else:
+                    self.breaker.record_failure()
+                    error_text = await response.text()
+                    logger.error(f"❌ Error en ElevenLabs API: {response.status} - {error_text}")
+                    return None
                     
-                    if response.status == 200:
-                        audio_data = await response.read()
-                        logger.info(f"🔊 Audio generado: {len(audio_data)} bytes")
-                        return audio_data
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"❌ Error en ElevenLabs API: {response.status} - {error_text}")
-                        return None
-                        
         except Exception as e:
+            self.breaker.record_failure()
             logger.error(f"❌ Error generando audio: {e}")
             return None
     
+    async def stream_speech(self, text: str) -> AsyncIterator[bytes]:
+        """Stream speech from ElevenLabs as audio chunks while it is synthesized
+
+        Yields nothing when the request is refused; a failure after audio started is raised,
+        so the consumer knows the audio is truncated.
+        """
+        if not self._can_synthesize():
+            return
+        
+        url = f"{self.base_url}/text-to-speech/{self.voice_id}/stream"
+        headers, data = self._build_request(text)
+        params = {
+            "output_format": self.output_format,
+            "optimize_streaming_latency": Config.ELEVENLABS_STREAM_LATENCY
+        }
+        started = time.monotonic()
+        
+        try:
+            async with http_client.session.post(
+                url,
+                headers=headers,
+                json=data,
+                params=params,
+                timeout=http_client.timeout("elevenlabs")
+            ) as response:
+                
+                if response.status != 200:
+                    self.breaker.record_failure()
+                    error_text = await response.text()
+                    logger.error(f"❌ Error en ElevenLabs API: {response.status} - {error_text}")
+                    return
+                
+                self.breaker.record_success()
+                converter = ChannelConverter(self.output_format, self.channel_codec)
+                total = 0
+                async for chunk in response.content.iter_chunked(Config.TTS_STREAM_CHUNK_SIZE):
+                    audio = converter.convert(chunk)
+                    if audio:
+                        if not total:
+                            metrics.observe("tts_first_byte", time.monotonic() - started, "elevenlabs")
+                        total += len(audio)
+                        yield audio
+                metrics.observe("tts_total", time.monotonic() - started, "elevenlabs")
+                logger.info(f"🔊 Audio generado en streaming: {total} bytes")
+                
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.breaker.record_failure()
+            logger.error(f"❌ Error generando audio en streaming: {e}")
+            raise
+    
+    async def write_speech_stream(self, text: str, output_path: str,
+                                  ready: Optional[asyncio.Event] = None) -> bool:
+        """Write streamed speech to a file chunk by chunk; set ready once audio starts landing
+
+        A stream that fails or produces nothing leaves no file behind.
+        """
+        written = 0
+        try:
+            with open(output_path, 'wb') as f:
+                async for chunk in self.stream_speech(text):
+                    f.write(chunk)
+                    f.flush()
+                    written += len(chunk)
+                    if ready and not ready.is_set():
+                        ready.set()
+        except asyncio.CancelledError:
+            self._remove_partial(output_path)
+            raise
+        except Exception as e:
+            logger.error(f"❌ Error escribiendo audio en streaming: {e}")
+            written = 0
+        finally:
+            # Never leave a consumer waiting on a stream that produced nothing
+            if ready and not ready.is_set():
+                ready.set()
+        if not written:
+            self._remove_partial(output_path)
+        return written > 0
+    
+    @staticmethod
+    def _remove_partial(path: str) -> None:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+    
     async def generate_speech_file(self, text: str, output_path: str) -> bool:
         """Generate speech file from text"""
         try:
-            audio_data = await self.generate_speech(text)
-            if audio_data:
-                with open(output_path, 'wb') as f:
-                    f.write(audio_data)
+            if await self.write_speech_stream(text, output_path):
                 logger.info(f"✅ Audio guardado en: {output_path}")
                 return True
             return False
@@ -86,15 +210,13 @@ class TTSService:
     async def generate_temp_speech(self, text: str) -> Optional[str]:
         """Generate speech and return temporary file path"""
         try:
-            audio_data = await self.generate_speech(text)
-            if audio_data:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as f:
-                    f.write(audio_data)
-                    temp_path = f.name
-                
+            with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{self.file_extension}') as f:
+                temp_path = f.name
+            
+            if await self.write_speech_stream(text, temp_path):
                 logger.info(f"✅ Audio temporal creado: {temp_path}")
                 return temp_path
             return None
         except Exception as e:
             logger.error(f"❌ Error creando audio temporal: {e}")
-            return None 
\ No newline at end of file
+            return None
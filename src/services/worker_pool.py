@@ -0,0 +1,174 @@
+"""
+Worker mode: several processes, each with its own event loop and warm services, dialing one stored campaign
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+from typing import Dict, Optional, Tuple
+from src.services.call_manager import CallManager
+from src.services.campaign_store import CampaignStore, new_owner_id, start_file_campaign
+from src.services.dnc import dnc_list
+from src.core.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Exit code of a worker whose services could not start: restarting it would fail the same way
+EXIT_INIT_FAILED = 3
+MONITOR_INTERVAL = 0.5
+STOP_TIMEOUT = 30
+
+def worker_share(total: int, workers: int, index: int) -> int:
+    """Worker index's part of total, spread so the parts add up to total"""
+    return total // workers + (1 if index < total % workers else 0)
+
+def run_worker(index: int, workers: int, owner: str, campaign_id: Optional[int],
+               stop_when_done: bool, log_level: int, ready) -> None:
+    """Worker process entry point"""
+    logging.basicConfig(level=log_level, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    # This worker's share of the trunk limits; the AGI port is shared with the other workers
+    Config.DIALER_MAX_CHANNELS = max(1, worker_share(Config.DIALER_MAX_CHANNELS, workers, index))
+    Config.DIALER_CPS = Config.DIALER_CPS / workers
+    Config.AGI_REUSE_PORT = True
+    # Call routes split their own limits by the number of workers
+    Config.WORKERS = workers
+    sys.exit(asyncio.run(_worker_main(index, owner, campaign_id, stop_when_done, ready)))
+
+async def _worker_main(index: int, owner: str, campaign_id: Optional[int], stop_when_done: bool, ready) -> int:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+
+    manager = CallManager()
+    if not await manager.initialize():
+        await manager.shutdown()
+        return EXIT_INIT_FAILED
+    logger.info(f"👷 Worker {index} listo ({Config.DIALER_MAX_CHANNELS} canales)")
+    ready[index] = 1
+    try:
+        if campaign_id is not None:
+            campaign = asyncio.create_task(manager.run_campaign(campaign_id, owner))
+            stopping = asyncio.create_task(stop.wait())
+            await asyncio.wait({campaign, stopping}, return_when=asyncio.FIRST_COMPLETED)
+            stopping.cancel()
+            if not campaign.done():
+                campaign.cancel()
+                await asyncio.gather(campaign, return_exceptions=True)
+            else:
+                # A failed campaign loop exits with an error so the supervisor restarts this worker
+                campaign.result()
+        if not stop_when_done:
+            # Keep answering FastAGI connections until told to stop
+            await stop.wait()
+    finally:
+        ready[index] = 0
+        await manager.shutdown()
+    return 0
+
+class WorkerPool:
+    """Starts the worker processes, restarts the ones that crash and returns their leases to the queue"""
+
+    def __init__(self, workers: Optional[int] = None, store: Optional[CampaignStore] = None):
+        self.workers = workers or Config.WORKERS
+        self.store = store or CampaignStore()
+        self.context = multiprocessing.get_context("spawn")
+        # Worker index -> (process, lease owner)
+        self.processes: Dict[int, Tuple[multiprocessing.Process, str]] = {}
+        # 1 for each worker whose services are initialized and that is taking calls
+        self.ready = self.context.Array("b", self.workers)
+        self.stats = {"started": 0, "crashed": 0, "leases_returned": 0}
+
+    def _start(self, index: int, campaign_id: Optional[int], stop_when_done: bool) -> None:
+        owner = f"{new_owner_id()}-w{index}"
+        process = self.context.Process(
+            target=run_worker, name=f"eve-worker-{index}",
+            args=(index, self.workers, owner, campaign_id, stop_when_done,
+                  logging.getLogger().getEffectiveLevel(), self.ready)
+        )
+        process.start()
+        self.processes[index] = (process, owner)
+        self.stats["started"] += 1
+
+    async def run(self, campaign_id: Optional[int] = None, stop_when_done: bool = False,
+                  stop: Optional[asyncio.Event] = None) -> None:
+        """Run the workers until stop is set, or until they all finish the campaign (stop_when_done)"""
+        stop = stop or asyncio.Event()
+        await self.store.open()
+        for index in range(self.workers):
+            self._start(index, campaign_id, stop_when_done)
+        logger.info(f"👷 {self.workers} workers iniciados")
+        try:
+            while self.processes and not stop.is_set():
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=MONITOR_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                await self._reap(campaign_id, stop_when_done, stop)
+        finally:
+            await self._stop_all()
+
+    async def _reap(self, campaign_id: Optional[int], stop_when_done: bool, stop: asyncio.Event) -> None:
+        """Collect exited workers; a crashed one gives its calls back and is started again"""
+        for index, (process, owner) in list(self.processes.items()):
+            if process.is_alive():
+                continue
+            process.join()
+            del self.processes[index]
+            self.ready[index] = 0
+            # Its leases would expire anyway; returning them now resumes the calls right away
+            released = await self.store.release_owner(owner)
+            self.stats["leases_returned"] += released
+            if process.exitcode == 0:
+                continue
+            if process.exitcode == EXIT_INIT_FAILED:
+                logger.error(f"❌ Worker {index} no pudo inicializar sus servicios")
+                continue
+            self.stats["crashed"] += 1
+            logger.error(f"❌ Worker {index} terminó con código {process.exitcode}; "
+                         f"{released} números vuelven a la cola")
+            await asyncio.sleep(Config.WORKER_RESTART_DELAY)
+            if not stop.is_set():
+                self._start(index, campaign_id, stop_when_done)
+
+    async def _stop_all(self) -> None:
+        """SIGTERM every worker, wait for a clean shutdown and kill the ones that hang"""
+        for process, _ in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        for index, (process, owner) in list(self.processes.items()):
+            await asyncio.to_thread(process.join, STOP_TIMEOUT)
+            if process.is_alive():
+                logger.warning(f"⚠️ Worker {index} no terminó a tiempo, forzando cierre")
+                process.kill()
+                await asyncio.to_thread(process.join)
+            self.stats["leases_returned"] += await self.store.release_owner(owner)
+        self.processes.clear()
+
+    async def serve(self, numbers_file: Optional[str], stop: asyncio.Event) -> None:
+        """Worker mode of the application: the contact list is imported here and dialed by the workers"""
+        campaign_id, importer = None, None
+        await dnc_list.start()
+        if numbers_file and os.path.exists(numbers_file):
+            campaign_id, importer = await start_file_campaign(self.store, numbers_file, suppression=dnc_list)
+        elif numbers_file:
+            logger.warning(f"⚠️ Archivo {numbers_file} no encontrado")
+        try:
+            await self.run(campaign_id, stop=stop)
+        finally:
+            if importer:
+                importer.cancel()
+                await asyncio.gather(importer, return_exceptions=True)
+            await dnc_list.stop()
+            await self.store.close()
+
+    def get_status(self) -> dict:
+        return {
+            **self.stats,
+            "workers": self.workers,
+            "ready": sum(self.ready),
+            "alive": sum(process.is_alive() for process, _ in self.processes.values())
+        }
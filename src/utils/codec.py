@@ -0,0 +1,178 @@
+"""
+G.711 and PCM16 codecs, resampling and Asterisk-native audio files
+"""
+
+import numpy as np
+from typing import Tuple
+
+# Asterisk file formats (by extension) and their sample rates; all are headerless
+CHANNEL_CODECS = {
+    "ulaw": 8000,
+    "alaw": 8000,
+    "sln": 8000,
+    "sln16": 16000
+}
+
+ULAW_BIAS = 0x84
+ULAW_CLIP = 8159
+# Segment end points of the G.711 reference encoder (14-bit μ-law, 13-bit A-law)
+ULAW_SEGMENT_ENDS = np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF])
+ALAW_SEGMENT_ENDS = np.array([0x1F, 0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF])
+
+def _ulaw_encode_samples(pcm: np.ndarray) -> np.ndarray:
+    """Reference μ-law encoder (G.711), vectorized over int32 samples"""
+    pcm = pcm >> 2
+    mask = np.where(pcm < 0, 0x7F, 0xFF)
+    magnitude = np.minimum(np.abs(pcm), ULAW_CLIP) + (ULAW_BIAS >> 2)
+    segment = np.searchsorted(ULAW_SEGMENT_ENDS, magnitude)
+    codes = (segment << 4) | ((magnitude >> (segment + 1)) & 0x0F)
+    return (np.where(segment >= 8, 0x7F, codes) ^ mask).astype(np.uint8)
+
+def _ulaw_decode_codes(codes: np.ndarray) -> np.ndarray:
+    codes = ~codes.astype(np.int32) & 0xFF
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = (((mantissa << 3) + ULAW_BIAS) << exponent) - ULAW_BIAS
+    return np.where(codes & 0x80, -magnitude, magnitude).astype(np.int16)
+
+def _alaw_encode_samples(pcm: np.ndarray) -> np.ndarray:
+    """Reference A-law encoder (G.711), vectorized over int32 samples"""
+    pcm = pcm >> 3
+    mask = np.where(pcm >= 0, 0xD5, 0x55)
+    magnitude = np.where(pcm >= 0, pcm, -pcm - 1)
+    segment = np.searchsorted(ALAW_SEGMENT_ENDS, magnitude)
+    shift = np.where(segment < 2, 1, segment)
+    codes = (segment << 4) | ((magnitude >> shift) & 0x0F)
+    return (np.where(segment >= 8, 0x7F, codes) ^ mask).astype(np.uint8)
+
+def _alaw_decode_codes(codes: np.ndarray) -> np.ndarray:
+    codes = codes.astype(np.int32) ^ 0x55
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = np.where(exponent > 0, ((mantissa << 4) + 0x108) << np.maximum(exponent - 1, 0), (mantissa << 4) + 8)
+    return np.where(codes & 0x80, magnitude, -magnitude).astype(np.int16)
+
+# Lookup tables make encoding and decoding a single indexing operation per buffer
+_ALL_SAMPLES = np.arange(-32768, 32768, dtype=np.int32)
+_ALL_CODES = np.arange(256, dtype=np.uint8)
+ULAW_ENCODE_TABLE = _ulaw_encode_samples(_ALL_SAMPLES)
+ALAW_ENCODE_TABLE = _alaw_encode_samples(_ALL_SAMPLES)
+ULAW_DECODE_TABLE = _ulaw_decode_codes(_ALL_CODES)
+ALAW_DECODE_TABLE = _alaw_decode_codes(_ALL_CODES)
+
+def ulaw_encode(pcm: np.ndarray) -> np.ndarray:
+    return ULAW_ENCODE_TABLE[pcm.astype(np.int32) + 32768]
+
+def ulaw_decode(codes: np.ndarray) -> np.ndarray:
+    return ULAW_DECODE_TABLE[codes]
+
+def alaw_encode(pcm: np.ndarray) -> np.ndarray:
+    return ALAW_ENCODE_TABLE[pcm.astype(np.int32) + 32768]
+
+def alaw_decode(codes: np.ndarray) -> np.ndarray:
+    return ALAW_DECODE_TABLE[codes]
+
+def parse_source_format(output_format: str) -> Tuple[str, int]:
+    """Split an ElevenLabs output format such as "pcm_16000" into encoding and sample rate"""
+    encoding, _, rate = output_format.partition("_")
+    if encoding not in ("pcm", "ulaw", "alaw") or not rate.isdigit():
+        raise ValueError(f"Formato de audio no soportado: {output_format}")
+    return encoding, int(rate)
+
+def decode_bytes(audio_data: bytes, encoding: str) -> np.ndarray:
+    """Decode raw pcm/ulaw/alaw bytes into int16 samples"""
+    if encoding == "pcm":
+        return np.frombuffer(audio_data, dtype='<i2')
+    codes = np.frombuffer(audio_data, dtype=np.uint8)
+    return ulaw_decode(codes) if encoding == "ulaw" else alaw_decode(codes)
+
+def encode_samples(pcm: np.ndarray, codec: str) -> bytes:
+    """Encode int16 samples for an Asterisk channel codec"""
+    if codec == "ulaw":
+        return ulaw_encode(pcm).tobytes()
+    if codec == "alaw":
+        return alaw_encode(pcm).tobytes()
+    return pcm.astype('<i2').tobytes()
+
+def lowpass_taps(cutoff: float, count: int = 31) -> np.ndarray:
+    """Hamming-windowed sinc low-pass; cutoff as a fraction of the sample rate"""
+    n = np.arange(count) - (count - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(count)
+    return taps / taps.sum()
+
+class Resampler:
+    """Streaming PCM16 resampler: FIR anti-aliasing plus linear interpolation"""
+
+    def __init__(self, source_rate: int, target_rate: int):
+        self.source_rate = source_rate
+        self.target_rate = target_rate
+        self.step = source_rate / target_rate
+        self.taps = lowpass_taps(0.45 * target_rate / source_rate) if target_rate < source_rate else None
+        self.history = np.zeros(len(self.taps) - 1 if self.taps is not None else 0, dtype=np.float64)
+        self.tail = np.zeros(0, dtype=np.float64)
+        self.position = 0.0
+
+    def process(self, pcm: np.ndarray) -> np.ndarray:
+        """Resample the next block; state carries over so blocks join without clicks"""
+        if self.source_rate == self.target_rate:
+            return pcm.astype(np.int16)
+        samples = pcm.astype(np.float64)
+        if self.taps is not None:
+            padded = np.concatenate((self.history, samples))
+            self.history = padded[len(padded) - len(self.history):]
+            samples = np.convolve(padded, self.taps, mode='valid')
+
+        data = np.concatenate((self.tail, samples))
+        last = len(data) - 1
+        if last < self.position:
+            self.tail = data
+            return np.zeros(0, dtype=np.int16)
+        count = int((last - self.position) // self.step) + 1
+        positions = self.position + np.arange(count) * self.step
+        out = np.interp(positions, np.arange(len(data)), data)
+        # Keep the last input sample so the next block can interpolate across the boundary
+        self.position = positions[-1] + self.step - last
+        self.tail = data[last:]
+        return np.clip(np.round(out), -32768, 32767).astype(np.int16)
+
+def resample(pcm: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    """Resample a whole PCM16 buffer (8k, 16k, 22.05k, 24k, 44.1k...)"""
+    return Resampler(source_rate, target_rate).process(pcm)
+
+class ChannelConverter:
+    """Converts an ElevenLabs audio stream into an Asterisk channel codec, chunk by chunk"""
+
+    def __init__(self, source_format: str, codec: str):
+        if codec not in CHANNEL_CODECS:
+            raise ValueError(f"Códec de canal no soportado: {codec}")
+        self.encoding, self.source_rate = parse_source_format(source_format)
+        self.codec = codec
+        self.sample_width = 2 if self.encoding == "pcm" else 1
+        self.resampler = Resampler(self.source_rate, CHANNEL_CODECS[codec])
+        self.passthrough = self.encoding == codec and self.source_rate == CHANNEL_CODECS[codec]
+        self.pending = b""
+
+    def convert(self, chunk: bytes) -> bytes:
+        if self.passthrough:
+            return chunk
+        # Chunks may split a 16-bit sample; the odd byte waits for the next chunk
+        data = self.pending + chunk
+        usable = len(data) // self.sample_width * self.sample_width
+        data, self.pending = data[:usable], data[usable:]
+        if not data:
+            return b""
+        pcm = self.resampler.process(decode_bytes(data, self.encoding))
+        return encode_samples(pcm, self.codec)
+
+def convert_audio(audio_data: bytes, source_format: str, codec: str) -> bytes:
+    """Convert a complete ElevenLabs response to an Asterisk channel codec"""
+    return ChannelConverter(source_format, codec).convert(audio_data)
+
+def write_native_file(base_path: str, pcm: np.ndarray, sample_rate: int, codec: str) -> str:
+    """Write PCM16 samples as a headerless .ulaw/.alaw/.sln/.sln16 file and return its path"""
+    if sample_rate != CHANNEL_CODECS[codec]:
+        pcm = resample(pcm, sample_rate, CHANNEL_CODECS[codec])
+    path = f"{base_path}.{codec}"
+    with open(path, 'wb') as f:
+        f.write(encode_samples(pcm, codec))
+    return path
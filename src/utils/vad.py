@@ -0,0 +1,149 @@
+"""
+Voice activity detection for recorded caller turns
+"""
+
+import io
+import time
+import numpy as np
+import soundfile as sf
+from typing import AsyncIterator, Optional, Tuple
+from src.core.config import Config
+
+def decode_wav(audio_data: bytes) -> Tuple[np.ndarray, int]:
+    """Decode WAV bytes into mono int16 samples"""
+    samples, sample_rate = sf.read(io.BytesIO(audio_data), dtype='int16', always_2d=True)
+    return samples[:, 0], sample_rate
+
+def encode_wav(samples: np.ndarray, sample_rate: int) -> bytes:
+    """Encode int16 samples as 16-bit PCM WAV bytes"""
+    buffer = io.BytesIO()
+    sf.write(buffer, samples, sample_rate, format='WAV', subtype='PCM_16')
+    return buffer.getvalue()
+
+def frame_features(samples: np.ndarray, frame_len: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-frame energy in dBFS and zero-crossing rate; a trailing partial frame is ignored"""
+    count = len(samples) // frame_len
+    frames = samples[:count * frame_len].reshape(count, frame_len).astype(np.float32) / 32768.0
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    energy_db = 20.0 * np.log10(np.maximum(rms, 1e-10))
+    signs = np.signbit(frames)
+    zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+    return energy_db, zcr
+
+class VoiceActivityDetector:
+    """Energy and zero-crossing VAD over fixed-size PCM16 frames"""
+
+    def __init__(self, sample_rate: int = 8000, frame_ms: Optional[int] = None,
+                 energy_threshold_db: Optional[float] = None, zcr_threshold: Optional[float] = None,
+                 min_speech_ms: Optional[int] = None, padding_ms: Optional[int] = None):
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms or Config.VAD_FRAME_MS
+        self.frame_len = sample_rate * self.frame_ms // 1000
+        self.energy_threshold_db = energy_threshold_db if energy_threshold_db is not None else Config.VAD_ENERGY_THRESHOLD_DB
+        self.zcr_threshold = zcr_threshold if zcr_threshold is not None else Config.VAD_ZCR_THRESHOLD
+        self.min_speech_frames = max(1, (min_speech_ms or Config.VAD_MIN_SPEECH_MS) // self.frame_ms)
+        self.padding = sample_rate * (padding_ms if padding_ms is not None else Config.VAD_PADDING_MS) // 1000
+
+    def classify(self, samples: np.ndarray) -> np.ndarray:
+        """Raw per-frame speech flags, before short runs are discarded"""
+        energy_db, zcr = frame_features(samples, self.frame_len)
+        voiced = energy_db > self.energy_threshold_db
+        # Fricatives are quiet but cross zero often
+        unvoiced = (energy_db > self.energy_threshold_db - 10.0) & (zcr > self.zcr_threshold)
+        return voiced | unvoiced
+
+    def speech_frames(self, samples: np.ndarray) -> np.ndarray:
+        """Boolean speech flag for every complete frame"""
+        return self._drop_short_runs(self.classify(samples))
+
+    def _drop_short_runs(self, speech: np.ndarray) -> np.ndarray:
+        """Clear speech runs shorter than the minimum, such as clicks and line noise"""
+        if self.min_speech_frames <= 1 or not speech.any():
+            return speech
+        edges = np.diff(np.concatenate(([0], speech.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        short = (ends - starts) < self.min_speech_frames
+        if not short.any():
+            return speech
+        mask = np.zeros(len(speech) + 1, dtype=np.int32)
+        np.add.at(mask, starts[short], 1)
+        np.add.at(mask, ends[short], -1)
+        return speech & (np.cumsum(mask[:-1]) == 0)
+
+    def trim(self, samples: np.ndarray) -> dict:
+        """Cut leading and trailing silence, keeping some padding around the speech"""
+        speech = self.speech_frames(samples)
+        speech_count = int(speech.sum())
+        result = {
+            "has_speech": speech_count > 0,
+            "speech_seconds": speech_count * self.frame_ms / 1000,
+            "total_seconds": len(samples) / self.sample_rate,
+            "samples": samples[:0]
+        }
+        if speech_count:
+            indexes = np.flatnonzero(speech)
+            start = max(0, indexes[0] * self.frame_len - self.padding)
+            end = min(len(samples), (indexes[-1] + 1) * self.frame_len + self.padding)
+            result["samples"] = samples[start:end]
+        return result
+
+class SpeechGate:
+    """Holds back the leading silence of a live PCM16 stream until the caller starts talking"""
+
+    def __init__(self, detector: VoiceActivityDetector, preroll_ms: Optional[int] = None):
+        self.detector = detector
+        self.frame_bytes = detector.frame_len * 2
+        preroll_ms = preroll_ms if preroll_ms is not None else Config.VAD_PADDING_MS
+        self.preroll_bytes = detector.sample_rate * preroll_ms // 1000 * 2
+        self.is_open = False
+        self.pending = b""
+        self.preroll = b""
+        self.streak = 0
+        self.frames = 0
+        self.voiced_frames = 0
+        self.processing_seconds = 0.0
+
+    @property
+    def speech_seconds(self) -> float:
+        return self.voiced_frames * self.detector.frame_ms / 1000
+
+    @property
+    def total_seconds(self) -> float:
+        return self.frames * self.detector.frame_ms / 1000
+
+    def feed(self, chunk: bytes) -> bytes:
+        """Add raw audio and return the bytes that should be forwarded"""
+        self.pending += chunk
+        usable = len(self.pending) // self.frame_bytes * self.frame_bytes
+        block, self.pending = self.pending[:usable], self.pending[usable:]
+        if not block:
+            return b""
+
+        speech = self.detector.classify(np.frombuffer(block, dtype='<i2'))
+        self.frames += len(speech)
+        self.voiced_frames += int(speech.sum())
+        if self.is_open:
+            return block
+
+        # Speech runs may span chunks, so the minimum run length is tracked across calls
+        for index, is_speech in enumerate(speech):
+            self.streak = self.streak + 1 if is_speech else 0
+            if self.streak >= self.detector.min_speech_frames:
+                self.is_open = True
+                start = max(0, index + 1 - self.streak) * self.frame_bytes
+                lead = (self.preroll + block[:start])[-self.preroll_bytes:] if self.preroll_bytes else b""
+                return lead + block[start:]
+
+        if self.preroll_bytes:
+            self.preroll = (self.preroll + block)[-self.preroll_bytes:]
+        return b""
+
+    async def filter(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """Forward a live stream from the first speech frame onwards"""
+        async for chunk in chunks:
+            started = time.perf_counter()
+            audio = self.feed(chunk)
+            self.processing_seconds += time.perf_counter() - started
+            if audio:
+                yield audio